@@ -0,0 +1,104 @@
+"""
+筛选性能测试
+在随机生成的5千、5万、50万行数据上比较逐列pandas筛选、编译执行计划
+以及指标索引三种方式的耗时，并检查结果一致、默认的筛选方式快于pandas
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicator_labels import resolve_column
+from screen_engine import ScreenData
+from stock_screener import StockScreener
+
+# 测试的数据规模
+DEFAULT_SIZES = [5000, 50000, 500000]
+
+# 每种方式重复执行的次数，取中位数
+REPEAT = 5
+
+
+def make_data(rows, seed=0):
+    """生成与load_financial_data列名相同的随机数据，约10%为空值"""
+    rng = np.random.default_rng(seed)
+    data = {
+        'code(股票代码)': [f"sh.{600000 + i}" for i in range(rows)],
+        'stock_name(股票名称)': [f"股票{i}" for i in range(rows)],
+        'liabilityToAsset(资产负债率)': rng.uniform(0, 0.1, rows),
+        'roeAvg(平均净资产收益率)': rng.normal(0.08, 0.08, rows),
+        'npMargin(净利率)': rng.normal(0.1, 0.1, rows),
+        'netProfit_growth': rng.normal(0.05, 0.5, rows),
+        'dupontNitogr(净利润/营业总收入)': rng.normal(0.08, 0.1, rows),
+    }
+    for name in list(data)[2:]:
+        data[name][rng.random(rows) < 0.1] = np.nan
+    return pd.DataFrame(data)
+
+
+def make_screener():
+    """与test_screener.main相同的筛选条件"""
+    screener = StockScreener()
+    screener.add_filter('balance', 'liabilityToAsset(资产负债率)', max_value=0.006)
+    screener.add_filter('profit', 'roeAvg(平均净资产收益率)', min_value=0.15, allow_null=False)
+    screener.add_filter('profit', 'npMargin(净利率)', min_value=0.15, allow_null=False)
+    screener.add_filter('profit', 'netProfit_growth', min_value=0.001, allow_null=False)
+    screener.add_filter('indicators', 'dupontNitogr(净利润/营业总收入)', min_value=0.05, allow_null=False)
+    return screener
+
+
+def pandas_screen(filters, df):
+    """逐列转换、逐条件生成布尔Series的筛选方式（用于对比）"""
+    mask = pd.Series([True] * len(df), index=df.index)
+    for indicators in filters.values():
+        for indicator_name, conditions in indicators.items():
+            values = pd.to_numeric(df[resolve_column(df.columns, indicator_name)], errors='coerce')
+            if conditions['min_value'] is not None:
+                mask &= (values.isna() | (values >= conditions['min_value']))
+            if conditions['max_value'] is not None:
+                mask &= (values.isna() | (values <= conditions['max_value']))
+            if not conditions['allow_null']:
+                mask &= ~values.isna()
+    return df[mask][[resolve_column(df.columns, 'code'), resolve_column(df.columns, 'stock_name')]]
+
+
+def timed(func, repeat=REPEAT):
+    """返回 (结果, 耗时中位数毫秒)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(times))
+
+
+def run(sizes=DEFAULT_SIZES):
+    screener = make_screener()
+    print(f"{'行数':>8} {'pandas':>10} {'首次筛选':>10} {'重复筛选':>10} {'索引筛选':>10} {'首次加速':>8} {'重复加速':>8} {'结果数':>8}")
+    results = []
+    for rows in sizes:
+        df = make_data(rows)
+        expected, pandas_ms = timed(lambda: pandas_screen(screener.filters, df))
+        # 首次筛选包含指标列的转换，即直接传入DataFrame的默认方式
+        actual, cold_ms = timed(lambda: screener.screen(df))
+        data = ScreenData(df)
+        screener.screen(data)
+        _, warm_ms = timed(lambda: screener.screen(data))
+        # 建立索引后只计算行号，模拟交互调整阈值时的重新筛选
+        plan = screener.compile()
+        data.build_indexes([condition.indicator for condition in plan.conditions])
+        indexed_rows, index_ms = timed(lambda: plan.run(data))
+        assert actual.equals(expected), f"{rows}行数据的筛选结果不一致"
+        assert data.rows(indexed_rows).equals(expected), f"{rows}行数据的索引筛选结果不一致"
+        print(f"{rows:>8} {pandas_ms:>9.2f}ms {cold_ms:>9.2f}ms {warm_ms:>9.2f}ms {index_ms:>9.3f}ms "
+              f"{pandas_ms / cold_ms:>7.1f}x {pandas_ms / warm_ms:>7.1f}x {len(actual):>8}")
+        assert cold_ms < pandas_ms, f"{rows}行数据的默认筛选没有快于pandas"
+        results.append({'rows': rows, 'pandas_ms': pandas_ms, 'cold_ms': cold_ms,
+                        'warm_ms': warm_ms, 'index_ms': index_ms, 'matches': len(actual)})
+    return results
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
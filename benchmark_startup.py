@@ -0,0 +1,155 @@
+"""
+启动耗时测试
+在新的Python进程中测量命令行入口和各模块的导入耗时，并检查是否提前导入了较重的依赖
+（pandas、baostock、matplotlib、streamlit等），防止导入方式的改动拖慢启动：
+
+    python benchmark_startup.py                  # 超出预算或导入了不该导入的模块时返回1
+    python benchmark_startup.py --with-screen    # 另外测量各阶段已是最新时离线筛选的耗时（需要本地已有数据）
+    python benchmark_startup.py --with-screen --year 2024 --quarter 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# 较重的依赖（导入耗时均在数百毫秒以上）
+HEAVY_MODULES = ['pandas', 'numpy', 'baostock', 'matplotlib', 'streamlit']
+
+# 命令行从启动到开始运行第一个阶段的耗时预算（毫秒，不含解释器本身的启动）
+STARTUP_BUDGET_MS = 100
+
+# 每项测量的重复次数，取中位数
+REPEAT = 5
+
+# 在子进程中执行的测量代码：运行code，输出耗时和已导入的较重依赖
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = (time.perf_counter() - start) * 1000
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{'ms': elapsed, 'heavy': heavy}}))
+"""
+
+# 测量项：(名称, 代码, 不应导入的依赖, 耗时预算)
+CHECKS = [
+    ('import main', 'import main', HEAVY_MODULES, STARTUP_BUDGET_MS),
+    # 命令行解析并构建流水线，到开始运行阶段为止
+    ('main: build pipeline',
+     'import main\n'
+     'pipeline = main.build_pipeline(*main.default_quarter())\n'
+     'pipeline.select(["screen"])',
+     HEAVY_MODULES, STARTUP_BUDGET_MS),
+    ('import stock_data_collector', 'import stock_data_collector', ['baostock', 'matplotlib', 'streamlit'], None),
+    ('import stock_report', 'import stock_report', ['baostock', 'matplotlib', 'streamlit'], None),
+    ('import data_loader', 'import data_loader', ['baostock', 'matplotlib', 'streamlit'], None),
+]
+
+
+def probe(code, repeat=REPEAT, cwd=None):
+    """在新进程中执行code，返回 (进程内耗时中位数, 进程总耗时中位数, 已导入的较重依赖)"""
+    script = _PROBE.format(code=code, heavy=HEAVY_MODULES)
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    inner, wall = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                check=True, cwd=cwd or root, env=env).stdout
+        wall.append((time.perf_counter() - start) * 1000)
+        result = json.loads(output.strip().splitlines()[-1])
+        inner.append(result['ms'])
+    return statistics.median(inner), statistics.median(wall), result['heavy']
+
+
+def probe_command(args, repeat=REPEAT, cwd=None):
+    """在新进程中运行命令行，返回 (进程总耗时中位数, 已导入的较重依赖)
+
+    用 -X importtime 记录导入的模块，只检查顶层包。
+    """
+    wall, heavy = [], set()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stderr = subprocess.run([sys.executable, '-X', 'importtime'] + list(args), capture_output=True,
+                                text=True, check=False, cwd=cwd).stderr
+        wall.append((time.perf_counter() - start) * 1000)
+        for line in stderr.splitlines():
+            if line.startswith('import time:'):
+                module = line.rsplit('|', 1)[-1].strip()
+                if module in HEAVY_MODULES:
+                    heavy.add(module)
+    return statistics.median(wall), sorted(heavy)
+
+
+def run(repeat=REPEAT, with_screen=False, screen_args=()):
+    """运行全部测量
+
+    Args:
+        repeat: int, 每项测量的重复次数
+        with_screen: bool, 是否测量各阶段已是最新时的离线筛选
+        screen_args: list, 传给main.py的其他参数（如报告期）
+
+    Returns:
+        tuple: (结果列表, 问题列表)
+    """
+    _, interpreter_ms, _ = probe('pass', repeat)
+    print(f"解释器启动: {interpreter_ms:.0f}ms\n")
+    print(f"{'测量项':<32} {'导入/构建':>10} {'进程总耗时':>10}  已导入的较重依赖")
+    results, problems = [], []
+    for name, code, forbidden, budget in CHECKS:
+        inner_ms, wall_ms, heavy = probe(code, repeat)
+        print(f"{name:<32} {inner_ms:>8.1f}ms {wall_ms:>8.0f}ms  {', '.join(heavy) or '-'}")
+        results.append({'name': name, 'ms': inner_ms, 'wall_ms': wall_ms, 'heavy': heavy})
+        unexpected = [module for module in heavy if module in forbidden]
+        if unexpected:
+            problems.append(f"{name}: 导入了 {', '.join(unexpected)}")
+        if budget is not None and inner_ms > budget:
+            problems.append(f"{name}: {inner_ms:.0f}ms 超出预算 {budget}ms")
+
+    if with_screen:
+        # 离线筛选：先运行一次使各阶段成为最新，之后的运行只检查指纹（stat），不应导入pandas等依赖；
+        # 扣除解释器启动后的耗时同样受启动预算限制
+        name = 'main.py --offline screen'
+        args = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py'), '--offline', 'screen',
+                '--metrics-json', '', '--metrics-prom', ''] + list(screen_args)
+        subprocess.run([sys.executable] + args, capture_output=True, check=False)
+        wall_ms, heavy = probe_command(args, repeat)
+        screen_ms = wall_ms - interpreter_ms
+        print(f"{name:<32} {screen_ms:>8.1f}ms {wall_ms:>8.0f}ms  {', '.join(heavy) or '-'}")
+        results.append({'name': name, 'ms': screen_ms, 'wall_ms': wall_ms, 'heavy': heavy})
+        if heavy:
+            problems.append(f"{name}: 导入了 {', '.join(heavy)}")
+        if screen_ms > STARTUP_BUDGET_MS:
+            problems.append(f"{name}: {screen_ms:.0f}ms 超出预算 {STARTUP_BUDGET_MS}ms")
+    return results, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='启动耗时测试')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='每项测量的重复次数')
+    parser.add_argument('--with-screen', action='store_true', help='同时测量各阶段已是最新时离线筛选的耗时')
+    parser.add_argument('--year', type=int, help='离线筛选的报告期年份，默认与main.py相同')
+    parser.add_argument('--quarter', type=int, choices=[1, 2, 3, 4], help='离线筛选的报告期季度')
+    args = parser.parse_args(argv)
+
+    screen_args = []
+    if args.year is not None:
+        screen_args += ['--year', str(args.year)]
+    if args.quarter is not None:
+        screen_args += ['--quarter', str(args.quarter)]
+    _, problems = run(args.repeat, args.with_screen, screen_args)
+    if problems:
+        print('\n启动耗时检查未通过:')
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+    print('\n启动耗时检查通过')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
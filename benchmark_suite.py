@@ -0,0 +1,297 @@
+"""
+离线性能测试套件
+使用模拟的baostock接口（mock_baostock）生成5千、5万、50万只股票、N个季度的数据，测量：
+
+- 采集：StockDataCollector逐只股票获取四张报表的吞吐量（可设置接口延迟和失败率）
+- 存储和加载：写入列式存储、首次加载（计算衍生指标并合并为快照）、再次加载和多季度面板的耗时
+- 筛选：screen()首次和重复执行的耗时，以及筛选过程的内存峰值
+
+结果保存为JSON，可与之前的结果比较：
+
+    python benchmark_suite.py --sizes 5000 50000 --quarters 5 --output benchmark_results.json
+    python benchmark_suite.py --compare benchmark_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmark_screener import DEFAULT_SIZES, make_screener, timed
+from bs_session import BaostockSession
+from columnar_store import ColumnStore
+from data_loader import load_financial_data
+from metrics import get_registry
+from mock_baostock import MockBaostock
+from panel_screener import load_financial_panel
+from pipeline import _memory_mb
+from stock_data_collector import REPORT_FIELDS, StockDataCollector
+
+# 默认测试的季度数（至少5个季度时最后一个季度有同比数据）
+DEFAULT_QUARTERS = 5
+
+# 最后一个季度
+DEFAULT_END_QUARTER = (2024, 3)
+
+# 采集测试每种规模请求的股票数量（逐只请求，不随规模增加）
+DEFAULT_COLLECT_STOCKS = 200
+
+# 默认结果文件
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+# 与基准结果比较时，耗时或内存超过基准的倍数视为退化（吞吐量低于基准的 1/倍数）
+DEFAULT_THRESHOLD = 1.2
+
+# 面板测试加载的指标
+PANEL_INDICATORS = ['roeAvg', 'npMargin', 'netProfit_growth', 'liabilityToAsset']
+
+
+def quarter_range(end, count):
+    """截至end的count个连续季度，按时间顺序"""
+    year, quarter = end
+    index = year * 4 + quarter - 1
+    return [((i // 4), i % 4 + 1) for i in range(index - count + 1, index + 1)]
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+    return total
+
+
+def bench_collector(mock, stocks, year, quarter):
+    """逐只股票获取一个季度的四张报表
+
+    Returns:
+        dict: 吞吐量、请求次数、解码耗时、重试和失败次数
+    """
+    session = BaostockSession(api=mock, backoff=0.001, max_backoff=0.01)
+    collector = StockDataCollector(session=session, cache=False)
+    requests = mock.stats['requests']
+    start = time.perf_counter()
+    stock_list = collector.fetch_stock_list()
+    list_ms = (time.perf_counter() - start) * 1000
+    codes = stock_list['code'].astype(str).tolist()[:stocks]
+
+    start = time.perf_counter()
+    for code in codes:
+        collector.fetch_financial_data(code, year, quarter)
+    seconds = time.perf_counter() - start
+    queries = len(codes) * len(REPORT_FIELDS)
+    return {
+        'stock_list_ms': list_ms,
+        'stocks': len(codes),
+        'stocks_per_s': len(codes) / seconds,
+        'queries_per_s': queries / seconds,
+        'requests': mock.stats['requests'] - requests,
+        'decode_ms': sum(stats['seconds'] for stats in collector.decode_stats.values()) * 1000,
+        'retries': session.retries,
+        'failed': len(collector.failed_queries),
+    }
+
+
+def build_store(mock, root, quarters):
+    """将模拟数据直接写入列式存储（不经过逐只请求）
+
+    Returns:
+        dict: 写入耗时和存储大小
+    """
+    store = ColumnStore(root)
+    start = time.perf_counter()
+    for year, quarter in quarters:
+        for report_type in REPORT_FIELDS:
+            store.write(year, quarter, report_type, mock.report_frame(report_type, year, quarter))
+    seconds = time.perf_counter() - start
+    rows = sum(len(mock.report_frame('profit', year, quarter)) for year, quarter in quarters)
+    return {'write_ms': seconds * 1000, 'rows': rows, 'rows_per_s': rows * len(REPORT_FIELDS) / seconds,
+            'bytes': directory_bytes(root)}
+
+
+def bench_load(root, quarters):
+    """加载最后一个季度的合并数据和全部季度的面板
+
+    首次加载计算各季度的衍生指标并物化快照，之后的加载直接读取快照。
+
+    Returns:
+        tuple: (最后一个季度的数据, 耗时dict)
+    """
+    year, quarter = quarters[-1]
+    start = time.perf_counter()
+    data = load_financial_data(year, quarter, store_root=root)
+    cold_ms = (time.perf_counter() - start) * 1000
+    if data is None:
+        raise RuntimeError(f"{year}Q{quarter} 数据加载失败")
+    _, warm_ms = timed(lambda: load_financial_data(year, quarter, store_root=root))
+    start = time.perf_counter()
+    panel = load_financial_panel(PANEL_INDICATORS, quarters=quarters, store_root=root)
+    panel_ms = (time.perf_counter() - start) * 1000
+    return data, {'cold_ms': cold_ms, 'warm_ms': warm_ms, 'panel_ms': panel_ms,
+                  'rows': len(data), 'columns': len(data.columns), 'panel_shape': list(panel.values.shape)}
+
+
+def bench_screen(data):
+    """screen()的耗时和内存峰值（不使用结果缓存）"""
+    screener = make_screener()
+    screener.cache = None
+    start = time.perf_counter()
+    results = screener.screen(data)
+    first_ms = (time.perf_counter() - start) * 1000
+    _, repeat_ms = timed(lambda: screener.screen(data))
+
+    # 内存单独测量一次，tracemalloc会拖慢执行
+    tracemalloc.start()
+    screener.screen(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'first_ms': first_ms, 'repeat_ms': repeat_ms, 'peak_mb': peak / 1024 ** 2, 'matches': len(results)}
+
+
+def run(sizes=DEFAULT_SIZES, quarters=DEFAULT_QUARTERS, end=DEFAULT_END_QUARTER,
+        collect_stocks=DEFAULT_COLLECT_STOCKS, latency=0.0, error_rate=0.0, seed=0, work_dir=None):
+    """运行全部测试
+
+    Args:
+        sizes: list, 股票数量
+        quarters: int, 季度数
+        end: tuple, 最后一个季度 (year, quarter)
+        collect_stocks: int, 采集测试请求的股票数量，0表示不测采集
+        latency: float, 模拟接口每次请求的延迟（秒）
+        error_rate: float, 模拟接口每次请求的失败率
+        seed: int, 模拟数据的随机种子
+        work_dir: str, 临时存储的上级目录，默认为系统临时目录
+
+    Returns:
+        dict: {'meta': 运行环境, 'params': 参数, 'results': [每种规模的结果, ...]}
+    """
+    quarter_list = quarter_range(end, quarters)
+    params = {'sizes': list(sizes), 'quarters': [list(q) for q in quarter_list], 'collect_stocks': collect_stocks,
+              'latency': latency, 'error_rate': error_rate, 'seed': seed}
+    results = []
+    for stocks in sizes:
+        print(f"\n=== {stocks} 只股票，{quarters} 个季度 ===")
+        mock = MockBaostock(stocks=stocks, latency=latency, error_rate=error_rate, seed=seed)
+        result = {'stocks': stocks, 'memory_start_mb': _memory_mb()}
+        get_registry().reset()
+        if collect_stocks:
+            result['collector'] = bench_collector(mock, collect_stocks, *quarter_list[-1])
+            print(f"采集: {result['collector']['stocks_per_s']:.1f} 只/秒，"
+                  f"重试 {result['collector']['retries']} 次，失败 {result['collector']['failed']} 次")
+
+        root = tempfile.mkdtemp(prefix='benchmark_store_', dir=work_dir)
+        try:
+            result['store'] = build_store(mock, root, quarter_list)
+            print(f"写入: {result['store']['write_ms']:.0f}ms，{result['store']['bytes'] / 1024 ** 2:.1f}MB")
+            data, result['load'] = bench_load(root, quarter_list)
+            print(f"加载: 首次 {result['load']['cold_ms']:.0f}ms，再次 {result['load']['warm_ms']:.1f}ms，"
+                  f"面板 {result['load']['panel_ms']:.0f}ms")
+            result['screen'] = bench_screen(data)
+            print(f"筛选: 首次 {result['screen']['first_ms']:.2f}ms，重复 {result['screen']['repeat_ms']:.2f}ms，"
+                  f"内存峰值 {result['screen']['peak_mb']:.1f}MB，{result['screen']['matches']} 只")
+            del data
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        result['memory_end_mb'] = _memory_mb()
+        # 各阶段的耗时分布和吞吐量（见metrics模块）
+        result['metrics'] = get_registry().summary()
+        results.append(result)
+    return {'meta': run_metadata(), 'params': params, 'results': results}
+
+
+def run_metadata():
+    """运行环境：时间、代码版本、Python和主要依赖的版本、CPU核数"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def _metrics(report):
+    """{(规模, 分组, 指标): 数值}，只包含可比较的耗时、吞吐量和内存指标"""
+    metrics = {}
+    for result in report['results']:
+        for group, values in result.items():
+            if not isinstance(values, dict):
+                continue
+            for name, value in values.items():
+                if name.endswith(('_ms', '_per_s', '_mb')) and isinstance(value, (int, float)):
+                    metrics[(result['stocks'], group, name)] = value
+    return metrics
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基准结果比较，打印变化并返回退化的指标
+
+    耗时（_ms）和内存（_mb）越小越好，吞吐量（_per_s）越大越好。
+
+    Returns:
+        list: [(规模, 分组, 指标, 基准值, 当前值), ...]
+    """
+    current = _metrics(report)
+    previous = _metrics(baseline)
+    regressions = []
+    print(f"\n{'规模':>8} {'指标':<24} {'基准':>12} {'当前':>12} {'变化':>8}")
+    for key in sorted(current.keys() & previous.keys()):
+        old, new = previous[key], current[key]
+        if old <= 0 or new <= 0:
+            continue
+        ratio = old / new if key[2].endswith('_per_s') else new / old
+        flag = ' 退化' if ratio > threshold else ''
+        if flag:
+            regressions.append((*key, old, new))
+        print(f"{key[0]:>8} {key[1] + '.' + key[2]:<24} {old:>12.2f} {new:>12.2f} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='离线性能测试（使用模拟的baostock接口）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='股票数量')
+    parser.add_argument('--quarters', type=int, default=DEFAULT_QUARTERS, help='季度数')
+    parser.add_argument('--collect-stocks', type=int, default=DEFAULT_COLLECT_STOCKS,
+                        help='采集测试请求的股票数量，0表示不测采集')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟接口每次请求的延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟接口每次请求的失败率')
+    parser.add_argument('--seed', type=int, default=0, help='模拟数据的随机种子')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='结果文件')
+    parser.add_argument('--compare', metavar='BASELINE', help='与之前保存的结果比较')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='视为退化的倍数')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.quarters, collect_stocks=args.collect_stocks, latency=args.latency,
+                 error_rate=args.error_rate, seed=args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"\n结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项指标退化超过 {args.threshold}x")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+日线存储性能测试
+在临时目录中生成N只股票 × M年的随机日线（先整段写入历史数据，再逐日增量追加），
+比较逐只股票构建Series再对齐与按段偏移一次填入 (日期 × 股票) 数组两种read_field的耗时，
+并检查结果一致：
+
+    python benchmark_timeseries.py                       # 默认5000只股票 × 10年
+    python benchmark_timeseries.py --stocks 500 --years 2
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from timeseries_store import DailyBarStore
+
+# 默认规模：股票数量和年数（每年约250个交易日）
+DEFAULT_STOCKS = 5000
+DEFAULT_YEARS = 10
+TRADING_DAYS_PER_YEAR = 250
+
+# 历史数据之后逐日增量追加的天数（每次追加给每只股票增加一段）
+DEFAULT_INCREMENTS = 5
+
+# 每种方式重复执行的次数，取中位数
+REPEAT = 3
+
+
+def trading_days(years, increments):
+    """从2010年起的工作日，最后increments天用于增量追加"""
+    return pd.bdate_range('2010-01-04', periods=years * TRADING_DAYS_PER_YEAR + increments)
+
+
+def bars(days, seed):
+    """一只股票的随机日线（收盘价为随机游走，约2%的交易日停牌即没有数据）"""
+    rng = np.random.default_rng(seed)
+    days = days[rng.random(len(days)) >= 0.02]
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+    return pd.DataFrame({'date': days, 'open': close, 'high': close * 1.01, 'low': close * 0.99,
+                         'close': close, 'preclose': np.roll(close, 1), 'volume': rng.uniform(1e5, 1e7, len(days)),
+                         'amount': close * 1e6, 'turn': rng.uniform(0, 5, len(days)),
+                         'pctChg': rng.normal(0, 2, len(days))})
+
+
+def build_store(root, stocks, years, increments):
+    """写入历史数据并逐日增量追加，返回 (股票代码, 写入耗时秒)"""
+    days = trading_days(years, increments)
+    history, updates = days[:-increments] if increments else days, days[len(days) - increments:]
+    codes = [f"sh.{600000 + i}" for i in range(stocks)]
+    store = DailyBarStore(root)
+    frames = {code: bars(days, i) for i, code in enumerate(codes)}
+    start = time.perf_counter()
+    with store.batch():
+        for code in codes:
+            store.append(code, frames[code][frames[code]['date'].isin(history)])
+    for day in updates:
+        with store.batch():
+            for code in codes:
+                store.append(code, frames[code][frames[code]['date'] == day])
+    return codes, time.perf_counter() - start
+
+
+def read_field_by_series(store, field, codes, start_date=None, end_date=None):
+    """逐只股票构建Series再由DataFrame按日期对齐的读取方式（用于对比）"""
+    series = {}
+    for code in codes:
+        data = store.read(code, start_date, end_date, [field])
+        series[code] = pd.Series(data[field], index=pd.DatetimeIndex(data['date']), copy=False)
+    return pd.DataFrame(series)
+
+
+def timed(func, repeat=REPEAT):
+    """返回 (结果, 耗时中位数毫秒)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(times))
+
+
+def run(stocks=DEFAULT_STOCKS, years=DEFAULT_YEARS, increments=DEFAULT_INCREMENTS, repeat=REPEAT):
+    root = tempfile.mkdtemp(prefix='bench_bars_')
+    try:
+        codes, write_seconds = build_store(root, stocks, years, increments)
+        store = DailyBarStore(root)
+        segments = sum(len(segs) for segs in store.segments.values())
+        print(f"{stocks}只股票 × {years}年：{store.rows}行，{segments}段，写入 {write_seconds:.1f}s")
+
+        results = {'stocks': stocks, 'years': years, 'rows': store.rows, 'write_seconds': write_seconds}
+        windows = [('全部日期', None, None), ('最近一年', str(trading_days(years, increments)[-TRADING_DAYS_PER_YEAR].date()), None)]
+        print(f"{'读取':<10} {'逐只Series':>12} {'按段填入':>10} {'加速比':>8}")
+        for label, start_date, end_date in windows:
+            expected, series_ms = timed(lambda: read_field_by_series(store, 'close', codes, start_date, end_date), repeat)
+            actual, array_ms = timed(lambda: store.read_field('close', codes, start_date, end_date), repeat)
+            pd.testing.assert_frame_equal(actual, expected, check_freq=False)
+            print(f"{label:<10} {series_ms:>10.0f}ms {array_ms:>8.0f}ms {series_ms / array_ms:>7.1f}x")
+            results[label] = {'series_ms': series_ms, 'array_ms': array_ms}
+
+        _, compact_ms = timed(store.compact, 1)
+        _, compacted_ms = timed(lambda: store.read_field('close', codes), repeat)
+        print(f"compact {compact_ms:.0f}ms，之后读取全部日期 {compacted_ms:.0f}ms")
+        results['compact_ms'] = compact_ms
+        results['compacted_ms'] = compacted_ms
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='日线存储性能测试')
+    parser.add_argument('--stocks', type=int, default=DEFAULT_STOCKS, help='股票数量')
+    parser.add_argument('--years', type=int, default=DEFAULT_YEARS, help='年数')
+    parser.add_argument('--increments', type=int, default=DEFAULT_INCREMENTS, help='增量追加的天数')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='每种方式的重复次数')
+    args = parser.parse_args(argv)
+    run(args.stocks, args.years, args.increments, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
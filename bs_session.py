@@ -0,0 +1,178 @@
+"""
+baostock会话管理模块
+每个进程共用一个长期登录的会话，会话断开时自动重新登录，
+请求失败时按有上限的指数退避重试
+"""
+
+import atexit
+import os
+import random
+import time
+
+from metrics import get_registry
+
+# 会话失效（需要重新登录）的错误码：未登录、网络错误
+RELOGIN_ERRORS = {'10001001', '10002001', '10002002', '10002003', '10002004',
+                  '10002005', '10002006', '10002007', '10002008'}
+
+# 可以重试的错误码：会话失效、数据解析/解压失败、未知错误、系统错误
+RETRY_ERRORS = RELOGIN_ERRORS | {'10004001', '10004002', '10004003', '10005001'}
+
+# 默认重试参数
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 8.0
+
+# 使用模拟接口时采集结果的输出目录（可用环境变量 BAOSTOCK_MOCK_OUTPUT 修改），模拟数据不覆盖真实数据
+DEFAULT_MOCK_OUTPUT_DIR = 'mock_output'
+
+_metrics = get_registry()
+
+
+class QueryFailed(Exception):
+    def __init__(self, api_name, error_code, error_msg):
+        super().__init__(f"{api_name} 失败 [{error_code}]: {error_msg}")
+        self.api_name = api_name
+        self.error_code = error_code
+        self.error_msg = error_msg
+
+
+class BaostockSession:
+    def __init__(self, api=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        """初始化会话（不立即登录，第一次请求时登录）
+
+        Args:
+            api: baostock模块（或接口相同的替代实现），默认为baostock，第一次使用时才导入
+            max_retries: int, 单次请求失败后的最大重试次数
+            backoff: float, 第一次重试前的等待秒数，之后每次翻倍
+            max_backoff: float, 单次等待的上限（秒）
+        """
+        self._api = api
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.logged_in = False
+        self.logins = 0
+        self.retries = 0
+
+    @property
+    def mocked(self):
+        """是否为模拟接口（见mock_baostock）"""
+        return getattr(self._api, 'mocked', False)
+
+    @property
+    def api(self):
+        """数据接口；baostock导入较慢（连带导入pandas），只有真正发出请求时才导入"""
+        if self._api is None:
+            import baostock
+            self._api = baostock
+        return self._api
+
+    def login(self):
+        """登录，失败时抛出QueryFailed"""
+        result = self.api.login()
+        if result.error_code != '0':
+            self.logged_in = False
+            raise QueryFailed('login', result.error_code, result.error_msg)
+        self.logged_in = True
+        self.logins += 1
+        _metrics.inc('baostock_logins_total')
+
+    def logout(self):
+        if self.logged_in:
+            try:
+                self.api.logout()
+            finally:
+                self.logged_in = False
+
+    def _wait(self, attempt):
+        """第attempt次重试前等待，指数增长并加入随机抖动，避免多个进程同时重试"""
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt)) * (0.5 + random.random() / 2)
+        _metrics.observe('baostock_backoff_seconds', delay)
+        time.sleep(delay)
+
+    def call(self, api_name, consume, before_call=None, **params):
+        """执行一次查询并用consume处理结果集，失败时重试
+
+        翻页也在consume中进行，因此请求和翻页中的任一环节失败都会整体重试。
+
+        Args:
+            api_name: str, baostock接口名
+            consume: callable, 接收结果集并返回处理结果（如解码为DataFrame）
+            before_call: callable, 每次发出请求前调用（如限速）
+            **params: 查询参数
+
+        Returns:
+            consume的返回值；重试用尽或遇到不可重试的错误时抛出QueryFailed
+        """
+        attempt = 0
+        while True:
+            try:
+                if not self.logged_in:
+                    self.login()
+                if before_call is not None:
+                    start = time.perf_counter()
+                    before_call()
+                    _metrics.observe('baostock_throttle_seconds', time.perf_counter() - start)
+                start = time.perf_counter()
+                rs = getattr(self.api, api_name)(**params)
+                if rs.error_code == '0':
+                    result = consume(rs)
+                    # 翻页时出错会改写结果集的错误码
+                    if rs.error_code == '0':
+                        _metrics.observe('baostock_request_seconds', time.perf_counter() - start, api=api_name)
+                        return result
+                error = QueryFailed(api_name, rs.error_code, rs.error_msg)
+            except QueryFailed as e:
+                error = e
+            except (OSError, ValueError, IndexError) as e:
+                # 网络中断或返回报文不完整
+                error = QueryFailed(api_name, '10002001', str(e))
+
+            _metrics.inc('baostock_errors_total', api=api_name, code=error.error_code)
+            if error.error_code not in RETRY_ERRORS or attempt >= self.max_retries:
+                _metrics.inc('baostock_failures_total', api=api_name)
+                raise error
+            if error.error_code in RELOGIN_ERRORS:
+                self.logged_in = False
+            self._wait(attempt)
+            attempt += 1
+            self.retries += 1
+            _metrics.inc('baostock_retries_total', api=api_name)
+
+
+# 每个进程一个会话；fork出的子进程不能沿用父进程的socket
+_sessions = {}
+
+
+def mock_enabled():
+    """是否设置了环境变量 BAOSTOCK_MOCK=1"""
+    return os.environ.get('BAOSTOCK_MOCK') == '1'
+
+
+def output_path(path):
+    """采集结果的输出路径：使用模拟接口时放到单独的目录下，不覆盖已有的真实数据"""
+    if mock_enabled():
+        return os.path.join(os.environ.get('BAOSTOCK_MOCK_OUTPUT', DEFAULT_MOCK_OUTPUT_DIR), path)
+    return path
+
+
+def get_session():
+    """返回当前进程共用的会话，进程退出时自动登出
+
+    设置环境变量 BAOSTOCK_MOCK=1 时使用离线的模拟接口（见mock_baostock），
+    采集脚本的输出用 output_path() 转到单独的目录。
+    """
+    pid = os.getpid()
+    session = _sessions.get(pid)
+    if session is None:
+        if mock_enabled():
+            from mock_baostock import mock_from_env
+            session = BaostockSession(api=mock_from_env())
+        else:
+            session = BaostockSession()
+        _sessions.clear()
+        _sessions[pid] = session
+        atexit.register(session.logout)
+    return session
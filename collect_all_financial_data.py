@@ -2,83 +2,336 @@
 收集所有股票的财务数据并汇总
 """
 
-from stock_data_collector import StockDataCollector
+from stock_data_collector import StockDataCollector, REPORT_FIELDS
+from bs_session import output_path
+from rate_limiter import TokenBucketRateLimiter
+from report_writer import CsvReportWriter, report_columns
+from columnar_store import ColumnStore, DEFAULT_STORE_ROOT
+from result_decoder import decode_frame
+from metrics import get_registry
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import pandas as pd
 from datetime import datetime
 import os
-import time
 
-def collect_all_financial_data(year=None, quarter=None):
+# 默认的全局请求速率上限（次/秒），所有工作进程共享
+DEFAULT_MAX_RPS = 20.0
+
+# 每个任务包含的股票数量
+DEFAULT_CHUNK_SIZE = 50
+
+# 每只股票需要获取的报表类型
+REPORT_TYPES = list(REPORT_FIELDS)
+
+# 工作进程内的数据收集器，每个进程各自登录一次
+# baostock内部只维护一个全局socket，因此不能在进程间共享会话
+_worker_collector = None
+
+
+def _init_worker(rate_limiter):
+    """工作进程初始化：创建本进程独立的数据收集器"""
+    global _worker_collector
+    _worker_collector = StockDataCollector(rate_limiter=rate_limiter)
+
+
+def _fetch_stock(collector, year, quarter, code):
+    """获取一只股票的四张报表
+
+    Returns:
+        tuple: (financial_data, error)，四张报表都获取成功时error为None，
+        否则为失败原因（此时financial_data可能不完整）
+    """
+    try:
+        financial_data = collector.fetch_financial_data(code, year, quarter)
+    except Exception as e:
+        return {}, str(e)
+    missing = [report_type for report_type in REPORT_TYPES if report_type not in financial_data]
+    if missing:
+        return financial_data, f"{','.join(missing)}: {collector.last_error}"
+    return financial_data, None
+
+
+def _collect_chunk(year, quarter, chunk):
+    """在工作进程中获取一批股票的财务数据
+
+    Args:
+        year: int, 年份
+        quarter: int, 季度
+        chunk: list, [(code, name), ...]
+
+    Returns:
+        list: [(code, name, financial_data, error), ...]，顺序与chunk一致
+    """
+    results = []
+    for code, name in chunk:
+        financial_data, error = _fetch_stock(_worker_collector, year, quarter, code)
+        if error:
+            print(f"处理 {code} 时出错: {error}")
+        results.append((code, name, financial_data, error))
+    return results
+
+
+def _init_remote_worker(rate_limiter):
+    """进程池工作进程初始化：清空fork时继承的主进程指标，再创建数据收集器"""
+    get_registry().reset()
+    _init_worker(rate_limiter)
+
+
+def _collect_chunk_remote(year, quarter, chunk):
+    """在工作进程中采集一批股票，连同本批的运行指标一起返回主进程"""
+    return _collect_chunk(year, quarter, chunk), get_registry().drain()
+
+
+def _iter_results(stocks, year, quarter, workers, rate_limiter, chunk_size):
+    """按股票列表顺序逐只返回采集结果
+
+    workers为1时在当前进程内顺序采集；否则将股票列表切分为多个任务
+    分发到进程池，executor.map按提交顺序返回结果，保证合并顺序确定。
+    """
+    chunks = [stocks[i:i + chunk_size] for i in range(0, len(stocks), chunk_size)]
+
+    if workers <= 1:
+        _init_worker(rate_limiter)
+        collect = partial(_collect_chunk, year, quarter)
+        for chunk in chunks:
+            yield from collect(chunk)
+        return
+
+    # 工作进程的运行指标随每批结果返回，汇总到主进程
+    metrics = get_registry()
+    collect = partial(_collect_chunk_remote, year, quarter)
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_remote_worker,
+                             initargs=(rate_limiter,)) as executor:
+        for chunk_results, chunk_metrics in executor.map(collect, chunks):
+            metrics.merge(chunk_metrics)
+            yield from chunk_results
+
+
+def _checkpoint_path(checkpoint_dir, code):
+    return os.path.join(checkpoint_dir, f"{code}.pkl")
+
+
+def _save_checkpoint(checkpoint_dir, code, financial_data):
+    """保存单只股票的四张报表，先写临时文件再替换，避免中断时留下损坏的文件"""
+    path = _checkpoint_path(checkpoint_dir, code)
+    tmp_path = path + '.tmp'
+    pd.to_pickle(financial_data, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(checkpoint_dir, code):
+    return pd.read_pickle(_checkpoint_path(checkpoint_dir, code))
+
+
+def _open_writers(store, year, quarter, output_dir, export_csv):
+    """每类报表的写入器，数据按股票顺序分批追加，不在内存中累积"""
+    writers = {report_type: [store.open_writer(year, quarter, report_type, report_columns(report_type))]
+               for report_type in REPORT_TYPES}
+    if export_csv:
+        for report_type in REPORT_TYPES:
+            writers[report_type].append(
+                CsvReportWriter(f"{output_dir}/{report_type}_all.csv", report_type))
+    return writers
+
+
+def _abort_writers(writers):
+    for report_writers in writers.values():
+        for writer in report_writers:
+            writer.abort()
+
+
+def _write_stock(writers, financial_data):
+    for report_type, df in financial_data.items():
+        for writer in writers[report_type]:
+            writer.append(df)
+
+
+def _save_failures(output_dir, failures):
+    """记录重试后仍然失败的股票（failed_stocks.csv），全部成功时删除该文件"""
+    path = os.path.join(output_dir, 'failed_stocks.csv')
+    if failures:
+        pd.DataFrame(failures, columns=['code', 'stock_name', 'error']).to_csv(
+            path, index=False, encoding='utf-8-sig')
+        print(f"{len(failures)} 只股票获取失败，已记录到 {path}，重新运行即可补采")
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _is_published(financial_data):
+    """判断报表是否已发布（任一报表存在非空的pubDate）"""
+    for df in financial_data.values():
+        if 'pubDate' in df.columns and df['pubDate'].notna().any():
+            return True
+    return False
+
+
+def _seed_checkpoints(store, year, quarter, output_dir, checkpoint_dir, stocks):
+    """根据已有的汇总数据为尚无检查点的股票生成检查点
+
+    用于在引入检查点之前采集的季度上执行增量更新，
+    已有数据的股票不必重新请求。优先读取列式存储分区，没有时读取CSV汇总文件。
+    """
+    existing = set(code for code, _ in stocks
+                   if os.path.exists(_checkpoint_path(checkpoint_dir, code)))
+    seeded = {}
+    for report_type in REPORT_TYPES:
+        output_file = f"{output_dir}/{report_type}_all.csv"
+        if store.has_partition(year, quarter, report_type):
+            df = store.read(year, quarter, report_type)
+        elif os.path.exists(output_file):
+            df = decode_frame(pd.read_csv(output_file, dtype=str, keep_default_na=False))
+        else:
+            continue
+        for code, group in df.groupby('code', sort=False, observed=True):
+            if code in existing:
+                continue
+            seeded.setdefault(code, {})[report_type] = group.reset_index(drop=True)
+    for code, financial_data in seeded.items():
+        _save_checkpoint(checkpoint_dir, code, financial_data)
+    if seeded:
+        print(f"根据已有汇总文件生成了 {len(seeded)} 个检查点")
+
+
+def collect_all_financial_data(year=None, quarter=None, workers=1,
+                               max_rps=DEFAULT_MAX_RPS, chunk_size=DEFAULT_CHUNK_SIZE,
+                               resume=True, incremental=False,
+                               store_root=DEFAULT_STORE_ROOT, export_csv=False,
+                               retry_failed=True):
+    """收集全部正常上市股票的财务数据
+
+    每只股票采集完成后立即保存检查点（checkpoints/{code}.pkl），
+    程序中断后重新运行会跳过已完成的股票。汇总数据按股票顺序
+    分批写入列式存储（{store_root}/{year}Q{quarter}/{report_type}）。
+
+    请求失败由会话自动重新登录并重试；仍未取全四张报表的股票不保存检查点，
+    全部股票处理完后再补采一轮，最终仍失败的记录在 failed_stocks.csv 中。
+    已有检查点的股票重新请求失败时，汇总数据中保留检查点中的数据。
+
+    Args:
+        year: int, 年份，默认为当前年份
+        quarter: int, 季度，默认为当前季度
+        workers: int, 并行采集的进程数，每个进程持有独立的baostock登录
+        max_rps: float, 所有进程合计的每秒请求数上限，None表示不限速
+        chunk_size: int, 每个任务包含的股票数量
+        resume: bool, 是否跳过已有检查点的股票
+        incremental: bool, 增量模式：只重新获取该季度尚未发布报表（没有pubDate）的股票
+        store_root: str, 列式存储目录
+        export_csv: bool, 是否同时输出CSV汇总文件（{report_type}_all.csv）
+        retry_failed: bool, 是否在全部股票处理完后补采失败的股票
+    """
     # 设置默认的年份和季度
     if year is None:
         year = datetime.now().year
     if quarter is None:
         quarter = (datetime.now().month - 1) // 3 + 1
-        
+
     # 创建数据收集器
     collector = StockDataCollector()
-    
+
     # 获取所有股票列表
     print("获取股票列表...")
     stock_list = collector.fetch_stock_list()
-    
+
     # 只处理状态为1（正常上市）的股票
     active_stocks = stock_list[stock_list['status'] == '1']
     total_stocks = len(active_stocks)
-    print(f"共有 {total_stocks} 只正常上市的股票需要处理")
-    
-    # 创建输出目录
-    output_dir = f"financial_data_all_{year}Q{quarter}"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 用于存储各类报表数据的列表
-    all_data = {
-        'profit': [],
-        'balance': [],
-        'cash_flow': [],
-        'indicators': []
-    }
-    
-    # 遍历每只股票获取数据
-    for idx, (code, name) in enumerate(zip(active_stocks['code'], active_stocks['code_name']), 1):
-        print(f"处理进度: [{idx}/{total_stocks}] {code} {name}")
-        
-        try:
-            # 获取财务数据
-            financial_data = collector.fetch_financial_data(code, year, quarter)
-            
-            # 将数据添加到相应的列表中
-            for report_type, df in financial_data.items():
-                if not df.empty:
-                    # 添加股票名称列
+    stocks = list(zip(active_stocks['code'], active_stocks['code_name']))
+
+    # 创建输出目录和检查点目录
+    # 使用模拟接口（BAOSTOCK_MOCK=1）时输出到单独的目录
+    store = ColumnStore(output_path(store_root))
+    output_dir = output_path(f"financial_data_all_{year}Q{quarter}")
+    checkpoint_dir = os.path.join(output_dir, 'checkpoints')
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    # 确定需要请求的股票
+    if incremental:
+        _seed_checkpoints(store, year, quarter, output_dir, checkpoint_dir, stocks)
+        pending = [(code, name) for code, name in stocks
+                   if not (os.path.exists(_checkpoint_path(checkpoint_dir, code))
+                           and _is_published(_load_checkpoint(checkpoint_dir, code)))]
+    elif resume:
+        pending = [(code, name) for code, name in stocks
+                   if not os.path.exists(_checkpoint_path(checkpoint_dir, code))]
+    else:
+        pending = stocks
+    print(f"共有 {total_stocks} 只正常上市的股票，其中 {len(pending)} 只需要请求（{workers} 个进程）")
+
+    # 令牌桶限速器在所有工作进程间共享，替代固定的“每50只暂停1秒”
+    rate_limiter = TokenBucketRateLimiter(max_rps) if max_rps else None
+
+    writers = _open_writers(store, year, quarter, output_dir, export_csv)
+    failures = []
+
+    try:
+        # 遍历每只股票：需要请求的股票从采集结果中按顺序取出，其余读取检查点
+        results = _iter_results(pending, year, quarter, workers, rate_limiter, chunk_size)
+        pending_codes = set(code for code, _ in pending)
+        idx = 0
+        for code, name in stocks:
+            if code in pending_codes:
+                _, _, financial_data, error = next(results)
+                idx += 1
+                print(f"处理进度: [{idx}/{len(pending)}] {code} {name}")
+
+                # 请求失败的股票不保存检查点，留待补采或下次运行时重试；
+                # 已有检查点（增量模式下重新请求未发布的报表）时仍写出检查点中的数据
+                if error:
+                    failures.append((code, name, error))
+                    if not os.path.exists(_checkpoint_path(checkpoint_dir, code)):
+                        continue
+                    financial_data = _load_checkpoint(checkpoint_dir, code)
+                else:
+                    # 添加股票名称列，完成一只保存一只
+                    for df in financial_data.values():
+                        df['stock_name'] = name
+                    _save_checkpoint(checkpoint_dir, code, financial_data)
+            elif os.path.exists(_checkpoint_path(checkpoint_dir, code)):
+                financial_data = _load_checkpoint(checkpoint_dir, code)
+            else:
+                continue
+
+            _write_stock(writers, financial_data)
+
+        # 补采：此时限速压力已经消失，在主进程中顺序重试失败的股票
+        recovered = 0
+        if failures and retry_failed:
+            print(f"\n补采 {len(failures)} 只失败的股票...")
+            remaining = []
+            for code, name, _ in failures:
+                financial_data, error = _fetch_stock(collector, year, quarter, code)
+                if error:
+                    remaining.append((code, name, error))
+                    continue
+                for df in financial_data.values():
                     df['stock_name'] = name
-                    all_data[report_type].append(df)
-            
-            # 每处理50只股票暂停1秒，避免请求过于频繁
-            if idx % 50 == 0:
-                time.sleep(1)
-                
-        except Exception as e:
-            print(f"处理 {code} 时出错: {str(e)}")
-            continue
-    
-    # 合并并保存数据
+                _save_checkpoint(checkpoint_dir, code, financial_data)
+                recovered += 1
+            failures = remaining
+            print(f"补采成功 {recovered} 只，仍失败 {len(failures)} 只")
+
+        # 有补采成功的股票时，按股票顺序从检查点重新写出汇总数据
+        if recovered:
+            _abort_writers(writers)
+            writers = _open_writers(store, year, quarter, output_dir, export_csv)
+            for code, name in stocks:
+                if os.path.exists(_checkpoint_path(checkpoint_dir, code)):
+                    _write_stock(writers, _load_checkpoint(checkpoint_dir, code))
+    except BaseException:
+        _abort_writers(writers)
+        raise
+
+    # 写入剩余数据
     print("\n保存汇总数据...")
-    for report_type, data_list in all_data.items():
-        if data_list:
-            # 合并同类报表数据
-            combined_df = pd.concat(data_list, ignore_index=True)
-            
-            # 调整列顺序，将股票代码和名称放在前面
-            cols = combined_df.columns.tolist()
-            cols = ['code', 'stock_name'] + [col for col in cols if col not in ['code', 'stock_name']]
-            combined_df = combined_df[cols]
-            
-            # 保存到CSV文件
-            output_file = f"{output_dir}/{report_type}_all.csv"
-            combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-            print(f"已保存{report_type}报表数据，共 {len(combined_df)} 条记录: {output_file}")
+    for report_type, report_writers in writers.items():
+        for writer in report_writers:
+            rows = writer.close()
+            print(f"已保存{report_type}报表数据，共 {rows} 条记录: {writer.output_file}")
+    _save_failures(output_dir, failures)
 
 if __name__ == "__main__":
     # 收集2024年第3季度的数据
-    collect_all_financial_data(2024, 3) 
\ No newline at end of file
+    collect_all_financial_data(2024, 3, workers=4)
+    get_registry().export()
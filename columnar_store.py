@@ -0,0 +1,370 @@
+"""
+列式存储模块
+按 年份/季度/报表类型 分区保存财务数据，每列一个二进制文件，读取时内存映射，
+支持只读取需要的列（列裁剪）以及按股票代码、统计日期预先过滤行（谓词下推）
+"""
+
+import glob
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from result_decoder import field_kind, decode_frame
+from indicator_labels import apply_labels, chinese_name
+from metrics import get_registry
+
+# 默认存储目录
+DEFAULT_STORE_ROOT = 'financial_store'
+
+# 默认分批写入的行数
+DEFAULT_BATCH_ROWS = 2000
+
+# 各类字段在磁盘上的存储类型
+# 数值字段：float64；日期字段：datetime64[D]（NaT表示空）；
+# 代码、名称等字段：字典编码，int32编号（-1表示空）+ 字典文件
+STORAGE_DTYPES = {
+    'float': '<f8',
+    'date': '<M8[D]',
+    'category': '<i4',
+    'text': '<i4',
+}
+
+SCHEMA_FILE = '_schema.json'
+
+
+# 各分区的写入锁：{分区目录绝对路径: RLock}
+_partition_locks = {}
+_partition_locks_guard = threading.Lock()
+
+
+def partition_lock(partition_dir):
+    """分区的进程内写入锁（可重入），同一分区的导入和替换依次进行"""
+    key = os.path.abspath(partition_dir)
+    with _partition_locks_guard:
+        return _partition_locks.setdefault(key, threading.RLock())
+
+
+def _encode_dates(values):
+    return pd.to_datetime(values, errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+class ColumnPartitionWriter:
+    def __init__(self, partition_dir, columns, batch_rows=DEFAULT_BATCH_ROWS, kinds=None):
+        """初始化分区写入器
+
+        数据按批追加到临时目录中的各列文件，close时整体替换目标分区。
+        每个写入器使用独立的临时目录，同一分区的多个写入器不会互相删除文件，
+        替换分区时持有分区锁，最后关闭的写入器的数据生效。
+        接口与CsvReportWriter一致，可在采集时直接替换使用。
+
+        Args:
+            partition_dir: str, 分区目录
+            columns: list, 列名（顺序即存储顺序）
+            batch_rows: int, 缓冲区达到该行数时写入一批
+            kinds: dict, {列名: 字段类型}，指定无法由列名推断类型的列（如合并后的pubDate_x）
+        """
+        self.output_file = partition_dir
+        self.columns = list(columns)
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._buffered_rows = 0
+        parent_dir = os.path.dirname(partition_dir) or '.'
+        os.makedirs(parent_dir, exist_ok=True)
+        self._tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(partition_dir) + '.tmp', dir=parent_dir)
+        self._kinds = {col: (kinds or {}).get(col) or field_kind(col) for col in self.columns}
+        self._dicts = {col: {} for col, kind in self._kinds.items() if kind in ('category', 'text')}
+        self._files = {col: open(os.path.join(self._tmp_dir, f"{col}.bin"), 'wb')
+                       for col in self.columns}
+
+    def append(self, df):
+        """追加一只股票的报表数据"""
+        if df.empty:
+            return
+        self._buffer.append(df)
+        self._buffered_rows += len(df)
+        if self._buffered_rows >= self.batch_rows:
+            self.flush()
+
+    def _encode(self, col, values):
+        kind = self._kinds[col]
+        if kind == 'float':
+            return pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+        if kind == 'date':
+            return _encode_dates(values)
+        # 字典编码
+        mapping = self._dicts[col]
+        values = values.astype(object)
+        null = (values.isna() | (values == '')).to_numpy()
+        codes = np.full(len(values), -1, dtype='int32')
+        for i in np.flatnonzero(~null):
+            codes[i] = mapping.setdefault(str(values.iat[i]), len(mapping))
+        return codes
+
+    def flush(self):
+        """将缓冲区中的数据追加到各列文件"""
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        batch = pd.concat(self._buffer, ignore_index=True).reindex(columns=self.columns)
+        written = 0
+        for col in self.columns:
+            data = self._encode(col, batch[col]).astype(STORAGE_DTYPES[self._kinds[col]]).tobytes()
+            self._files[col].write(data)
+            written += len(data)
+        self.rows_written += len(batch)
+        report = os.path.basename(self.output_file)
+        metrics = get_registry()
+        metrics.observe('store_write_seconds', time.perf_counter() - start, format='columnar', report=report)
+        metrics.inc('store_rows_written_total', len(batch), format='columnar', report=report)
+        metrics.inc('store_bytes_written_total', written, format='columnar', report=report)
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def close(self):
+        """写入剩余数据、字典和表结构，并替换目标分区
+
+        Returns:
+            int: 写入的总行数
+        """
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        schema = {
+            'rows': self.rows_written,
+            'columns': [{'name': col, 'kind': self._kinds[col],
+                         'dtype': STORAGE_DTYPES[self._kinds[col]],
+                         'label': chinese_name(col)} for col in self.columns],
+        }
+        for col, mapping in self._dicts.items():
+            with open(os.path.join(self._tmp_dir, f"{col}.dict.json"), 'w', encoding='utf-8') as f:
+                json.dump(list(mapping), f, ensure_ascii=False)
+        with open(os.path.join(self._tmp_dir, SCHEMA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(schema, f, ensure_ascii=False, indent=1)
+
+        # 先移走旧分区再换入新分区
+        with partition_lock(self.output_file):
+            old_dir = self.output_file + '.old'
+            if os.path.exists(old_dir):
+                shutil.rmtree(old_dir)
+            if os.path.exists(self.output_file):
+                os.replace(self.output_file, old_dir)
+            os.replace(self._tmp_dir, self.output_file)
+            if os.path.exists(old_dir):
+                shutil.rmtree(old_dir)
+        return self.rows_written
+
+    def abort(self):
+        """放弃写入，删除临时目录"""
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ColumnStore:
+    def __init__(self, root=DEFAULT_STORE_ROOT):
+        """初始化列式存储
+
+        Args:
+            root: str, 存储根目录，分区目录为 {root}/{year}Q{quarter}/{report_type}
+        """
+        self.root = root
+
+    def partition_dir(self, year, quarter, report_type):
+        return os.path.join(self.root, f"{year}Q{quarter}", report_type)
+
+    def lock(self, year, quarter, report_type):
+        """分区的写入锁，检查分区版本后再导入时应持有该锁"""
+        return partition_lock(self.partition_dir(year, quarter, report_type))
+
+    def has_partition(self, year, quarter, report_type):
+        return os.path.exists(os.path.join(self.partition_dir(year, quarter, report_type), SCHEMA_FILE))
+
+    def version(self, year, quarter, report_type):
+        """分区的版本标识（表结构文件的修改时间），分区被重写后改变；分区不存在时返回None"""
+        path = os.path.join(self.partition_dir(year, quarter, report_type), SCHEMA_FILE)
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def partitions(self):
+        """列出已存储的所有分区
+
+        Returns:
+            list: [(year, quarter, report_type), ...]，按时间排序
+        """
+        result = []
+        for path in glob.glob(os.path.join(self.root, '*Q*', '*', SCHEMA_FILE)):
+            period_dir, report_type = os.path.split(os.path.dirname(path))
+            if '.' in report_type:
+                # 写入中的临时目录
+                continue
+            match = re.fullmatch(r'(\d{4})Q(\d)', os.path.basename(period_dir))
+            if match:
+                result.append((int(match.group(1)), int(match.group(2)), report_type))
+        return sorted(result)
+
+    def quarters(self, report_types=None):
+        """列出已存储的所有季度 [(year, quarter), ...]
+
+        Args:
+            report_types: list, 只统计有这些报表类型分区的季度（只有衍生指标或快照的季度不算），None表示任意分区
+        """
+        return sorted(set((year, quarter) for year, quarter, report_type in self.partitions()
+                          if report_types is None or report_type in report_types))
+
+    def open_writer(self, year, quarter, report_type, columns, batch_rows=DEFAULT_BATCH_ROWS, kinds=None):
+        """创建分区写入器"""
+        os.makedirs(os.path.join(self.root, f"{year}Q{quarter}"), exist_ok=True)
+        return ColumnPartitionWriter(self.partition_dir(year, quarter, report_type),
+                                     columns, batch_rows, kinds)
+
+    def write(self, year, quarter, report_type, df, kinds=None):
+        """整体写入一个分区"""
+        with self.open_writer(year, quarter, report_type, df.columns, kinds=kinds) as writer:
+            writer.append(df)
+        return len(df)
+
+    def schema(self, year, quarter, report_type):
+        """读取分区的表结构"""
+        path = os.path.join(self.partition_dir(year, quarter, report_type), SCHEMA_FILE)
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _dictionary(self, partition_dir, col):
+        with open(os.path.join(partition_dir, f"{col}.dict.json"), encoding='utf-8') as f:
+            return json.load(f)
+
+    def _column(self, partition_dir, col_schema, rows):
+        """以内存映射方式打开一列，不复制数据"""
+        if rows == 0:
+            return np.empty(0, dtype=col_schema['dtype'])
+        return np.memmap(os.path.join(partition_dir, f"{col_schema['name']}.bin"),
+                         dtype=col_schema['dtype'], mode='r', shape=(rows,))
+
+    def read_arrays(self, year, quarter, report_type, columns=None, codes=None, stat_date=None):
+        """读取分区的原始列数组
+
+        先只读取code/statDate列计算行过滤结果，再读取投影列并取出对应的行。
+        未指定过滤条件时返回的是内存映射数组本身。
+
+        Args:
+            columns: list, 需要读取的列，None表示全部
+            codes: list, 只保留这些股票代码的行
+            stat_date: tuple, (起始日期, 截止日期)，只保留statDate在该区间内的行，None表示不限
+
+        Returns:
+            tuple: (arrays, dictionaries)
+            - arrays: dict, {列名: numpy数组}，字典编码列为int32编号
+            - dictionaries: dict, {列名: 字典值列表}
+        """
+        partition_dir = self.partition_dir(year, quarter, report_type)
+        schema = self.schema(year, quarter, report_type)
+        rows = schema['rows']
+        col_schemas = {c['name']: c for c in schema['columns']}
+        if columns is None:
+            columns = list(col_schemas)
+        missing = [col for col in columns if col not in col_schemas]
+        if missing:
+            raise KeyError(f"分区 {year}Q{quarter}/{report_type} 中没有列: {missing}")
+
+        # 谓词下推：仅凭过滤列确定需要的行
+        selected = None
+        if codes is not None:
+            dictionary = self._dictionary(partition_dir, 'code')
+            wanted = set(codes)
+            ids = [i for i, value in enumerate(dictionary) if value in wanted]
+            selected = np.isin(self._column(partition_dir, col_schemas['code'], rows), ids)
+        if stat_date is not None:
+            start, end = stat_date
+            dates = self._column(partition_dir, col_schemas['statDate'], rows)
+            in_range = np.ones(rows, dtype=bool)
+            if start is not None:
+                in_range &= dates >= np.datetime64(pd.Timestamp(start).date(), 'D')
+            if end is not None:
+                in_range &= dates <= np.datetime64(pd.Timestamp(end).date(), 'D')
+            selected = in_range if selected is None else selected & in_range
+        row_index = None if selected is None else np.flatnonzero(selected)
+
+        arrays = {}
+        dictionaries = {}
+        for col in columns:
+            array = self._column(partition_dir, col_schemas[col], rows)
+            arrays[col] = array if row_index is None else array[row_index]
+            if col_schemas[col]['kind'] in ('category', 'text'):
+                dictionaries[col] = self._dictionary(partition_dir, col)
+        return arrays, dictionaries
+
+    def read(self, year, quarter, report_type, columns=None, codes=None, stat_date=None, labels=False):
+        """读取分区为DataFrame，参数同read_arrays
+
+        Args:
+            labels: bool, 是否将列名显示为 英文名(中文名) 形式
+
+        Returns:
+            DataFrame: 数值列为float64，日期列为datetime64，code为category
+        """
+        arrays, dictionaries = self.read_arrays(year, quarter, report_type, columns, codes, stat_date)
+        kinds = {c['name']: c['kind'] for c in self.schema(year, quarter, report_type)['columns']}
+        data = {}
+        for col, array in arrays.items():
+            kind = kinds[col]
+            if col in dictionaries:
+                values = np.asarray(dictionaries[col], dtype=object)
+                if kind == 'category':
+                    data[col] = pd.Categorical.from_codes(array, categories=values)
+                elif len(values) == 0:
+                    # 整列为空时字典也为空，无法按编号取值
+                    data[col] = np.full(len(array), None, dtype=object)
+                else:
+                    data[col] = np.where(array >= 0, values.take(array, mode='clip'), None)
+            else:
+                data[col] = np.asarray(array)
+        df = pd.DataFrame(data, columns=list(arrays), copy=False)
+        return apply_labels(df) if labels else df
+
+    def import_csv(self, year, quarter, report_type, csv_file):
+        """将CSV格式的报表导入为分区"""
+        with self.lock(year, quarter, report_type):
+            df = decode_frame(pd.read_csv(csv_file, dtype=str, keep_default_na=False))
+            return self.write(year, quarter, report_type, df)
+
+    def import_csv_dir(self, year, quarter, csv_dir, report_types):
+        """导入采集程序输出的CSV目录（{report_type}_all.csv）
+
+        Returns:
+            list: 成功导入的报表类型
+        """
+        imported = []
+        for report_type in report_types:
+            csv_file = os.path.join(csv_dir, f"{report_type}_all.csv")
+            if os.path.exists(csv_file):
+                self.import_csv(year, quarter, report_type, csv_file)
+                imported.append(report_type)
+        return imported
+
+    def export_csv(self, year, quarter, report_type, output_file, columns=None, labels=False):
+        """将分区导出为CSV文件（UTF-8-BOM，与采集程序原有的输出格式一致）
+
+        labels为True时列名为 英文名(中文名) 形式
+        """
+        df = self.read(year, quarter, report_type, columns=columns, labels=labels)
+        df.to_csv(output_file, index=False, encoding='utf-8-sig')
+        return len(df)
@@ -0,0 +1,233 @@
+"""
+财务数据加载模块
+通过列式存储读取各季度的财务报表，加上衍生指标，合并为筛选所需的宽表；
+合并结果按季度物化为快照，源数据未变化时直接读取快照
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+
+import pandas as pd
+
+from columnar_store import ColumnStore, DEFAULT_STORE_ROOT
+from derived_indicators import DerivedEngine
+from indicator_labels import apply_labels, raw_name
+from metrics import get_registry
+from result_decoder import field_kind
+from screen_engine import stamp_version
+
+# 合并后的宽表（快照）在列式存储中的报表类型名称
+SNAPSHOT_REPORT = 'snapshot'
+
+# 记录快照所依据的源数据版本
+SNAPSHOT_META_FILE = 'snapshot.json'
+
+# 快照合并的报表，第一个报表决定行的范围和顺序
+SNAPSHOT_REPORTS = ['balance', 'profit', 'indicators']
+
+
+def _csv_file(year, quarter, report_type):
+    return os.path.join(f"financial_data_all_{year}Q{quarter}", f"{report_type}_all.csv")
+
+
+def ensure_partition(store, year, quarter, report_type):
+    """确保分区存在且不比采集程序输出的CSV旧
+
+    分区不存在，或CSV在分区写入之后被修改过时，从CSV（重新）导入。
+    检查和导入在分区锁内进行，多个线程同时调用时只导入一次。
+
+    Returns:
+        bool: 分区是否可用
+    """
+    csv_file = _csv_file(year, quarter, report_type)
+    with store.lock(year, quarter, report_type):
+        version = store.version(year, quarter, report_type)
+        if os.path.exists(csv_file) and (version is None or os.stat(csv_file).st_mtime_ns > version):
+            store.import_csv(year, quarter, report_type, csv_file)
+            return True
+        return version is not None
+
+
+def load_report(store, year, quarter, report_type, columns=None):
+    """读取一个季度的一类报表
+
+    分区不存在或比采集程序输出的CSV（financial_data_all_{year}Q{quarter}）旧时，从CSV导入。
+
+    Args:
+        store: ColumnStore, 列式存储
+        columns: list, 需要的指标列（原始英文名），None表示全部；
+            code和stock_name总会读取，分区中没有的列会被忽略
+
+    Returns:
+        DataFrame: 报表数据，分区和CSV均不存在时抛出FileNotFoundError
+    """
+    if not ensure_partition(store, year, quarter, report_type):
+        raise FileNotFoundError(
+            f"没有{year}Q{quarter}的{report_type}数据: {store.partition_dir(year, quarter, report_type)}, "
+            f"{_csv_file(year, quarter, report_type)}")
+
+    if columns is not None:
+        available = [c['name'] for c in store.schema(year, quarter, report_type)['columns']]
+        columns = [col for col in available if col in ('code', 'stock_name') or col in columns]
+    return store.read(year, quarter, report_type, columns=columns)
+
+
+def available_quarters(store):
+    """列出可加载的所有季度：列式存储中已有报表分区的季度，以及尚未导入的CSV目录
+
+    Returns:
+        list: [(year, quarter), ...]，按时间排序
+    """
+    quarters = set(store.quarters(SNAPSHOT_REPORTS))
+    for path in glob.glob('financial_data_all_*'):
+        match = re.fullmatch(r'financial_data_all_(\d{4})Q(\d)', os.path.basename(path))
+        if match:
+            quarters.add((int(match.group(1)), int(match.group(2))))
+    return sorted(quarters)
+
+
+def source_versions(store, year, quarter):
+    """一个季度各报表分区和来源CSV的版本（修改时间），只做stat，不导入也不读取数据
+
+    Returns:
+        tuple: ((report_type, 分区版本, CSV修改时间), ...)，不存在的为None
+    """
+    versions = []
+    for report_type in SNAPSHOT_REPORTS:
+        csv_file = _csv_file(year, quarter, report_type)
+        versions.append((report_type, store.version(year, quarter, report_type),
+                         os.stat(csv_file).st_mtime_ns if os.path.exists(csv_file) else None))
+    return tuple(versions)
+
+
+def _snapshot_sources(store, engine, year, quarter):
+    """快照所依据的源数据版本：各报表分区的版本，以及各衍生指标的定义和输入分区版本"""
+    sources = {}
+    for report_type in SNAPSHOT_REPORTS:
+        if not ensure_partition(store, year, quarter, report_type):
+            raise FileNotFoundError(
+                f"没有{year}Q{quarter}的{report_type}数据: {store.partition_dir(year, quarter, report_type)}, "
+                f"{_csv_file(year, quarter, report_type)}")
+        sources[report_type] = store.version(year, quarter, report_type)
+    sources['derived'] = {name: [engine.signature(name), engine.inputs(name, year, quarter)]
+                          for name in engine.definitions}
+    return sources
+
+
+def _build_snapshot(store, engine, year, quarter):
+    """合并各报表和衍生指标，写入快照分区"""
+    balance_data = load_report(store, year, quarter, 'balance')
+    profit_data = load_report(store, year, quarter, 'profit')
+    indicators_data = load_report(store, year, quarter, 'indicators')
+
+    # 衍生指标放在利润表之后
+    if engine.definitions:
+        profit_data = profit_data.merge(engine.compute(year, quarter), on='code', how='left')
+
+    # 合并数据
+    merged_data = balance_data.merge(profit_data, on=['code', 'stock_name'], how='left')
+    merged_data = merged_data.merge(indicators_data, on=['code', 'stock_name'], how='left')
+
+    # 快照中每只股票一行，code的编号才等于行号
+    duplicated = merged_data['code'][merged_data['code'].duplicated()].astype(str).unique()
+    if len(duplicated):
+        raise ValueError(f"{year}Q{quarter}的报表中有重复的股票: {', '.join(duplicated[:10])}")
+
+    # 多张报表都有的列合并后带有 _x/_y 后缀，按数据类型指定存储类型
+    kinds = {col: 'date' for col in merged_data.columns
+             if pd.api.types.is_datetime64_any_dtype(merged_data[col])}
+    kinds.update({col: field_kind(col) for col in ('code', 'stock_name')})
+    store.write(year, quarter, SNAPSHOT_REPORT, merged_data, kinds=kinds)
+    return merged_data
+
+
+def load_snapshot(store, engine, year, quarter, columns=None, codes=None):
+    """读取一个季度合并好的宽表
+
+    快照中每只股票一行，code和stock_name字典编码存储，code的编号即该股票在快照中的行号
+    （构建时检查股票代码唯一，合并结果中有重复的股票时抛出ValueError）。
+    任一报表分区、来源CSV或衍生指标的定义/输入发生变化时自动重建。
+
+    Args:
+        store: ColumnStore, 列式存储
+        engine: DerivedEngine, 衍生指标引擎
+        columns: list, 需要的列（原始名称），None表示全部；code和stock_name总会读取
+        codes: list, 只读取这些股票（按代码列预先过滤，不读取其他行）
+
+    Returns:
+        DataFrame: 合并后的数据，code为category；读取完整快照时attrs['data_version']为快照的版本
+    """
+    metrics = get_registry()
+    with metrics.timer('loader_phase_seconds', phase='sources'):
+        sources = _snapshot_sources(store, engine, year, quarter)
+    meta_path = os.path.join(store.root, f"{year}Q{quarter}", SNAPSHOT_META_FILE)
+    meta = None
+    if store.has_partition(year, quarter, SNAPSHOT_REPORT) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    if meta != sources:
+        with metrics.timer('loader_phase_seconds', phase='build'):
+            _build_snapshot(store, engine, year, quarter)
+            # 构建过程中可能从CSV导入了往期分区，重新记录版本
+            sources = _snapshot_sources(store, engine, year, quarter)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(sources, f, ensure_ascii=False)
+        metrics.inc('loader_snapshot_builds_total')
+
+    if columns is not None:
+        available = [c['name'] for c in store.schema(year, quarter, SNAPSHOT_REPORT)['columns']]
+        # 合并时加了 _x/_y 后缀的列按原始名称也能选中
+        columns = [col for col in available if col in ('code', 'stock_name') or col in columns
+                   or re.sub(r'_[xy]$', '', col) in columns]
+    with metrics.timer('loader_phase_seconds', phase='read'):
+        df = store.read(year, quarter, SNAPSHOT_REPORT, columns=columns, codes=codes)
+    if codes is None:
+        # 只读取部分股票时不是完整快照，不标记版本
+        stamp_version(df, hashlib.sha1(
+            json.dumps([year, quarter, sources], sort_keys=True).encode('utf-8')).hexdigest())
+    return df
+
+
+def load_financial_data(year, quarter, columns=None, store_root=DEFAULT_STORE_ROOT, labels=True,
+                        engine=None):
+    """加载一个季度的资产负债表、利润表和财务指标并合并
+
+    衍生指标（如净利润同比增长率netProfit_growth）由衍生指标引擎计算，
+    可以和原始指标一样直接用于筛选。合并结果物化为快照，源数据未变化时直接读取。
+    返回的数据标记了快照版本，StockScreener据此缓存筛选结果（原地修改后应删除 attrs['data_version']）。
+
+    Args:
+        year: int, 年份
+        quarter: int, 季度
+        columns: list, 只读取这些指标列（原始名称、带中文标签的名称或衍生指标名称均可），None表示全部
+        store_root: str, 列式存储目录
+        labels: bool, 是否将列名显示为 英文名(中文名) 形式（只改列名，不复制数据）
+        engine: DerivedEngine, 衍生指标引擎，默认使用内置的衍生指标
+
+    Returns:
+        DataFrame: 合并后的数据；加载失败时返回None
+    """
+    store = ColumnStore(store_root)
+    if engine is None:
+        engine = DerivedEngine(store)
+    if columns is not None:
+        columns = [raw_name(col) for col in columns]
+    metrics = get_registry()
+    start = time.perf_counter()
+    try:
+        merged_data = load_snapshot(store, engine, year, quarter, columns)
+        version = merged_data.attrs['data_version']
+        if labels:
+            with metrics.timer('loader_phase_seconds', phase='labels'):
+                merged_data = apply_labels(merged_data)
+        metrics.observe('loader_seconds', time.perf_counter() - start)
+        metrics.inc('loader_rows_total', len(merged_data))
+        return stamp_version(merged_data, version)
+    except Exception as e:
+        metrics.inc('loader_errors_total')
+        print(f"Error loading data: {e}")
+        return None
@@ -0,0 +1,339 @@
+"""
+衍生指标模块
+衍生指标用表达式声明（原始字段、其他衍生指标、往期数据），
+按依赖关系向量化计算，结果按季度缓存在列式存储中，输入数据未变化的季度不再重新计算
+"""
+
+import ast
+import json
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import ColumnStore, DEFAULT_STORE_ROOT
+from stock_data_collector import REPORT_FIELDS
+
+# 内置的衍生指标：名称 -> 表达式
+# 可用的函数：
+# - lag(x, n): n个季度之前的x
+# - yoy(x): 同比增长率 (x - 去年同期) / |去年同期|
+# - qoq(x): 环比增长率 (x - 上季度) / |上季度|
+# - ttm(x): 滚动12个月合计，用于累计值字段（如利润表中的年初至今净利润）
+# - abs(x): 绝对值
+DERIVED_INDICATORS = {
+    'netProfit_last_year': 'lag(netProfit, 4)',
+    'netProfit_growth': 'yoy(netProfit)',
+    'netProfit_scale': 'netProfit / 100000000',
+    'netProfit_ttm': 'ttm(netProfit)',
+    'MBRevenue_growth': 'yoy(MBRevenue)',
+    'MBRevenue_ttm': 'ttm(MBRevenue)',
+}
+
+# 衍生指标在列式存储中的报表类型名称
+DERIVED_REPORT = 'derived'
+
+# 记录各衍生指标的表达式和输入分区版本
+DERIVED_META_FILE = 'derived.json'
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+# 函数名 -> 参数个数
+_FUNCTIONS = {'lag': 2, 'yoy': 1, 'qoq': 1, 'ttm': 1, 'abs': 1}
+
+
+def _validate(node, expression):
+    """只允许四则运算、数字、字段名和内置函数"""
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        _validate(node.left, expression)
+        _validate(node.right, expression)
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        _validate(node.operand, expression)
+    elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        pass
+    elif isinstance(node, ast.Name):
+        pass
+    elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+          and node.func.id in _FUNCTIONS and not node.keywords
+          and len(node.args) == _FUNCTIONS[node.func.id]):
+        if node.func.id == 'lag':
+            lag = node.args[1]
+            if not (isinstance(lag, ast.Constant) and isinstance(lag.value, int) and lag.value >= 0):
+                raise ValueError(f"lag的第二个参数必须是非负整数: {expression}")
+        _validate(node.args[0], expression)
+    else:
+        raise ValueError(f"不支持的表达式: {ast.unparse(node)}（{expression}）")
+
+
+def parse_expression(expression):
+    """解析并检查表达式，返回语法树"""
+    node = ast.parse(expression, mode='eval').body
+    _validate(node, expression)
+    return node
+
+
+def _references(node):
+    """表达式中引用的名称（字段或衍生指标）"""
+    return set(n.id for n in ast.walk(node)
+               if isinstance(n, ast.Name) and n.id not in _FUNCTIONS)
+
+
+def _shift(year, quarter, lag):
+    """往前推lag个季度"""
+    index = year * 4 + quarter - 1 - lag
+    return index // 4, index % 4 + 1
+
+
+def _field_report(field):
+    for report_type, fields in REPORT_FIELDS.items():
+        if field in fields:
+            return report_type
+    return None
+
+
+class DerivedEngine:
+    def __init__(self, store=None, definitions=None):
+        """初始化衍生指标引擎
+
+        Args:
+            store: ColumnStore, 列式存储，默认为DEFAULT_STORE_ROOT
+            definitions: dict, {名称: 表达式}，默认为DERIVED_INDICATORS
+        """
+        self.store = store or ColumnStore(DEFAULT_STORE_ROOT)
+        self.definitions = dict(DERIVED_INDICATORS if definitions is None else definitions)
+        self._trees = {name: parse_expression(expression) for name, expression in self.definitions.items()}
+        # 最近一次compute中重新计算的指标
+        self.recomputed = []
+        self._check_cycles()
+
+    def define(self, name, expression):
+        """声明（或替换）一个衍生指标"""
+        tree = parse_expression(expression)
+        old = self.definitions.get(name), self._trees.get(name)
+        self.definitions[name] = expression
+        self._trees[name] = tree
+        try:
+            self._check_cycles()
+        except ValueError:
+            if old[0] is None:
+                del self.definitions[name], self._trees[name]
+            else:
+                self.definitions[name], self._trees[name] = old
+            raise
+
+    def _check_cycles(self):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"衍生指标存在循环依赖: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for ref in _references(self._trees[name]):
+                if ref in self._trees:
+                    visit(ref, path + [name])
+            state[name] = 'done'
+
+        for name in self._trees:
+            visit(name, [])
+
+    def signature(self, name):
+        """指标的完整定义（含所依赖衍生指标的定义），定义变化时缓存失效"""
+        refs = sorted(ref for ref in _references(self._trees[name]) if ref in self._trees)
+        return ';'.join([self.definitions[name]] + [f"{ref}={self.signature(ref)}" for ref in refs])
+
+    def inputs(self, name, year, quarter):
+        """指标在某季度用到的全部原始报表分区及其当前版本
+
+        Returns:
+            dict: {"year/quarter/report_type": 版本}，分区不存在时版本为None
+        """
+        partitions = set()
+        self._collect_inputs(self._trees[name], year, quarter, partitions)
+        return {f"{y}/{q}/{report_type}": self.store.version(y, q, report_type)
+                for y, q, report_type in sorted(partitions)}
+
+    def _collect_inputs(self, node, year, quarter, partitions):
+        if isinstance(node, ast.Name):
+            if node.id in self._trees:
+                self._collect_inputs(self._trees[node.id], year, quarter, partitions)
+            else:
+                report_type = _field_report(node.id)
+                if report_type is None:
+                    raise KeyError(f"未知的字段: {node.id}")
+                partitions.add((year, quarter, report_type))
+        elif isinstance(node, ast.Call):
+            func = node.func.id
+            arg = node.args[0]
+            if func == 'lag':
+                periods = [_shift(year, quarter, node.args[1].value)]
+            elif func == 'ttm':
+                periods = [(year, quarter)] if quarter == 4 else [(year, quarter), (year - 1, 4), (year - 1, quarter)]
+            elif func in ('yoy', 'qoq'):
+                periods = [(year, quarter), _shift(year, quarter, 4 if func == 'yoy' else 1)]
+            else:
+                periods = [(year, quarter)]
+            for period in periods:
+                self._collect_inputs(arg, *period, partitions)
+        else:
+            for child in ast.iter_child_nodes(node):
+                self._collect_inputs(child, year, quarter, partitions)
+
+    def _meta_path(self, year, quarter):
+        return os.path.join(self.store.root, f"{year}Q{quarter}", DERIVED_META_FILE)
+
+    def _load_meta(self, year, quarter):
+        path = self._meta_path(year, quarter)
+        if not os.path.exists(path) or not self.store.has_partition(year, quarter, DERIVED_REPORT):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def compute(self, year, quarter, names=None):
+        """计算一个季度的衍生指标
+
+        股票范围为该季度各报表中出现的全部股票，该季度没有任何报表时抛出FileNotFoundError。
+        已缓存且输入未变化的指标直接读取，其余指标重新计算后与有效的缓存一起写回列式存储。
+
+        Args:
+            year: int, 年份
+            quarter: int, 季度
+            names: list, 需要的指标，默认为全部已声明的指标
+
+        Returns:
+            DataFrame: code列及各衍生指标列（float64）
+        """
+        # data_loader依赖本模块，在此处导入以避免循环引用
+        from data_loader import load_report
+
+        names = list(self.definitions) if names is None else list(names)
+        unknown = [name for name in names if name not in self.definitions]
+        if unknown:
+            raise KeyError(f"未声明的衍生指标: {unknown}")
+
+        # 股票范围
+        universe_inputs = {}
+        codes = []
+        for report_type in REPORT_FIELDS:
+            try:
+                df = load_report(self.store, year, quarter, report_type, [])
+            except FileNotFoundError:
+                continue
+            universe_inputs[f"{year}/{quarter}/{report_type}"] = self.store.version(year, quarter, report_type)
+            codes.extend(df['code'].astype(str))
+        if not universe_inputs:
+            # 没有报表数据时不写入衍生指标分区，流水线也不会把该阶段记为已完成
+            raise FileNotFoundError(f"没有{year}Q{quarter}的报表数据")
+        codes = pd.Index(pd.unique(np.asarray(codes, dtype=object)), dtype=object)
+
+        # 读取有效的缓存
+        meta = self._load_meta(year, quarter)
+        columns = {}
+        entries = {}
+        if meta is not None and meta['universe'] == universe_inputs:
+            cached_names = [name for name, entry in meta['columns'].items()
+                            if name in self.definitions and entry['signature'] == self.signature(name)
+                            and entry['inputs'] == self.inputs(name, year, quarter)]
+            if cached_names:
+                cached = self.store.read(year, quarter, DERIVED_REPORT, columns=['code'] + cached_names)
+                rows = pd.Index(cached['code'].astype(str)).get_indexer(codes)
+                for name in cached_names:
+                    columns[name] = np.where(rows >= 0, cached[name].to_numpy()[rows], np.nan)
+                    entries[name] = meta['columns'][name]
+
+        self.recomputed = [name for name in names if name not in columns]
+        if self.recomputed:
+            evaluator = _Evaluator(self, codes, load_report)
+            for name in self.recomputed:
+                # 先收集输入分区，引用了未知字段时在这里报错
+                self.inputs(name, year, quarter)
+                columns[name] = evaluator.derived(name, year, quarter)
+            # 求值时可能从CSV导入了往期分区，输入版本在求值之后记录
+            for name in self.recomputed:
+                entries[name] = {'signature': self.signature(name), 'inputs': self.inputs(name, year, quarter)}
+            # 写回缓存（包括本次未请求但仍然有效的指标）
+            df = pd.DataFrame({'code': codes.to_numpy(), **columns})
+            self.store.write(year, quarter, DERIVED_REPORT, df)
+            with open(self._meta_path(year, quarter), 'w', encoding='utf-8') as f:
+                json.dump({'universe': universe_inputs, 'columns': entries}, f, ensure_ascii=False, indent=1)
+
+        return pd.DataFrame({'code': codes.to_numpy(), **{name: columns[name] for name in names}})
+
+
+class _Evaluator:
+    def __init__(self, engine, codes, load_report):
+        """在固定的股票范围上求值表达式，结果均为与codes对齐的float64数组"""
+        self.engine = engine
+        self.codes = codes
+        self.load_report = load_report
+        self._fields = {}
+        self._derived = {}
+
+    def field(self, field, year, quarter):
+        """原始字段，报表不存在或股票没有数据时为NaN"""
+        key = (field, year, quarter)
+        if key not in self._fields:
+            try:
+                df = self.load_report(self.engine.store, year, quarter, _field_report(field), [field])
+            except FileNotFoundError:
+                df = None
+            values = np.full(len(self.codes), np.nan)
+            if df is not None and field in df.columns:
+                df = df.drop_duplicates('code', keep='last')
+                rows = self.codes.get_indexer(df['code'].astype(str))
+                found = rows >= 0
+                values[rows[found]] = pd.to_numeric(df[field], errors='coerce').to_numpy(
+                    dtype='float64', na_value=np.nan)[found]
+            self._fields[key] = values
+        return self._fields[key]
+
+    def derived(self, name, year, quarter):
+        key = (name, year, quarter)
+        if key not in self._derived:
+            result = self.evaluate(self.engine._trees[name], year, quarter)
+            self._derived[key] = np.broadcast_to(np.asarray(result, dtype='float64'), len(self.codes)).copy()
+        return self._derived[key]
+
+    def evaluate(self, node, year, quarter):
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in self.engine._trees:
+                return self.derived(node.id, year, quarter)
+            return self.field(node.id, year, quarter)
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY_OPS[type(node.op)](self.evaluate(node.operand, year, quarter))
+        if isinstance(node, ast.BinOp):
+            left = self.evaluate(node.left, year, quarter)
+            right = self.evaluate(node.right, year, quarter)
+            with np.errstate(all='ignore'):
+                return _BINARY_OPS[type(node.op)](left, right)
+
+        func = node.func.id
+        arg = node.args[0]
+        if func == 'abs':
+            return np.abs(self.evaluate(arg, year, quarter))
+        if func == 'lag':
+            return self.evaluate(arg, *_shift(year, quarter, node.args[1].value))
+        current = self.evaluate(arg, year, quarter)
+        if func == 'ttm':
+            if quarter == 4:
+                return current
+            # 本期累计 + 上年全年 - 上年同期累计
+            return current + self.evaluate(arg, year - 1, 4) - self.evaluate(arg, year - 1, quarter)
+        previous = self.evaluate(arg, *_shift(year, quarter, 4 if func == 'yoy' else 1))
+        with np.errstate(all='ignore'):
+            return (current - previous) / np.abs(previous)
@@ -0,0 +1,111 @@
+"""
+指标显示名称模块
+保存各指标的中文名称，在读取或展示数据时为列名加上 英文名(中文名) 形式的标签，
+原始数据本身不做复制或改写
+"""
+
+import re
+
+# 定义各个报表指标的中文名称映射
+INDICATOR_NAMES = {
+    # 利润表指标
+    'roeAvg': '平均净资产收益率',
+    'npMargin': '净利率',
+    'gpMargin': '毛利率',
+    'netProfit': '净利润',
+    'epsTTM': '每股收益(TTM)',
+    'MBRevenue': '主营业务收入',
+    'totalShare': '总股本',
+    'liqaShare': '流通股本',
+    
+    # 资产负债表指标
+    'currentRatio': '流动比率',
+    'quickRatio': '速动比率',
+    'cashRatio': '现金比率',
+    'YOYLiability': '负债同比增长率',
+    'liabilityToAsset': '资产负债率',
+    'assetToEquity': '权益乘数',
+    
+    # 现金流量表指标
+    'CAToAsset': '流动资产/总资产',
+    'NCAToAsset': '非流动资产/总资产',
+    'tangibleAssetToAsset': '有形资产/总资产',
+    'ebitToInterest': '已获利息倍数(EBIT/利息费用)',
+    'CFOToOR': '经营活动产生的现金流量净额/营业收入',
+    'CFOToNP': '经营活动产生的现金流量净额/净利润',
+    'CFOToGr': '经营活动产生的现金流量净额/营业总收入',
+    
+    # 财务指标
+    'dupontROE': '净资产收益率',
+    'dupontAssetStoEquity': '权益乘数',
+    'dupontAssetTurn': '总资产周转率',
+    'dupontPnitoni': '净利润/营业总收入',
+    'dupontNitogr': '净利润/营业总收入',
+    'dupontTaxBurden': '税负比率',
+    'dupontIntburden': '利息负担',
+    'dupontEbittogr': 'EBIT/营业总收入',
+    
+    # 通用字段
+    'code': '股票代码',
+    'pubDate': '发布日期',
+    'statDate': '统计截止日',
+    'stock_name': '股票名称'
+}
+
+_LABEL_PATTERN = re.compile(r'^(\w+)\((.*)\)$')
+
+# 多张报表都有的列合并后带有 _x/_y 后缀（如 pubDate_x）
+_MERGE_SUFFIX_PATTERN = re.compile(r'_[xy]$')
+
+
+def chinese_name(name):
+    """返回指标的中文名称，合并后带 _x/_y 后缀的列使用原指标的名称；没有中文名称时返回None"""
+    if name in INDICATOR_NAMES:
+        return INDICATOR_NAMES[name]
+    return INDICATOR_NAMES.get(_MERGE_SUFFIX_PATTERN.sub('', name))
+
+
+def label(name):
+    """返回指标的显示名称，如 roeAvg -> roeAvg(平均净资产收益率)、pubDate_x -> pubDate_x(发布日期)，
+    没有中文名称的指标保持原样"""
+    cn_name = chinese_name(name)
+    if cn_name is not None:
+        return f"{name}({cn_name})"
+    return name
+
+
+def raw_name(name):
+    """返回指标的原始英文名，如 roeAvg(平均净资产收益率) -> roeAvg，已是原始名称时保持原样"""
+    match = _LABEL_PATTERN.match(name)
+    if match and chinese_name(match.group(1)) == match.group(2):
+        return match.group(1)
+    return name
+
+
+def apply_labels(df):
+    """为DataFrame的列名加上中文标签
+
+    只修改列名，不复制数据。
+    """
+    return df.rename(columns={col: label(col) for col in df.columns if chinese_name(col) is not None})
+
+
+def strip_labels(df):
+    """去掉DataFrame列名中的中文标签，恢复原始英文名"""
+    return df.rename(columns={col: raw_name(col) for col in df.columns if raw_name(col) != col})
+
+
+def resolve_column(columns, name):
+    """在列名集合中查找指标，原始名称和带标签的名称均可
+
+    Args:
+        columns: 列名集合（如df.columns）
+        name: str, 指标名，如 roeAvg 或 roeAvg(平均净资产收益率)
+
+    Returns:
+        str: 实际存在的列名，找不到时抛出KeyError
+    """
+    for candidate in (name, label(name), raw_name(name)):
+        if candidate in columns:
+            return candidate
+    raise KeyError(name)
@@ -1,21 +1,223 @@
 """
 主程序入口
-整合所有模块，提供完整的程序功能
+整合所有模块，按依赖关系运行完整的处理流程：
+
+    collect ── import ── derived ── merge ── screen ──┬── report
+    valuation_fetch ──────────────────────────────────┴── valuation
+
+另有可选的 labels 阶段（导出带中文列名的CSV副本），只在作为目标指定时运行。
+
+每个阶段的输入和输出记录在 .pipeline_state.json 中，没有新数据时各阶段直接跳过；
+互不依赖的阶段（如估值数据获取和衍生指标计算）并发运行。
+
+本模块只导入标准库以及流水线调度和运行指标模块，pandas、baostock、matplotlib等依赖在阶段运行时才导入，
+--offline 时不运行需要网络的阶段，不导入baostock也不登录。
 """
 
-from stock_data_collector import StockDataCollector
-from stock_screener import StockScreener
-from stock_viewer import StockViewer
+import argparse
+import glob
+import os
+from datetime import date, datetime, timedelta
+
+from metrics import get_registry, DEFAULT_METRICS_JSON, DEFAULT_METRICS_PROM
+from pipeline import Pipeline, Stage, fingerprint_paths, DEFAULT_MAX_WORKERS, DEFAULT_STATE_FILE
+
+# 列式存储目录（与columnar_store.DEFAULT_STORE_ROOT一致，此处不导入以免启动时加载数据模块）
+STORE_ROOT = 'financial_store'
+
+# 采集的报表类型（与stock_data_collector.REPORT_FIELDS一致）
+REPORT_TYPES = ['profit', 'balance', 'cash_flow', 'indicators']
+
+# 筛选结果文件
+RESULTS_FILE = 'screener_results.csv'
+
+# 筛选结果附加估值数据后的文件
+VALUATION_RESULTS_FILE = 'screener_valuation.csv'
+
+# 访问baostock的阶段共用的资源锁（baostock在进程内只有一个全局连接）；--offline 时不运行这些阶段
+BAOSTOCK_LOCK = 'baostock'
+
+# 估值面板目录和获取的天数
+VALUATION_PANEL_DIR = 'valuation_panel'
+VALUATION_DAYS = 30
 
 
-def main():
-    # 初始化各个模块
-    collector = StockDataCollector()
+def default_quarter(today=None):
+    """默认处理的报告期：上一个已结束的季度"""
+    today = today or date.today()
+    quarter = (today.month - 1) // 3
+    return (today.year, quarter) if quarter else (today.year - 1, 4)
+
+
+# 流水线使用的筛选条件：(报表类型, 指标, add_filter的参数)；筛选阶段直接以此作为输入指纹，不需要导入pandas
+SCREEN_FILTERS = [
+    ('balance', 'liabilityToAsset', {'max_value': 0.006}),
+    ('profit', 'roeAvg', {'min_value': 0.15, 'allow_null': False}),
+    ('profit', 'npMargin', {'min_value': 0.15, 'allow_null': False}),
+    ('profit', 'netProfit_growth', {'min_value': 0.001, 'allow_null': False}),
+    ('indicators', 'dupontNitogr', {'min_value': 0.05, 'allow_null': False}),
+]
+
+# 衍生指标的定义所在的模块（定义和字段所属的报表），文件修改后衍生指标阶段重新运行
+DERIVED_SOURCES = ['derived_indicators.py', 'stock_data_collector.py']
+
+
+def build_screener():
+    """流水线使用的筛选条件"""
+    from stock_screener import StockScreener
+
     screener = StockScreener()
-    viewer = StockViewer()
-    
-    # TODO: 实现主程序逻辑
-    
-    
+    for report_type, indicator, conditions in SCREEN_FILTERS:
+        screener.add_filter(report_type, indicator, **conditions)
+    return screener
+
+
+def build_pipeline(year, quarter, workers=1, report_workers=None, state_file=DEFAULT_STATE_FILE):
+    """构建处理流程
+
+    各阶段用到的模块在阶段运行时才导入，跳过的阶段不加载对应的依赖。
+
+    Args:
+        year: int, 报告期年份
+        quarter: int, 报告期季度
+        workers: int, 财务数据采集的进程数
+        report_workers: int, 生成报告的进程数，默认为CPU核数
+        state_file: str, 状态文件路径
+
+    Returns:
+        Pipeline: 流水线
+    """
+    partition = os.path.join(STORE_ROOT, f"{year}Q{quarter}")
+    today = date.today().isoformat()
+
+    def collect():
+        # 增量采集：只请求尚未发布该期报表的股票，已发布的不再请求
+        from collect_all_financial_data import collect_all_financial_data
+        collect_all_financial_data(year, quarter, workers=workers, incremental=True, store_root=STORE_ROOT)
+
+    def collect_inputs():
+        from stock_data_collector import disclosure_deadline
+        # 法定披露截止日之前每天采集一次（期间陆续有公司发布报表），之后只取决于已有数据
+        # （需要重新采集时使用 --force collect）
+        return today if date.today() <= disclosure_deadline(year, quarter) else None
+
+    def import_partitions():
+        # 在分支阶段并发运行之前，把各季度的CSV导入（或刷新到）列式存储，分支阶段只读取分区
+        from columnar_store import ColumnStore
+        from data_loader import available_quarters, ensure_partition
+        store = ColumnStore(STORE_ROOT)
+        for y, q in available_quarters(store):
+            for report_type in REPORT_TYPES:
+                ensure_partition(store, y, q, report_type)
+
+    def import_inputs():
+        return fingerprint_paths(sorted(glob.glob(os.path.join('financial_data_all_*Q*', '*_all.csv'))))
+
+    def labels():
+        from add_chinese_names import add_chinese_names
+        add_chinese_names(year, quarter, STORE_ROOT)
+
+    def derived():
+        from columnar_store import ColumnStore
+        from derived_indicators import DerivedEngine
+        DerivedEngine(ColumnStore(STORE_ROOT)).compute(year, quarter)
+
+    def derived_inputs():
+        # 衍生指标还依赖往期分区（如同比用到去年同期），按定义所在的模块和全部原始分区的版本判断；
+        # 只做stat，不导入pandas（哪些指标需要重新计算由DerivedEngine按各自的定义和输入分区决定）
+        root = os.path.dirname(os.path.abspath(__file__))
+        schemas = sorted(path for report_type in REPORT_TYPES
+                         for path in glob.glob(os.path.join(STORE_ROOT, '*Q*', report_type, '_schema.json')))
+        return {'definitions': fingerprint_paths([os.path.join(root, name) for name in DERIVED_SOURCES]),
+                'partitions': fingerprint_paths(schemas)}
+
+    def merge():
+        from data_loader import load_financial_data
+        if load_financial_data(year, quarter, columns=[], store_root=STORE_ROOT) is None:
+            raise RuntimeError(f"{year}Q{quarter} 数据合并失败")
+
+    def screen():
+        from data_loader import load_financial_data
+        data = load_financial_data(year, quarter, store_root=STORE_ROOT)
+        if data is None:
+            raise RuntimeError(f"{year}Q{quarter} 数据加载失败")
+        results = build_screener().screen(data)
+        results.to_csv(RESULTS_FILE, index=False)
+        print(f"找到 {len(results)} 只符合条件的股票，已保存到 {RESULTS_FILE}")
+
+
+    def valuation_fetch():
+        from stock_data_collector import StockDataCollector
+        from valuation_panel import fetch_valuation_panel
+        start = (date.today() - timedelta(days=VALUATION_DAYS)).isoformat()
+        panel = fetch_valuation_panel(StockDataCollector(), start, today)
+        if len(panel.dates) == 0:
+            raise RuntimeError("未获取到估值数据")
+        panel.save(VALUATION_PANEL_DIR)
+
+    def valuation():
+        import pandas as pd
+        from valuation_panel import ValuationPanel
+        results = pd.read_csv(RESULTS_FILE)
+        ValuationPanel.load(VALUATION_PANEL_DIR).join(results).to_csv(
+            VALUATION_RESULTS_FILE, index=False, encoding='utf-8-sig')
+        print(f"估值数据已保存到 {VALUATION_RESULTS_FILE}")
+
+    def report():
+        from stock_report import generate_reports, DEFAULT_REPORT_DIR
+        generate_reports(results_file=RESULTS_FILE, output_dir=DEFAULT_REPORT_DIR, workers=report_workers,
+                         store_root=STORE_ROOT)
+
+    store_partitions = [os.path.join(partition, report_type) for report_type in REPORT_TYPES]
+    stages = [
+        Stage('collect', collect, inputs=collect_inputs, outputs=store_partitions,
+              params={'year': year, 'quarter': quarter}, lock=BAOSTOCK_LOCK),
+        Stage('valuation_fetch', valuation_fetch, inputs=lambda: today,
+              outputs=[VALUATION_PANEL_DIR], params={'days': VALUATION_DAYS}, lock=BAOSTOCK_LOCK),
+        Stage('import', import_partitions, deps=['collect'], inputs=import_inputs, outputs=store_partitions),
+        Stage('labels', labels, deps=['import'], outputs=[f"financial_data_all_{year}Q{quarter}_cn"],
+              optional=True),
+        Stage('derived', derived, deps=['import'], inputs=derived_inputs,
+              outputs=[os.path.join(partition, 'derived'), os.path.join(partition, 'derived.json')]),
+        Stage('merge', merge, deps=['derived'],
+              outputs=[os.path.join(partition, 'snapshot'), os.path.join(partition, 'snapshot.json')]),
+        Stage('screen', screen, deps=['merge'], inputs=lambda: SCREEN_FILTERS, outputs=[RESULTS_FILE]),
+        Stage('valuation', valuation, deps=['screen', 'valuation_fetch'], outputs=[VALUATION_RESULTS_FILE]),
+        Stage('report', report, deps=['screen'], outputs=['reports']),
+    ]
+    return Pipeline(stages, state_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='股票财务数据处理流程')
+    parser.add_argument('stages', nargs='*', help='只运行这些阶段（及其依赖），默认运行全部非可选阶段')
+    parser.add_argument('--year', type=int, help='报告期年份，默认为上一个已结束的季度')
+    parser.add_argument('--quarter', type=int, choices=[1, 2, 3, 4], help='报告期季度')
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help="强制重新运行的阶段，可重复；'all'表示全部")
+    parser.add_argument('--workers', type=int, default=1, help='采集的进程数')
+    parser.add_argument('--report-workers', type=int, help='生成报告的进程数，默认为CPU核数')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_MAX_WORKERS, help='同时运行的阶段数')
+    parser.add_argument('--offline', action='store_true',
+                        help='不运行需要访问baostock的阶段（采集、估值数据获取），只处理本地已有的数据')
+    parser.add_argument('--metrics-json', default=DEFAULT_METRICS_JSON, help='运行指标的JSON摘要文件，空字符串表示不导出')
+    parser.add_argument('--metrics-prom', default=DEFAULT_METRICS_PROM,
+                        help='运行指标的Prometheus文本文件，空字符串表示不导出')
+    args = parser.parse_args(argv)
+
+    year, quarter = default_quarter()
+    if args.year is not None:
+        year = args.year
+    if args.quarter is not None:
+        quarter = args.quarter
+    print(f"报告期 {year}Q{quarter}，开始于 {datetime.now():%Y-%m-%d %H:%M:%S}")
+
+    pipeline = build_pipeline(year, quarter, workers=args.workers, report_workers=args.report_workers)
+    skip = [stage.name for stage in pipeline.stages.values() if stage.lock == BAOSTOCK_LOCK] if args.offline else ()
+    results = pipeline.run(args.stages or None, force=args.force, max_workers=args.jobs, skip=skip)
+    get_registry().export(args.metrics_json, args.metrics_prom)
+    return 1 if any(status in ('failed', 'blocked') for status in results.values()) else 0
+
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,303 @@
+"""
+运行指标模块
+在采集、加载和筛选的关键路径上记录计数和耗时分布（固定分桶的直方图），
+开销为每次记录一次加锁和一次二分查找，可以常开。
+
+    from metrics import get_registry
+    registry = get_registry()
+    registry.inc('baostock_rows_total', len(df), api='query_profit_data')
+    with registry.timer('screen_phase_seconds', phase='evaluate'):
+        ...
+    registry.export('metrics.json', 'metrics.prom')
+
+结果可导出为JSON摘要（含分位数和吞吐量）和Prometheus文本格式（供node_exporter的textfile采集）。
+多进程采集时，工作进程用drain()取出本进程的指标随结果返回，主进程用merge()汇总。
+设置环境变量 STOCK_METRICS=0 可关闭记录。
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的分桶上界（秒），覆盖亚毫秒级的解码到数十秒的整体请求
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 默认导出文件
+DEFAULT_METRICS_JSON = 'metrics.json'
+DEFAULT_METRICS_PROM = 'metrics.prom'
+
+# JSON摘要中的吞吐量：名称 -> (计数器, 耗时直方图)，按相同标签相除
+RATES = {
+    'baostock_rows_per_second': ('baostock_rows_total', 'baostock_request_seconds'),
+    'store_rows_per_second': ('store_rows_written_total', 'store_write_seconds'),
+    'loader_rows_per_second': ('loader_rows_total', 'loader_seconds'),
+    'screen_rows_per_second': ('screen_rows_total', 'screen_seconds'),
+}
+
+# 导出时各指标的说明
+METRIC_HELP = {
+    'baostock_request_seconds': 'baostock请求耗时（单次尝试，含翻页和解码）',
+    'baostock_decode_seconds': 'baostock结果集解码耗时',
+    'baostock_throttle_seconds': '请求前在限速器上等待的时间',
+    'baostock_backoff_seconds': '失败重试前的退避等待时间',
+    'baostock_rows_total': 'baostock返回的行数',
+    'baostock_errors_total': 'baostock请求失败次数（每次尝试）',
+    'baostock_retries_total': 'baostock请求重试次数',
+    'baostock_failures_total': '重试用尽后仍失败的请求数',
+    'baostock_logins_total': 'baostock登录次数',
+    'baostock_cache_hits_total': '命中本地查询缓存的请求数',
+    'store_write_seconds': '列式存储/CSV批量写入耗时',
+    'store_rows_written_total': '写入的行数',
+    'store_bytes_written_total': '写入的字节数',
+    'loader_phase_seconds': '财务数据加载各阶段耗时',
+    'loader_seconds': '财务数据加载总耗时',
+    'loader_rows_total': '加载的行数',
+    'loader_snapshot_builds_total': '重建快照的次数',
+    'loader_errors_total': '加载失败的次数',
+    'screen_phase_seconds': '筛选各阶段耗时',
+    'screen_seconds': '筛选总耗时',
+    'screen_rows_total': '参与筛选的行数',
+    'screen_matches_total': '筛选通过的行数',
+    'screen_cache_hits_total': '命中筛选结果缓存的次数',
+    'pipeline_stage_seconds': '流水线各阶段耗时',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _label_text(key):
+    return ','.join(f"{k}={v}" for k, v in key)
+
+
+def _prom_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        """固定分桶的直方图，counts比bounds多一个（超出最大上界）"""
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """按分桶线性插值估计分位数，结果限制在观测到的最小值和最大值之间"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= target:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                value = low + (high - low) * (target - cumulative) / n
+                return min(max(value, self.min), self.max)
+            cumulative += n
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS, enabled=True):
+        """初始化指标注册表（线程安全）
+
+        Args:
+            buckets: tuple, 直方图分桶上界（秒）
+            enabled: bool, 为False时不记录任何指标
+        """
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """计数器加value"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """向直方图记录一个值（耗时为秒）"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录with块的耗时（抛出异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        """计数器的当前值"""
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        """直方图（没有记录时返回None）"""
+        return self._histograms.get((name, _label_key(labels)))
+
+    def snapshot(self):
+        """全部指标的可序列化副本（可在进程间传递）"""
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            'counters': [[name, list(key), value] for (name, key), value in self._counters.items()],
+            'histograms': [[name, list(key), list(h.bounds), list(h.counts), h.count, h.sum, h.min, h.max]
+                           for (name, key), h in self._histograms.items()],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def drain(self):
+        """取出并清空当前指标，用于工作进程把增量交给主进程"""
+        with self._lock:
+            snapshot = self._snapshot()
+            self._counters.clear()
+            self._histograms.clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        """合并snapshot()/drain()的结果"""
+        with self._lock:
+            for name, key, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, key)))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, key, bounds, counts, count, total, low, high in snapshot['histograms']:
+                other = Histogram(bounds)
+                other.counts, other.count, other.sum, other.min, other.max = list(counts), count, total, low, high
+                key = (name, tuple(map(tuple, key)))
+                if key in self._histograms and self._histograms[key].bounds == other.bounds:
+                    self._histograms[key].merge(other)
+                else:
+                    self._histograms[key] = other
+
+    def summary(self):
+        """JSON摘要
+
+        Returns:
+            dict: {'counters': {名称: {标签: 值}},
+                   'histograms': {名称: {标签: {count, sum, mean, p50, p90, p99, min, max}}},
+                   'rates': {名称: {标签: 每秒行数}}}，没有标签时标签为空字符串
+        """
+        with self._lock:
+            counters = {}
+            for (name, key), value in sorted(self._counters.items()):
+                counters.setdefault(name, {})[_label_text(key)] = value
+            histograms = {}
+            for (name, key), h in sorted(self._histograms.items()):
+                histograms.setdefault(name, {})[_label_text(key)] = {
+                    'count': h.count, 'sum': h.sum, 'mean': h.sum / h.count if h.count else None,
+                    'p50': h.quantile(0.5), 'p90': h.quantile(0.9), 'p99': h.quantile(0.99),
+                    'min': h.min if h.count else None, 'max': h.max if h.count else None,
+                }
+        rates = {}
+        for rate, (counter, histogram) in RATES.items():
+            for label, value in counters.get(counter, {}).items():
+                seconds = histograms.get(histogram, {}).get(label, {}).get('sum')
+                if seconds:
+                    rates.setdefault(rate, {})[label] = value / seconds
+        return {'generated': time.strftime('%Y-%m-%d %H:%M:%S'), 'pid': os.getpid(),
+                'counters': counters, 'histograms': histograms, 'rates': rates}
+
+    def to_prometheus(self):
+        """Prometheus文本格式（计数器为counter，直方图为histogram，分桶上界单位为秒）"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            described = set()
+            for (name, key), value in counters:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_prom_labels(key)} {value}")
+            for (name, key), h in histograms:
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, n in zip(h.bounds, h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_prom_labels(key, [('le', repr(float(bound)))])} {cumulative}")
+                lines.append(f"{name}_bucket{_prom_labels(key, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{name}_sum{_prom_labels(key)} {h.sum}")
+                lines.append(f"{name}_count{_prom_labels(key)} {h.count}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, json_path=DEFAULT_METRICS_JSON, prom_path=DEFAULT_METRICS_PROM):
+        """导出JSON摘要和Prometheus文本文件（先写临时文件再替换，采集方不会读到半个文件）
+
+        Args:
+            json_path: str, JSON摘要路径，None表示不导出
+            prom_path: str, Prometheus文本文件路径，None表示不导出
+        """
+        for path, content in ((json_path, lambda: json.dumps(self.summary(), ensure_ascii=False, indent=1)),
+                              (prom_path, self.to_prometheus)):
+            if not path:
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content())
+            os.replace(tmp_path, path)
+
+
+# 进程内共用的注册表；fork出的子进程继承父进程已有的指标，需要时先调用reset()
+_registry = MetricsRegistry(enabled=os.environ.get('STOCK_METRICS', '1') != '0')
+
+
+def get_registry():
+    """返回进程内共用的指标注册表"""
+    return _registry
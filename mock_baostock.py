@@ -0,0 +1,454 @@
+"""
+baostock模拟接口
+离线生成形状接近真实数据的证券列表、财务报表（利润、资产负债、现金流量、杜邦指标）、
+交易日和日线行情，接口与baostock模块相同（login/logout/query_*，返回分页的结果集），
+可配置每次请求的延迟和失败率，用于离线测试和性能测试：
+
+    session = BaostockSession(api=MockBaostock(stocks=5000, latency=0.01, error_rate=0.01))
+    collector = StockDataCollector(session=session, cache=False)
+
+设置环境变量 BAOSTOCK_MOCK=1 后，get_session() 默认使用模拟接口，现有脚本无需修改即可离线运行。
+
+同一只股票的基本面（规模、利润率、负债率、增速等）在各季度之间保持一致，
+季度之间只叠加小幅波动，因此同比、TTM等衍生指标有意义；同样的参数每次生成的数据相同。
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from stock_data_collector import REPORT_FIELDS
+from report_writer import report_columns
+
+# 每页返回的行数（与baostock相同）
+DEFAULT_PAGE_SIZE = 10000
+
+# 请求失败时返回的错误码（网络接收错误，会话会重新登录后重试）
+MOCK_ERROR_CODE = '10002007'
+
+# 内存中保留的季度数（每个季度包含四张报表的全部股票）
+MAX_CACHED_QUARTERS = 8
+
+# 日线字段
+DAILY_FIELDS = ['date', 'code', 'open', 'high', 'low', 'close', 'preclose', 'volume', 'amount',
+                'adjustflag', 'turn', 'tradestatus', 'pctChg', 'peTTM', 'psTTM', 'pcfNcfTTM', 'pbMRQ', 'isST']
+
+# 财务数值字段的空值比例
+NULL_RATE = 0.05
+
+_EPOCH = np.datetime64('2000-01-01', 'D')
+
+
+class _Result:
+    def __init__(self, error_code='0', error_msg='success'):
+        self.error_code = error_code
+        self.error_msg = error_msg
+
+
+class MockResultData:
+    def __init__(self, api, fields, rows, page_size):
+        """分页的查询结果，属性和方法与baostock的ResultData相同
+
+        Args:
+            api: MockBaostock, 翻页时由其模拟延迟和失败
+            fields: list, 字段名
+            rows: list, 全部行（字符串列表）
+            page_size: int, 每页行数
+        """
+        self.error_code = '0'
+        self.error_msg = 'success'
+        self.fields = list(fields)
+        self._api = api
+        self._rows = rows
+        self._page_size = page_size
+        self.cur_page_num = 1
+        self.cur_row_num = 0
+        self.data = rows[:page_size]
+
+    def next(self):
+        """当前页还有数据时返回True；否则请求下一页，没有更多数据或请求失败时返回False"""
+        if self.error_code != '0':
+            return False
+        if self.cur_row_num < len(self.data):
+            return True
+        start = self.cur_page_num * self._page_size
+        if start >= len(self._rows):
+            return False
+        error = self._api._request()
+        if error is not None:
+            self.error_code, self.error_msg = error.error_code, error.error_msg
+            return False
+        self.cur_page_num += 1
+        self.cur_row_num = 0
+        self.data = self._rows[start:start + self._page_size]
+        return True
+
+    def get_row_data(self):
+        row = self.data[self.cur_row_num]
+        self.cur_row_num += 1
+        return row
+
+    def get_data(self):
+        rows = []
+        while self.next():
+            rows.append(self.get_row_data())
+        return pd.DataFrame(rows, columns=self.fields)
+
+
+def _quarter_index(year, quarter):
+    return int(year) * 4 + int(quarter) - 1
+
+
+def _quarter_end(year, quarter):
+    return np.datetime64(f"{int(year) + (int(quarter) == 4)}-{int(quarter) * 3 % 12 + 1:02d}-01", 'D') - 1
+
+
+def _hash_uniform(*keys):
+    """由整数数组计算确定性的[0, 1)均匀数（可广播），用于按 (股票, 日期) 生成行情"""
+    h = np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over='ignore'):
+        for key in keys:
+            h = (h ^ np.asarray(key, dtype=np.uint64)) * np.uint64(0xBF58476D1CE4E5B9)
+            h ^= h >> np.uint64(31)
+    return (h >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _format(values, digits=6):
+    """数值格式化为baostock返回的字符串，空值为空字符串"""
+    text = np.char.mod(f'%.{digits}f', np.nan_to_num(values))
+    return np.where(np.isnan(values), '', text)
+
+
+class MockBaostock:
+    # BaostockSession.mocked 据此识别模拟接口（不使用查询缓存）
+    mocked = True
+
+    def __init__(self, stocks=5000, latency=0.0, error_rate=0.0, page_size=DEFAULT_PAGE_SIZE, seed=0):
+        """初始化模拟接口
+
+        Args:
+            stocks: int, 股票数量（另有少量指数，证券列表中type为2）
+            latency: float, 每次请求（含翻页）的延迟秒数
+            error_rate: float, 每次请求（含翻页）失败的概率
+            page_size: int, 每页返回的行数
+            seed: int, 随机种子，相同参数生成的数据相同
+        """
+        self.stocks = stocks
+        self.latency = latency
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.seed = seed
+        self.stats = {'logins': 0, 'requests': 0, 'errors': 0, 'rows': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._quarters = OrderedDict()
+
+        self.codes = self._make_codes(stocks)
+        self.names = np.asarray([f"模拟股份{i}" for i in range(stocks)], dtype=object)
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+        self._profile = self._make_profile(stocks)
+
+    def _make_codes(self, n):
+        """沪市600000起、深市000001起交替编号，数量不超过各自的编号空间"""
+        sh = [f"sh.{600000 + i:06d}" for i in range((n + 1) // 2)]
+        sz = [f"sz.{1 + i:06d}" for i in range(n // 2)]
+        codes = [code for pair in zip(sh, sz) for code in pair] + sh[len(sz):]
+        return np.asarray(codes, dtype=object)
+
+    def _make_profile(self, n):
+        """每只股票不随季度变化的基本面"""
+        rng = np.random.default_rng([self.seed, 0])
+        # 少数公司几乎没有负债
+        liability = np.where(rng.random(n) < 0.05, rng.uniform(0.001, 0.01, n), rng.beta(2, 3, n))
+        liability = np.clip(liability, 0.001, 0.9)
+        return {
+            'revenue': rng.lognormal(20, 1.5, n),
+            'growth': rng.normal(0.06, 0.15, n),
+            'margin': np.clip(rng.normal(0.08, 0.1, n), -0.5, 0.6),
+            'gross': rng.uniform(0.1, 0.35, n),
+            'turn': rng.lognormal(np.log(0.6), 0.4, n),
+            'liability': liability,
+            'shares': rng.lognormal(np.log(5e8), 1.0, n),
+            'float_ratio': rng.uniform(0.6, 1.0, n),
+            'current': rng.lognormal(np.log(1.5), 0.5, n),
+            'price': rng.lognormal(np.log(12), 0.8, n),
+            'drift': rng.normal(0.03, 0.2, n),
+            'volatility': rng.uniform(0.1, 0.4, n),
+            'period': rng.uniform(120, 720, n),
+            'phase': rng.uniform(0, 2 * np.pi, n),
+            'ipo': _EPOCH + rng.integers(0, 9000, n),
+            'st': rng.random(n) < 0.02,
+            'delisted': rng.random(n) < 0.02,
+        }
+
+    # ---- 请求模拟 ----
+
+    def _request(self):
+        """模拟一次网络请求：延迟，并按失败率返回错误"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.stats['requests'] += 1
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.stats['errors'] += 1
+        return _Result(MOCK_ERROR_CODE, '网络接收错误。') if failed else None
+
+    def _result(self, fields, rows):
+        error = self._request()
+        rs = MockResultData(self, fields, rows if error is None else [], self.page_size)
+        if error is not None:
+            rs.error_code, rs.error_msg = error.error_code, error.error_msg
+        else:
+            with self._lock:
+                self.stats['rows'] += len(rows)
+        return rs
+
+    def login(self, user_id='anonymous', password='123456', options=0):
+        self.stats['logins'] += 1
+        return _Result(error_msg='login success!')
+
+    def logout(self, user_id='anonymous'):
+        return _Result(error_msg='logout success!')
+
+    # ---- 财务数据 ----
+
+    def report_arrays(self, year, quarter):
+        """某季度全部股票的四张报表（数值为float64数组，缺失为NaN）
+
+        Returns:
+            dict: {'listed': 当季有报表的布尔数组, 'pubDate'/'statDate': datetime64数组, 字段名: 数组, ...}
+        """
+        key = (int(year), int(quarter))
+        cached = self._quarters.get(key)
+        if cached is not None:
+            self._quarters.move_to_end(key)
+            return cached
+
+        p = self._profile
+        n = self.stocks
+        t = _quarter_index(year, quarter)
+        rng = np.random.default_rng([self.seed, 1, t])
+        stat_date = _quarter_end(year, quarter)
+        ytd = int(quarter) / 4
+
+        revenue = p['revenue'] * (1 + p['growth']) ** ((t - _quarter_index(2020, 1)) / 4) \
+            * ytd * rng.lognormal(0, 0.08, n)
+        margin = np.clip(p['margin'] + rng.normal(0, 0.02, n), -1, 0.7)
+        liability = np.clip(p['liability'] * rng.lognormal(0, 0.05, n), 0.0005, 0.95)
+        equity_multiplier = 1 / (1 - liability)
+        asset_turn = p['turn'] * ytd * rng.lognormal(0, 0.05, n)
+        net_profit = revenue * margin
+        tax_burden = rng.uniform(0.7, 0.9, n)
+        interest_burden = rng.uniform(0.8, 1.0, n)
+        current = p['current'] * rng.lognormal(0, 0.05, n)
+        quick = current * rng.uniform(0.5, 0.9, n)
+        ca_to_asset = rng.uniform(0.2, 0.8, n)
+        cfo_to_or = rng.normal(0.1, 0.2, n)
+
+        values = {
+            # 利润表
+            'roeAvg': margin * asset_turn * equity_multiplier,
+            'npMargin': margin,
+            'gpMargin': np.minimum(margin + p['gross'], 0.95),
+            'netProfit': net_profit,
+            'epsTTM': net_profit / ytd / p['shares'],
+            'MBRevenue': np.where(rng.random(n) < 0.3, np.nan, revenue),
+            'totalShare': p['shares'],
+            'liqaShare': p['shares'] * p['float_ratio'],
+            # 资产负债表
+            'currentRatio': current,
+            'quickRatio': quick,
+            'cashRatio': quick * rng.uniform(0.2, 0.6, n),
+            'YOYLiability': rng.normal(0.05, 0.2, n),
+            'liabilityToAsset': liability,
+            'assetToEquity': equity_multiplier,
+            # 现金流量表
+            'CAToAsset': ca_to_asset,
+            'NCAToAsset': 1 - ca_to_asset,
+            'tangibleAssetToAsset': (1 - ca_to_asset) * rng.uniform(0.3, 0.9, n),
+            'ebitToInterest': rng.lognormal(np.log(10), 1.0, n),
+            'CFOToOR': cfo_to_or,
+            'CFOToNP': cfo_to_or / np.where(margin == 0, np.nan, margin),
+            'CFOToGr': cfo_to_or,
+            # 杜邦指标
+            'dupontROE': margin * asset_turn * equity_multiplier,
+            'dupontAssetStoEquity': equity_multiplier,
+            'dupontAssetTurn': asset_turn,
+            'dupontPnitoni': rng.uniform(0.85, 1.0, n),
+            'dupontNitogr': margin,
+            'dupontTaxBurden': tax_burden,
+            'dupontIntburden': interest_burden,
+            'dupontEbittogr': margin / (tax_burden * interest_burden),
+        }
+        for name, array in values.items():
+            array = np.asarray(array, dtype='float64')
+            array[rng.random(n) < NULL_RATE] = np.nan
+            values[name] = array
+
+        arrays = {
+            # 上市满一个季度且未退市的股票才有当季报表
+            'listed': (p['ipo'] < stat_date - 90) & ~p['delisted'],
+            'pubDate': stat_date + rng.integers(10, 61, n),
+            'statDate': np.full(n, stat_date),
+            **values,
+        }
+        self._quarters[key] = arrays
+        while len(self._quarters) > MAX_CACHED_QUARTERS:
+            self._quarters.popitem(last=False)
+        return arrays
+
+    def report_frame(self, report_type, year, quarter):
+        """某季度一类报表的全部股票，列顺序和类型与采集程序写入列式存储的数据相同
+
+        用于直接生成大规模的列式存储（不经过逐只股票的查询）。
+        """
+        arrays = self.report_arrays(year, quarter)
+        listed = arrays['listed']
+        data = {'code': pd.Categorical(self.codes[listed]), 'stock_name': self.names[listed]}
+        for field in report_columns(report_type)[2:]:
+            values = arrays[field][listed]
+            data[field] = values.astype('datetime64[ns]') if field in ('pubDate', 'statDate') else values
+        return pd.DataFrame(data)
+
+    def _report_query(self, report_type, code, year, quarter):
+        fields = REPORT_FIELDS[report_type]
+        row = self._code_index.get(code)
+        year, quarter = int(year), int(quarter)
+        if row is None or not self.report_arrays(year, quarter)['listed'][row]:
+            return self._result(fields, [])
+        arrays = self.report_arrays(year, quarter)
+        values = []
+        for field in fields:
+            if field == 'code':
+                values.append(code)
+            elif field in ('pubDate', 'statDate'):
+                values.append(str(arrays[field][row]))
+            else:
+                values.append(str(_format(arrays[field][row:row + 1])[0]))
+        return self._result(fields, [values])
+
+    def query_profit_data(self, code, year=None, quarter=None):
+        return self._report_query('profit', code, year, quarter)
+
+    def query_balance_data(self, code, year=None, quarter=None):
+        return self._report_query('balance', code, year, quarter)
+
+    def query_cash_flow_data(self, code, year=None, quarter=None):
+        return self._report_query('cash_flow', code, year, quarter)
+
+    def query_dupont_data(self, code, year=None, quarter=None):
+        return self._report_query('indicators', code, year, quarter)
+
+    # ---- 证券列表和交易日 ----
+
+    def query_stock_basic(self, code='', code_name=''):
+        fields = ['code', 'code_name', 'ipoDate', 'outDate', 'type', 'status']
+        p = self._profile
+        rows = [['sh.000001', '上证综合指数', '1991-07-15', '', '2', '1'],
+                ['sz.399001', '深证成指', '1994-07-20', '', '2', '1']]
+        for i, stock_code in enumerate(self.codes):
+            rows.append([stock_code, self.names[i], str(p['ipo'][i]),
+                         '2024-06-28' if p['delisted'][i] else '', '1', '0' if p['delisted'][i] else '1'])
+        if code:
+            rows = [row for row in rows if row[0] == code]
+        if code_name:
+            rows = [row for row in rows if code_name in row[1]]
+        return self._result(fields, rows)
+
+    def query_trade_dates(self, start_date=None, end_date=None):
+        """交易日：周一至周五（不考虑节假日）"""
+        start = np.datetime64(start_date or '2015-01-01', 'D')
+        end = np.datetime64(end_date or date.today().isoformat(), 'D')
+        days = np.arange(start, end + 1)
+        trading = np.is_busday(days)
+        rows = [[str(day), '1' if flag else '0'] for day, flag in zip(days, trading)]
+        return self._result(['calendar_date', 'is_trading_day'], rows)
+
+    # ---- 行情 ----
+
+    def _bars(self, rows, days):
+        """rows只股票在days各交易日的日线（rows与days可广播），返回 {字段: 数组}"""
+        p = self._profile
+        t = (days - _EPOCH).astype(np.int64)
+
+        def log_price(t):
+            years = t / 365.0
+            return (np.log(p['price'][rows]) + p['drift'][rows] * (years - 15)
+                    + 0.3 * np.sin(2 * np.pi * t / p['period'][rows] + p['phase'][rows])
+                    + p['volatility'][rows] * 0.1 * (_hash_uniform(self.seed, rows, t) - 0.5))
+
+        close = np.exp(log_price(t))
+        preclose = np.exp(log_price(t - 1))
+        u = _hash_uniform(self.seed + 1, rows, t)
+        open_ = preclose * (1 + (u - 0.5) * 0.02)
+        high = np.maximum(open_, close) * (1 + u * 0.02)
+        low = np.minimum(open_, close) * (1 - (1 - u) * 0.02)
+        turn = 0.3 + 4.7 * _hash_uniform(self.seed + 2, rows, t) ** 2
+        volume = np.round(p['shares'][rows] * p['float_ratio'][rows] * turn / 100)
+        eps = p['revenue'][rows] * p['margin'][rows] / p['shares'][rows]
+        bvps = p['revenue'][rows] / p['turn'][rows] * (1 - p['liability'][rows]) / p['shares'][rows]
+        sps = p['revenue'][rows] / p['shares'][rows]
+        return {
+            'open': open_, 'high': high, 'low': low, 'close': close, 'preclose': preclose,
+            'volume': volume, 'amount': volume * close, 'turn': turn,
+            'pctChg': (close / preclose - 1) * 100,
+            'peTTM': close / eps, 'psTTM': close / sps, 'pcfNcfTTM': close / (eps * 1.2), 'pbMRQ': close / bvps,
+        }
+
+    def _bar_rows(self, fields, codes, days, bars, st):
+        columns = []
+        for field in fields:
+            if field == 'date':
+                columns.append(np.broadcast_to(np.datetime_as_string(days), len(codes)))
+            elif field == 'code':
+                columns.append(codes)
+            elif field == 'adjustflag':
+                columns.append(np.full(len(codes), '3'))
+            elif field == 'tradestatus':
+                columns.append(np.full(len(codes), '1'))
+            elif field == 'isST':
+                columns.append(np.where(st, '1', '0'))
+            else:
+                digits = 0 if field == 'volume' else (4 if field in ('open', 'high', 'low', 'close', 'preclose', 'amount') else 6)
+                columns.append(_format(np.broadcast_to(bars[field], len(codes)).astype('float64'), digits))
+        return [list(row) for row in zip(*columns)]
+
+    def query_history_k_data_plus(self, code, fields, start_date=None, end_date=None,
+                                  frequency='d', adjustflag='3'):
+        """单只股票的日线（只支持日频）"""
+        fields = [field.strip() for field in fields.split(',')]
+        row = self._code_index.get(code)
+        start = np.datetime64(start_date or '2015-01-01', 'D')
+        end = np.datetime64(end_date or date.today().isoformat(), 'D')
+        if row is None or frequency != 'd' or end < start:
+            return self._result(fields, [])
+        days = np.arange(max(start, self._profile['ipo'][row]), end + 1)
+        days = days[np.is_busday(days)]
+        bars = self._bars(row, days)
+        codes = np.full(len(days), code, dtype=object)
+        return self._result(fields, self._bar_rows(fields, codes, days, bars,
+                                                   np.full(len(days), self._profile['st'][row])))
+
+    def query_daily_history_k_AStock(self, date):
+        """某个交易日全部股票的日线和估值"""
+        day = np.datetime64(date, 'D')
+        if not np.is_busday(day):
+            return self._result(DAILY_FIELDS, [])
+        rows = np.flatnonzero((self._profile['ipo'] <= day) & ~self._profile['delisted'])
+        bars = self._bars(rows, day)
+        return self._result(DAILY_FIELDS, self._bar_rows(DAILY_FIELDS, self.codes[rows], day, bars,
+                                                         self._profile['st'][rows]))
+
+
+def mock_from_env():
+    """按环境变量创建模拟接口：BAOSTOCK_MOCK_STOCKS、BAOSTOCK_MOCK_LATENCY、BAOSTOCK_MOCK_ERROR_RATE"""
+    return MockBaostock(stocks=int(os.environ.get('BAOSTOCK_MOCK_STOCKS', 5000)),
+                        latency=float(os.environ.get('BAOSTOCK_MOCK_LATENCY', 0)),
+                        error_rate=float(os.environ.get('BAOSTOCK_MOCK_ERROR_RATE', 0)))
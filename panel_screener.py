@@ -0,0 +1,283 @@
+"""
+多季度面板筛选模块
+将多个季度的财务数据整理为 (股票 × 季度 × 指标) 的数组，
+持续性条件（如8个季度中至少6个季度ROE≥15%）和趋势条件在整段历史上一次向量化求值
+"""
+
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import ColumnStore, DEFAULT_STORE_ROOT
+from data_loader import load_financial_data, available_quarters
+from indicator_labels import raw_name
+from screen_engine import Condition, IndicatorIndex
+
+# 默认面板目录
+DEFAULT_FINANCIAL_PANEL_DIR = 'financial_panel'
+
+
+class FinancialPanel:
+    def __init__(self, codes, names, quarters, indicators, values):
+        """初始化财务面板
+
+        Args:
+            codes: list, 股票代码
+            names: list, 股票名称，与codes对应
+            quarters: list, [(year, quarter), ...]，按时间升序
+            indicators: list, 指标原始名称
+            values: numpy.ndarray, 形状为 (股票数, 季度数, 指标数) 的float64数组，缺失为NaN
+        """
+        self.codes = list(codes)
+        self.names = list(names)
+        self.quarters = [tuple(q) for q in quarters]
+        # 季度序号（year*4+quarter），面板中缺少的季度不连续，窗口和趋势按序号计算
+        self.ordinals = np.array([year * 4 + quarter for year, quarter in self.quarters], dtype='int64')
+        self.indicators = list(indicators)
+        self.values = values
+        self._indicator_index = {name: i for i, name in enumerate(self.indicators)}
+        self._indexes = {}
+        self._slopes = {}
+
+    def indicator(self, name):
+        """某指标的 (股票数, 季度数) 数组，名称可以带中文标签"""
+        return self.values[:, :, self._indicator_index[raw_name(name)]]
+
+    def build_indexes(self, indicators=None):
+        """为指标建立排序索引（覆盖全部股票和季度），之后的区间条件通过索引求值
+
+        Args:
+            indicators: list, 指标名称，默认为全部指标
+        """
+        for name in indicators or self.indicators:
+            name = raw_name(name)
+            if name not in self._indexes:
+                self._indexes[name] = IndicatorIndex(self.indicator(name))
+        return self
+
+    def index(self, name):
+        """某指标的排序索引，尚未建立时返回None"""
+        return self._indexes.get(raw_name(name))
+
+    def span(self):
+        """面板覆盖的季度数（从最早到最新，包括面板中缺少的季度）"""
+        return int(self.ordinals[-1] - self.ordinals[0]) + 1
+
+    def window(self, quarters):
+        """最近quarters个季度在面板中对应的列（slice），缺少的季度没有对应的列"""
+        return slice(int(np.searchsorted(self.ordinals, self.ordinals[-1] - quarters + 1)), None)
+
+    def trend_slope(self, name, window):
+        """最近window个季度的趋势斜率（结果缓存，调整斜率阈值时不再重新拟合）"""
+        key = (raw_name(name), window)
+        slope = self._slopes.get(key)
+        if slope is None:
+            columns = self.window(window)
+            slope = _trend_slope(np.asarray(self.indicator(name)[:, columns]), self.ordinals[columns])
+            self._slopes[key] = slope
+        return slope
+
+    def quantiles(self, name, percentiles):
+        """某指标每个季度在全部股票上的分位数（忽略空值）
+
+        Args:
+            name: str, 指标名称
+            percentiles: list, 分位数（0~100）
+
+        Returns:
+            numpy.ndarray: 形状为 (分位数个数, 季度数)；某季度全部为空时为NaN
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanpercentile(np.asarray(self.indicator(name)), percentiles, axis=0)
+
+    def frame(self, name):
+        """某指标的 (股票 × 季度) DataFrame，列名为 2024Q3 形式"""
+        return pd.DataFrame(np.asarray(self.indicator(name)),
+                            index=pd.Index(self.codes, name='code'),
+                            columns=[f"{y}Q{q}" for y, q in self.quarters])
+
+    def save(self, path=DEFAULT_FINANCIAL_PANEL_DIR):
+        """保存面板：meta.json和values.npy"""
+        os.makedirs(path, exist_ok=True)
+        meta = {'codes': self.codes, 'names': self.names,
+                'quarters': self.quarters, 'indicators': self.indicators}
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        np.save(os.path.join(path, 'values.npy'), self.values)
+
+    @classmethod
+    def load(cls, path=DEFAULT_FINANCIAL_PANEL_DIR):
+        """加载面板，数值以内存映射方式打开"""
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+        return cls(meta['codes'], meta['names'], meta['quarters'], meta['indicators'], values)
+
+
+def load_financial_panel(indicators, quarters=None, store_root=DEFAULT_STORE_ROOT):
+    """加载多个季度的财务数据为面板
+
+    每个季度只读取需要的指标列，按股票代码直接填入数组，不做季度之间的合并。
+
+    Args:
+        indicators: list, 指标名称（原始名称或带中文标签的名称）
+        quarters: list, [(year, quarter), ...]，默认为已存储的全部季度
+        store_root: str, 列式存储目录
+
+    Returns:
+        FinancialPanel: 财务面板；没有任何季度的数据时返回None
+    """
+    indicators = [raw_name(name) for name in indicators]
+    if quarters is None:
+        quarters = available_quarters(ColumnStore(store_root))
+    frames = []
+    for year, quarter in sorted(quarters):
+        df = load_financial_data(year, quarter, columns=indicators, store_root=store_root, labels=False)
+        if df is None:
+            print(f"跳过 {year}Q{quarter}：数据加载失败")
+            continue
+        frames.append(((year, quarter), df))
+    if not frames:
+        return None
+
+    codes = sorted(set().union(*(df['code'].astype(str) for _, df in frames)))
+    code_index = pd.Index(codes)
+    names = pd.Series('', index=code_index, dtype=object)
+    values = np.full((len(codes), len(frames), len(indicators)), np.nan)
+    for q_idx, (_, df) in enumerate(frames):
+        rows = code_index.get_indexer(df['code'].astype(str))
+        names.iloc[rows] = df['stock_name'].astype(str).to_numpy()
+        for i_idx, name in enumerate(indicators):
+            if name in df.columns:
+                values[rows, q_idx, i_idx] = pd.to_numeric(df[name], errors='coerce').to_numpy(
+                    dtype='float64', na_value=np.nan)
+    return FinancialPanel(codes, names.tolist(), [q for q, _ in frames], indicators, values)
+
+
+def _trend_slope(values, x=None):
+    """逐行对非空值做最小二乘直线拟合，返回斜率；有效值少于2个时为NaN
+
+    Args:
+        values: numpy.ndarray, (股票数, 季度数)
+        x: numpy.ndarray, 各列的季度序号，默认为连续的季度
+    """
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1)
+    if x is None:
+        x = np.arange(values.shape[1])
+    x = np.broadcast_to(np.asarray(x, dtype='float64'), values.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(valid, x, 0).sum(axis=1) / count
+        y_mean = np.where(valid, values, 0).sum(axis=1) / count
+        dx = np.where(valid, x - x_mean[:, None], 0)
+        dy = np.where(valid, values - y_mean[:, None], 0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    slope[count < 2] = np.nan
+    return slope
+
+
+class PanelScreener:
+    def __init__(self):
+        """初始化多季度筛选器
+
+        规则之间为“且”的关系，每条规则作用于最近若干个季度。
+        """
+        self.rules = []
+
+    def add_filter(self, indicator_name, min_value=None, max_value=None, allow_null=False,
+                   min_quarters=None, quarters=None):
+        """添加持续性条件：最近quarters个季度中至少min_quarters个季度满足区间条件
+
+        单个季度的判断与StockScreener相同：空值不参与上下限比较，只由allow_null决定。
+
+        Args:
+            indicator_name: str, 指标名称
+            min_value: float, 最小值 (None表示不设下限)
+            max_value: float, 最大值 (None表示不设上限)
+            allow_null: bool, 是否允许空值
+            min_quarters: int, 至少满足条件的季度数，默认为窗口内全部季度
+            quarters: int, 考察最近几个季度，默认为面板的全部季度
+        """
+        self.rules.append({'type': 'persist', 'indicator': indicator_name,
+                           'condition': Condition(indicator_name, min_value, max_value, allow_null),
+                           'min_quarters': min_quarters, 'quarters': quarters})
+
+    def add_trend(self, indicator_name, min_slope=None, max_slope=None, quarters=None):
+        """添加趋势条件：最近quarters个季度的指标做直线拟合，斜率（每季度变化量）在区间内
+
+        有效数据少于2个季度的股票不满足趋势条件。
+
+        Args:
+            indicator_name: str, 指标名称
+            min_slope: float, 斜率下限，如0表示上升趋势
+            max_slope: float, 斜率上限，如0表示下降趋势
+            quarters: int, 考察最近几个季度，默认为面板的全部季度
+        """
+        self.rules.append({'type': 'trend', 'indicator': indicator_name,
+                           'condition': Condition(indicator_name, min_slope, max_slope, False),
+                           'quarters': quarters})
+
+    def indicators(self):
+        """规则用到的指标，用于load_financial_panel"""
+        return list(dict.fromkeys(raw_name(rule['indicator']) for rule in self.rules))
+
+    def evaluate(self, panel):
+        """对面板中的每只股票求值
+
+        窗口按实际季度计算：面板中缺少某些季度时，最近N个季度对应的列少于N个。
+
+        Returns:
+            numpy.ndarray: 长度为股票数的布尔数组
+        """
+        mask = np.ones(len(panel.codes), dtype=bool)
+        for rule in self.rules:
+            window = min(rule['quarters'] or panel.span(), panel.span())
+            columns = panel.window(window)
+            if rule['type'] == 'persist':
+                index = panel.index(rule['indicator'])
+                if index is not None:
+                    cells = index.mask(rule['condition']).reshape(len(panel.codes), -1)[:, columns]
+                else:
+                    cells = rule['condition'].evaluate(panel.indicator(rule['indicator'])[:, columns])
+                # 面板中缺少的季度按空值处理
+                missing = window - cells.shape[1]
+                passed = cells.sum(axis=1) + (missing if rule['condition'].allow_null else 0)
+                mask &= passed >= (rule['min_quarters'] or window)
+            else:
+                mask &= rule['condition'].evaluate(panel.trend_slope(rule['indicator'], window))
+        return mask
+
+    def screen(self, panel):
+        """执行筛选
+
+        Args:
+            panel: FinancialPanel, 财务面板
+
+        Returns:
+            DataFrame: 符合条件的股票列表（code和stock_name两列）
+        """
+        mask = self.evaluate(panel)
+        return pd.DataFrame({'code': np.asarray(panel.codes, dtype=object)[mask],
+                             'stock_name': np.asarray(panel.names, dtype=object)[mask]})
+
+    def get_filter_description(self):
+        """获取当前的筛选条件描述"""
+        descriptions = []
+        for rule in self.rules:
+            condition = rule['condition']
+            window = f"最近{rule['quarters']}个季度" if rule['quarters'] else "全部季度"
+            bounds = []
+            if condition.min_value is not None:
+                bounds.append(f"≥ {condition.min_value}")
+            if condition.max_value is not None:
+                bounds.append(f"≤ {condition.max_value}")
+            if rule['type'] == 'persist':
+                count = f"至少{rule['min_quarters']}个季度" if rule['min_quarters'] else "每个季度"
+                descriptions.append(f"{rule['indicator']}: {window}中{count} {' 且 '.join(bounds)}")
+            else:
+                descriptions.append(f"{rule['indicator']}: {window}趋势斜率 {' 且 '.join(bounds)}")
+        return descriptions
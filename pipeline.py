@@ -0,0 +1,254 @@
+"""
+流水线调度模块
+将处理流程描述为阶段的依赖图：每个阶段记录输入和输出的指纹，
+输入、依赖阶段的输出和自身输出都没有变化时跳过（类似make）；
+互不依赖的阶段并发执行，每个阶段打印耗时和内存占用
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from metrics import get_registry
+
+# 默认的状态文件，记录每个阶段上次成功运行时的指纹
+DEFAULT_STATE_FILE = '.pipeline_state.json'
+
+# 默认同时运行的阶段数
+DEFAULT_MAX_WORKERS = 4
+
+
+def fingerprint_paths(paths):
+    """文件或目录的指纹：目录下每个文件的相对路径、大小和修改时间
+
+    只做stat，不读取文件内容；路径不存在时对应项为None。
+
+    Returns:
+        str: sha1十六进制字符串
+    """
+    entries = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    full = os.path.join(root, name)
+                    stat = os.stat(full)
+                    files.append([os.path.relpath(full, path), stat.st_size, stat.st_mtime_ns])
+            entries.append([path, files])
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            entries.append([path, stat.st_size, stat.st_mtime_ns])
+        else:
+            entries.append([path, None])
+    return hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest()
+
+
+def _memory_mb():
+    """当前进程的常驻内存（MB）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # 非Linux系统退而使用峰值内存（macOS单位为字节，其余为KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+class Stage:
+    def __init__(self, name, run, deps=(), inputs=None, outputs=(), params=None, lock=None, optional=False):
+        """流水线中的一个阶段
+
+        Args:
+            name: str, 阶段名称
+            run: callable, 执行阶段的无参函数，抛出异常表示失败
+            deps: list, 依赖的阶段名称，这些阶段成功后才运行
+            inputs: callable, 返回外部输入指纹（可JSON序列化）的无参函数，
+                如数据分区的版本、当天日期等，依赖阶段完成后才调用
+            outputs: list, 阶段产生的文件或目录，被删除或修改后阶段会重新运行
+            params: dict, 影响输出的参数，参数变化时阶段重新运行
+            lock: str, 资源名称，使用同一资源的阶段不会同时运行（如baostock的全局连接）
+            optional: bool, 可选阶段默认不运行，只在作为目标指定时运行
+        """
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = inputs
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.lock = lock
+        self.optional = optional
+
+    def key(self, dep_outputs):
+        """输入指纹：参数、外部输入和依赖阶段输出的指纹"""
+        inputs = self.inputs() if self.inputs is not None else None
+        payload = [self.name, self.params, inputs, [dep_outputs[dep] for dep in self.deps]]
+        return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class Pipeline:
+    def __init__(self, stages, state_file=DEFAULT_STATE_FILE):
+        """初始化流水线
+
+        Args:
+            stages: list, Stage列表，依赖的阶段必须在列表中
+            state_file: str, 状态文件路径
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise KeyError(f"阶段 {stage.name} 依赖未定义的阶段: {unknown}")
+        self.state_file = state_file
+        self.state = self._load_state()
+        self._state_lock = threading.Lock()
+
+    def _load_state(self):
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"状态文件无法读取，所有阶段将重新运行: {e}")
+        return {}
+
+    def _save_state(self):
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_file)
+
+    def select(self, targets=None):
+        """目标阶段及其全部依赖，按依赖顺序排列；未指定目标时为全部非可选阶段"""
+        if not targets:
+            targets = [name for name, stage in self.stages.items() if not stage.optional]
+        targets = list(targets)
+        unknown = [name for name in targets if name not in self.stages]
+        if unknown:
+            raise KeyError(f"未定义的阶段: {unknown}，可选 {list(self.stages)}")
+        ordered = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段之间存在循环依赖: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in targets:
+            visit(name)
+        return ordered
+
+    def _execute(self, stage, dep_outputs, force):
+        """运行或跳过一个阶段（在线程池中执行）
+
+        Returns:
+            tuple: (状态, 输出指纹, 耗时)，状态为 'skipped'/'done'/'failed'
+        """
+        start = time.perf_counter()
+        memory = _memory_mb()
+        status = 'failed'
+        outputs = None
+        try:
+            key = stage.key(dep_outputs)
+            previous = self.state.get(stage.name, {})
+            if (not force and previous.get('key') == key
+                    and previous.get('outputs') == fingerprint_paths(stage.outputs)):
+                status, outputs = 'skipped', previous['outputs']
+            else:
+                stage.run()
+                # 阶段运行中可能导入了输入数据（如从CSV导入往期分区），按运行后的输入记录
+                key = stage.key(dep_outputs)
+                outputs = fingerprint_paths(stage.outputs)
+                status = 'done'
+                with self._state_lock:
+                    self.state[stage.name] = {'key': key, 'outputs': outputs,
+                                              'seconds': round(time.perf_counter() - start, 3),
+                                              'finished': time.strftime('%Y-%m-%d %H:%M:%S')}
+                    self._save_state()
+        except Exception as e:
+            print(f"[{stage.name}] 失败: {e}")
+        elapsed = time.perf_counter() - start
+        get_registry().observe('pipeline_stage_seconds', elapsed, stage=stage.name, status=status)
+        current = _memory_mb()
+        labels = {'skipped': '跳过（已是最新）', 'done': '完成', 'failed': '失败'}
+        print(f"[{stage.name}] {labels[status]}  耗时 {elapsed:.2f}s  "
+              f"内存 {current:.0f}MB ({current - memory:+.0f}MB)")
+        return status, outputs, elapsed
+
+    def run(self, targets=None, force=(), max_workers=DEFAULT_MAX_WORKERS, skip=()):
+        """运行流水线
+
+        依赖全部成功（或跳过）的阶段立即提交到线程池；使用同一资源的阶段依次运行；
+        某阶段失败时，依赖它的阶段不再运行，其余阶段照常进行。
+        并发运行的阶段共用一个进程，内存变化为该阶段运行期间整个进程的变化。
+
+        Args:
+            targets: list, 需要运行的阶段，None表示全部（依赖的阶段自动加入）
+            force: list, 强制重新运行的阶段；'all'表示全部
+            max_workers: int, 同时运行的阶段数
+            skip: list, 不运行的阶段（如离线时需要网络的阶段），依赖它们的阶段按其现有输出继续
+
+        Returns:
+            dict: {阶段名称: 'skipped'/'done'/'failed'/'blocked'}
+        """
+        names = self.select(targets)
+        force = set(names) if 'all' in force else set(force)
+        results = {}
+        outputs = {}
+        timings = {}
+        for name in names:
+            if name in skip:
+                results[name] = 'skipped'
+                outputs[name] = fingerprint_paths(self.stages[name].outputs)
+                print(f"[{name}] 未运行：使用现有输出")
+        pending = [name for name in names if name not in skip]
+        running = {}
+        busy = set()
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if any(results.get(dep) in ('failed', 'blocked') for dep in stage.deps):
+                        pending.remove(name)
+                        results[name] = 'blocked'
+                        print(f"[{name}] 未运行：依赖的阶段失败")
+                        continue
+                    if not all(dep in outputs for dep in stage.deps):
+                        continue
+                    if stage.lock is not None and stage.lock in busy:
+                        continue
+                    if stage.lock is not None:
+                        busy.add(stage.lock)
+                    pending.remove(name)
+                    future = executor.submit(self._execute, stage, dict(outputs), name in force)
+                    running[future] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    status, stage_outputs, elapsed = future.result()
+                    results[name] = status
+                    timings[name] = elapsed
+                    if status != 'failed':
+                        outputs[name] = stage_outputs
+                    busy.discard(self.stages[name].lock)
+
+        total = time.perf_counter() - start
+        print(f"\n流水线结束，总耗时 {total:.2f}s")
+        for name in names:
+            print(f"  {name:<16}{results[name]:<10}{timings.get(name, 0):8.2f}s")
+        return results
@@ -0,0 +1,142 @@
+"""
+查询缓存模块
+在本地磁盘上缓存baostock查询结果，已结束报告期的数据永久有效，
+当期数据按TTL过期，总大小超过上限时按最近最少使用（LRU）淘汰
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+# 默认缓存文件
+DEFAULT_CACHE_PATH = os.path.join('.cache', 'baostock_cache.sqlite')
+
+# 当期数据的默认有效期（秒）
+DEFAULT_TTL = 24 * 3600
+
+# 默认缓存大小上限（字节）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def make_key(api_name, **params):
+    """由接口名和查询参数生成缓存键，如 (query_profit_data, code, year, quarter)"""
+    return json.dumps([api_name, sorted((k, str(v)) for k, v in params.items())],
+                      ensure_ascii=False)
+
+
+class QueryCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        """初始化查询缓存
+
+        使用sqlite保存缓存条目，多个采集进程可以同时读写同一个缓存文件。
+
+        Args:
+            path: str, 缓存文件路径
+            ttl: float, 当期数据的有效期（秒）
+            max_bytes: int, 缓存总大小上限（字节）
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                immutable INTEGER NOT NULL
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_accessed ON entries(accessed)')
+        self._conn.commit()
+        # 缓存总大小的估计值：启动时统计一次，之后累加本进程写入的大小，
+        # 超过上限时才重新统计（其他进程的写入和淘汰在此时计入）
+        self._total = self._size()
+
+    def _size(self):
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def get(self, key):
+        """读取缓存
+
+        Returns:
+            缓存的对象，未命中或已过期时返回None
+        """
+        row = self._conn.execute(
+            'SELECT value, created, immutable FROM entries WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None or (not row[2] and now - row[1] > self.ttl):
+            self.misses += 1
+            return None
+        with self._conn:
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key, value, immutable=False):
+        """写入缓存
+
+        Args:
+            key: str, 缓存键
+            value: 需要缓存的对象（如DataFrame）
+            immutable: bool, 是否为不再变化的数据（已结束报告期），为True时不受TTL限制
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                (key, blob, len(blob), now, now, int(immutable)))
+        # 替换已有条目时估计值偏大，只会提前触发一次重新统计
+        self._total += len(blob)
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """总大小超过上限时，按最近访问时间淘汰最旧的条目"""
+        total = self._size()
+        self._total = total
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            keys.append((key,))
+            excess -= size
+            self._total -= size
+            if excess <= 0:
+                break
+        with self._conn:
+            self._conn.executemany('DELETE FROM entries WHERE key = ?', keys)
+        self.evictions += len(keys)
+
+    def clear(self):
+        """清空缓存"""
+        with self._conn:
+            self._conn.execute('DELETE FROM entries')
+        self._total = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        entries, size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self):
+        self._conn.close()
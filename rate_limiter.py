@@ -0,0 +1,46 @@
+"""
+请求限速模块
+基于令牌桶算法限制对数据源的请求频率，可在多个进程之间共享
+"""
+
+import multiprocessing as mp
+import time
+
+
+class TokenBucketRateLimiter:
+    def __init__(self, rate, capacity=None):
+        """初始化令牌桶
+
+        令牌数和时间戳保存在共享内存中，通过进程池的initializer传给子进程后，
+        所有工作进程共用同一个桶，总请求速率不会超过rate。
+
+        Args:
+            rate: float, 每秒补充的令牌数（即每秒最大请求数）
+            capacity: float, 桶容量（允许的突发请求数），默认等于rate
+        """
+        if rate <= 0:
+            raise ValueError(f"rate必须大于0: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self._lock = mp.Lock()
+        self._tokens = mp.Value('d', self.capacity, lock=False)
+        self._last = mp.Value('d', time.monotonic(), lock=False)
+
+    def acquire(self, tokens=1):
+        """获取令牌，令牌不足时阻塞等待
+
+        Args:
+            tokens: int, 需要的令牌数
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = max(0.0, now - self._last.value)
+                self._tokens.value = min(self.capacity, self._tokens.value + elapsed * self.rate)
+                self._last.value = now
+                if self._tokens.value >= tokens:
+                    self._tokens.value -= tokens
+                    return
+                wait = (tokens - self._tokens.value) / self.rate
+            # 在锁外等待，避免阻塞其他进程补充令牌
+            time.sleep(wait)
@@ -0,0 +1,97 @@
+"""
+报表输出模块
+将逐只股票到达的报表数据分批追加写入汇总文件，内存占用与股票数量无关
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from stock_data_collector import REPORT_FIELDS
+from metrics import get_registry
+
+# 每批写入的最大行数
+DEFAULT_BATCH_ROWS = 2000
+
+
+def report_columns(report_type):
+    """汇总文件的列顺序：股票代码和名称在前，其余按接口字段顺序"""
+    fields = REPORT_FIELDS[report_type]
+    return ['code', 'stock_name'] + [col for col in fields if col not in ('code', 'stock_name')]
+
+
+class CsvReportWriter:
+    def __init__(self, output_file, report_type, batch_rows=DEFAULT_BATCH_ROWS):
+        """初始化CSV报表写入器
+
+        数据先写入临时文件，close时再替换目标文件，
+        写入中途出错不会破坏已有的汇总文件。
+
+        Args:
+            output_file: str, 输出文件路径
+            report_type: str, 报表类型 ('profit'/'balance'/'cash_flow'/'indicators')
+            batch_rows: int, 缓冲区达到该行数时写入一批
+        """
+        self.output_file = output_file
+        self.report_type = report_type
+        self.columns = report_columns(report_type)
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._buffer = []
+        self._buffered_rows = 0
+        self._tmp_file = output_file + '.tmp'
+        self._file = open(self._tmp_file, 'w', encoding='utf-8-sig', newline='')
+        # 列顺序在写入前确定，只写一次表头
+        pd.DataFrame(columns=self.columns).to_csv(self._file, index=False)
+
+    def append(self, df):
+        """追加一只股票的报表数据"""
+        if df.empty:
+            return
+        self._buffer.append(df)
+        self._buffered_rows += len(df)
+        if self._buffered_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """将缓冲区中的数据写入文件"""
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        batch = pd.concat(self._buffer, ignore_index=True).reindex(columns=self.columns)
+        batch.to_csv(self._file, index=False, header=False)
+        self.rows_written += len(batch)
+        metrics = get_registry()
+        metrics.observe('store_write_seconds', time.perf_counter() - start, format='csv', report=self.report_type)
+        metrics.inc('store_rows_written_total', len(batch), format='csv', report=self.report_type)
+        self._buffer = []
+        self._buffered_rows = 0
+
+    def close(self):
+        """写入剩余数据并替换目标文件
+
+        Returns:
+            int: 写入的总行数
+        """
+        self.flush()
+        self._file.close()
+        get_registry().inc('store_bytes_written_total', os.path.getsize(self._tmp_file),
+                           format='csv', report=self.report_type)
+        os.replace(self._tmp_file, self.output_file)
+        return self.rows_written
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        self._file.close()
+        if os.path.exists(self._tmp_file):
+            os.remove(self._tmp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
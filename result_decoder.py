@@ -0,0 +1,95 @@
+"""
+baostock结果集解码模块
+将查询结果按页批量取出，并按字段类型直接转换为带类型的DataFrame列
+"""
+
+import time
+import pandas as pd
+
+# 日期字段
+DATE_FIELDS = {'pubDate', 'statDate', 'ipoDate', 'outDate', 'date', 'calendar_date'}
+
+# 分类字段（取值种类少，按category存储）
+CATEGORY_FIELDS = {'code', 'type', 'status', 'tradestatus', 'isST', 'adjustflag', 'is_trading_day'}
+
+# 文本字段（保持字符串）
+TEXT_FIELDS = {'code_name', 'stock_name', 'time'}
+
+
+def field_kind(field):
+    """返回字段的解码类型：'date'/'category'/'text'/'float'"""
+    if field in DATE_FIELDS:
+        return 'date'
+    if field in CATEGORY_FIELDS:
+        return 'category'
+    if field in TEXT_FIELDS:
+        return 'text'
+    return 'float'
+
+
+def _convert_column(field, values):
+    kind = field_kind(field)
+    if kind == 'date':
+        return pd.to_datetime(pd.Series(values, dtype=object), format='%Y-%m-%d', errors='coerce')
+    if kind == 'category':
+        return pd.Series(values, dtype='category')
+    if kind == 'text':
+        return pd.Series(values, dtype=object)
+    # 其余字段均为数值，空字符串转为NaN
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype('float64')
+
+
+def fetch_rows(rs):
+    """取出结果集的全部行
+
+    按页整体取出rs.data，不再逐行调用rs.next()/rs.get_row_data()，
+    翻页仍由rs.next()完成。
+    """
+    rows = list(rs.data[rs.cur_row_num:])
+    rs.cur_row_num = len(rs.data)
+    while (rs.error_code == '0') and rs.next():
+        rows.extend(rs.data)
+        rs.cur_row_num = len(rs.data)
+    return rows
+
+
+def decode_rows(rows, fields):
+    """将字符串行列表按字段类型转换为DataFrame
+
+    Args:
+        rows: list, 每行为字符串列表
+        fields: list, 字段名
+
+    Returns:
+        DataFrame: 数值字段为float64，日期字段为datetime64，code等字段为category
+    """
+    if rows:
+        columns = list(zip(*rows))
+    else:
+        columns = [() for _ in fields]
+    return pd.DataFrame({field: _convert_column(field, values)
+                         for field, values in zip(fields, columns)},
+                        columns=list(fields))
+
+
+def decode_frame(df):
+    """将字符串形式的DataFrame（如读取CSV时dtype=str）按相同规则转换类型"""
+    return pd.DataFrame({col: _convert_column(col, df[col].to_numpy(dtype=object))
+                         for col in df.columns},
+                        columns=df.columns)
+
+
+def decode_result_set(rs):
+    """解码baostock结果集
+
+    Args:
+        rs: baostock.data.resultset.ResultData, 查询结果
+
+    Returns:
+        DataFrame: 带类型的数据，df.attrs['decode_seconds']记录本次解码耗时（不含翻页请求）
+    """
+    rows = fetch_rows(rs)
+    start = time.perf_counter()
+    df = decode_rows(rows, rs.fields)
+    df.attrs['decode_seconds'] = time.perf_counter() - start
+    return df
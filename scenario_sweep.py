@@ -0,0 +1,133 @@
+"""
+筛选条件批量评估模块
+一次评估大量筛选方案（如阈值参数网格），相同的条件在所有方案之间只计算一次，
+返回 方案 × 股票 的通过矩阵和每个方案的通过数量
+"""
+
+import copy
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from screen_engine import ScreenData, ScreenPlan
+
+# 每批最多处理的 方案数 × 股票数，控制中间结果的内存占用
+DEFAULT_BLOCK_CELLS = 1 << 25
+
+
+def scenario_grid(base_filters, grid):
+    """由基础筛选条件和参数网格生成全部方案
+
+    Args:
+        base_filters: dict, 基础筛选条件，格式同StockScreener.filters
+        grid: dict, {(报表类型, 指标名, 'min_value'/'max_value'): [取值, ...]}
+
+    Returns:
+        tuple: (scenarios, params)
+        - scenarios: list, 每个方案的筛选条件字典
+        - params: list, 每个方案对应的网格取值 {(报表类型, 指标名, 边界): 取值}
+    """
+    keys = list(grid)
+    scenarios = []
+    params = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        filters = copy.deepcopy(base_filters)
+        for (report_type, indicator, bound), value in zip(keys, values):
+            conditions = filters.setdefault(report_type, {}).setdefault(
+                indicator, {'min_value': None, 'max_value': None, 'allow_null': False})
+            conditions[bound] = value
+        scenarios.append(filters)
+        params.append(dict(zip(keys, values)))
+    return scenarios, params
+
+
+class SweepResult:
+    def __init__(self, data, packed, counts, params=None):
+        """批量评估的结果
+
+        Args:
+            data: ScreenData, 被筛选的数据集
+            packed: numpy.ndarray, 按位压缩的通过矩阵 (方案数, ceil(股票数/8))
+            counts: numpy.ndarray, 每个方案通过的股票数
+            params: list, 每个方案的网格取值（可选）
+        """
+        self.data = data
+        self.packed = packed
+        self.counts = counts
+        self.params = params
+
+    def __len__(self):
+        return len(self.counts)
+
+    def matrix(self, scenarios=None):
+        """方案 × 股票 的布尔通过矩阵
+
+        Args:
+            scenarios: 方案编号（切片或列表），默认为全部方案
+        """
+        packed = self.packed if scenarios is None else self.packed[scenarios]
+        return np.unpackbits(packed, axis=1, count=len(self.data)).astype(bool)
+
+    def passed(self, scenario):
+        """某个方案的筛选结果，与StockScreener.screen的结果相同"""
+        row = np.unpackbits(self.packed[scenario], count=len(self.data))
+        return self.data.rows(np.flatnonzero(row))
+
+    def summary(self):
+        """每个方案一行：网格取值及通过数量"""
+        df = pd.DataFrame({'count': self.counts})
+        if self.params is not None:
+            for key in (self.params[0] if self.params else {}):
+                report_type, indicator, bound = key
+                df.insert(len(df.columns) - 1, f"{indicator}.{bound}",
+                          [param[key] for param in self.params])
+        return df
+
+
+def sweep(df, scenarios, params=None, block_cells=DEFAULT_BLOCK_CELLS):
+    """批量评估多个筛选方案
+
+    先找出所有方案中不重复的条件，每个条件在全部股票上只求值一次，
+    再按方案组合各条件的结果；方案分批处理，内存占用与方案总数无关。
+
+    Args:
+        df: DataFrame/ScreenData, 股票数据
+        scenarios: list, 每个元素为筛选条件字典（格式同StockScreener.filters）或StockScreener
+        params: list, 每个方案的网格取值（来自scenario_grid，可选）
+        block_cells: int, 每批最多处理的 方案数 × 股票数
+
+    Returns:
+        SweepResult: 评估结果
+    """
+    data = df if isinstance(df, ScreenData) else ScreenData(df)
+    rows = len(data)
+
+    # 不重复的条件，第0行为全部通过（用于补齐条件数较少的方案）
+    unique = {}
+    plans = []
+    for scenario in scenarios:
+        plan = ScreenPlan.from_filters(getattr(scenario, 'filters', scenario))
+        plans.append([unique.setdefault(condition.key, (len(unique) + 1, condition))[0]
+                      for condition in plan.conditions])
+    masks = np.ones((len(unique) + 1, rows), dtype=bool)
+    for position, condition in unique.values():
+        masks[position] = condition.evaluate(data.values(condition.indicator))
+
+    # 方案 × 条件槽位 的条件编号矩阵
+    width = max((len(plan) for plan in plans), default=0)
+    slots = np.zeros((len(plans), max(width, 1)), dtype=np.int64)
+    for i, plan in enumerate(plans):
+        slots[i, :len(plan)] = plan
+
+    packed = np.empty((len(plans), (rows + 7) // 8), dtype=np.uint8)
+    counts = np.empty(len(plans), dtype=np.int64)
+    block = max(1, block_cells // max(rows, 1))
+    for start in range(0, len(plans), block):
+        stop = min(start + block, len(plans))
+        passed = masks[slots[start:stop, 0]]
+        for j in range(1, slots.shape[1]):
+            passed &= masks[slots[start:stop, j]]
+        counts[start:stop] = passed.sum(axis=1)
+        packed[start:stop] = np.packbits(passed, axis=1)
+    return SweepResult(data, packed, counts, params)
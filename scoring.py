@@ -0,0 +1,70 @@
+"""
+评分排名模块
+指标标准化（z-score或百分位）、加权求和，以及不做全排序的前k名选取（可分组）
+"""
+
+import numpy as np
+import pandas as pd
+
+# 支持的标准化方式
+NORMALIZE_METHODS = ('zscore', 'percentile')
+
+
+def normalize(values, method='zscore'):
+    """将指标值标准化，空值保持为NaN
+
+    Args:
+        values: numpy.ndarray, float64数组
+        method: str, 'zscore'（减均值除以标准差）或 'percentile'（百分位排名，0~1）
+
+    Returns:
+        numpy.ndarray: 标准化后的数组
+    """
+    if method == 'zscore':
+        valid = ~np.isnan(values)
+        if not valid.any():
+            return np.full(len(values), np.nan)
+        mean = values[valid].mean()
+        std = values[valid].std()
+        if std == 0:
+            return np.where(valid, 0.0, np.nan)
+        return (values - mean) / std
+    if method == 'percentile':
+        return pd.Series(values, copy=False).rank(pct=True).to_numpy()
+    raise ValueError(f"不支持的标准化方式: {method}，可选 {NORMALIZE_METHODS}")
+
+
+def _top(positions, scores, k):
+    """在positions中取分数最高的k个，按分数从高到低排列（同分时按原顺序）"""
+    candidate = scores[positions]
+    if k is not None and k < len(positions):
+        # 只做部分选择，不对全部候选排序；与第k名同分的候选按原顺序取（空值视为最低分）
+        key = np.where(np.isnan(candidate), -np.inf, candidate)
+        kth = key[np.argpartition(-key, k - 1)[k - 1]]
+        above = np.flatnonzero(key > kth)
+        chosen = np.concatenate([above, np.flatnonzero(key == kth)[:k - len(above)]])
+    else:
+        chosen = np.arange(len(positions))
+    chosen = chosen[np.lexsort((positions[chosen], -candidate[chosen]))]
+    return positions[chosen]
+
+
+def top_k(scores, k=None, groups=None):
+    """选取分数最高的k个位置
+
+    Args:
+        scores: numpy.ndarray, 分数
+        k: int, 每组选取的数量，None表示全部（即按分数排序）
+        groups: array-like, 每个位置所属的分组，None表示不分组
+
+    Returns:
+        numpy.ndarray: 选中的位置；分组时按分组依次排列，组内按分数从高到低
+    """
+    scores = np.asarray(scores, dtype='float64')
+    if groups is None:
+        return _top(np.arange(len(scores)), scores, k)
+    labels, _ = pd.factorize(np.asarray(groups, dtype=object), sort=True, use_na_sentinel=False)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    selected = [_top(positions, scores, k) for positions in np.split(order, bounds) if len(positions)]
+    return np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
@@ -0,0 +1,87 @@
+"""
+筛选结果缓存模块
+以 筛选条件指纹 + 数据版本 为键缓存筛选结果（通过的行号），内存中按LRU淘汰，
+可选持久化到磁盘供其他进程使用；数据重新采集后版本改变，旧结果自然失效
+"""
+
+import os
+from collections import OrderedDict
+
+from query_cache import QueryCache, make_key
+
+# 默认的持久化缓存文件
+DEFAULT_SCREEN_CACHE_PATH = os.path.join('.cache', 'screen_cache.sqlite')
+
+# 内存中最多保留的结果数
+DEFAULT_MAX_ENTRIES = 256
+
+# 持久化缓存的大小上限（字节）
+DEFAULT_SCREEN_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def screen_key(fingerprint, data_version):
+    return make_key('screen', fingerprint=fingerprint, data_version=data_version)
+
+
+class ScreenCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, persist=False, path=DEFAULT_SCREEN_CACHE_PATH):
+        """初始化筛选结果缓存
+
+        Args:
+            max_entries: int, 内存中最多保留的结果数
+            persist: bool, 是否同时保存到磁盘（sqlite），供其他进程复用
+            path: str, 持久化缓存文件路径
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # 键中已包含数据版本，持久化的条目不需要过期时间
+        self._disk = QueryCache(path, max_bytes=DEFAULT_SCREEN_CACHE_BYTES) if persist else None
+
+    def get(self, key):
+        """读取缓存的行号数组，未命中时返回None"""
+        rows = self._entries.get(key)
+        if rows is None and self._disk is not None:
+            rows = self._disk.get(key)
+            if rows is not None:
+                self._remember(key, rows)
+        if rows is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return rows
+
+    def put(self, key, rows):
+        self._remember(key, rows)
+        if self._disk is not None:
+            self._disk.put(key, rows, immutable=True)
+
+    def _remember(self, key, rows):
+        # 缓存的数组设为只读，避免调用方修改后污染缓存
+        rows.flags.writeable = False
+        self._entries[key] = rows
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+# 进程内共用的缓存
+_shared_cache = None
+
+
+def get_screen_cache():
+    """返回进程内共用的筛选结果缓存（仅内存）"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ScreenCache()
+    return _shared_cache
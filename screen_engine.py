@@ -0,0 +1,335 @@
+"""
+筛选执行引擎
+将筛选条件编译为执行计划，每个数据集的指标列只转换一次为float64数组，
+按估计的通过率从低到高依次在剩余候选行上求值，候选为空时提前结束；
+建立指标索引后，区间条件变为两次二分查找加整数比较
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from indicator_labels import resolve_column
+
+# 估计通过率时最多抽样的行数
+SELECTIVITY_SAMPLE_ROWS = 2048
+
+# 每个数据集最多缓存的条件结果数（逐行布尔数组）
+MAX_CACHED_MASKS = 64
+
+
+def stamp_version(df, version):
+    """为DataFrame标记数据版本，供筛选结果缓存使用
+
+    同时记录对象标识：由该DataFrame派生出的新DataFrame（切片、填充等）
+    会继承attrs，但标识不同，不会被误认为同一份数据。
+    标记了版本的数据视为只读，原地修改后应删除 attrs['data_version']。
+    """
+    df.attrs['data_version'] = version
+    df.attrs['data_version_owner'] = id(df)
+    return df
+
+
+def data_version(df):
+    """DataFrame的数据版本，未标记或已是派生数据时返回None"""
+    if df.attrs.get('data_version_owner') == id(df):
+        return df.attrs.get('data_version')
+    return None
+
+
+class Condition:
+    __slots__ = ('indicator', 'min_value', 'max_value', 'allow_null')
+
+    def __init__(self, indicator, min_value=None, max_value=None, allow_null=False):
+        """一个区间筛选条件
+
+        语义与StockScreener.screen一致：空值不参与上下限比较，
+        只由allow_null决定是否保留。
+        """
+        self.indicator = indicator
+        self.min_value = min_value
+        self.max_value = max_value
+        self.allow_null = allow_null
+
+    @property
+    def key(self):
+        return (self.indicator, self.min_value, self.max_value, self.allow_null)
+
+    @property
+    def trivial(self):
+        """没有上下限且允许空值的条件不排除任何行"""
+        return self.min_value is None and self.max_value is None and self.allow_null
+
+    def evaluate(self, values):
+        """对float64数组求值，返回布尔数组
+
+        NaN与任何数比较都为False，因此不允许空值时无需单独排除空值。
+        """
+        if self.min_value is not None:
+            passed = values >= self.min_value
+            if self.max_value is not None:
+                passed &= values <= self.max_value
+        elif self.max_value is not None:
+            passed = values <= self.max_value
+        elif not self.allow_null:
+            return ~np.isnan(values)
+        else:
+            return np.ones(values.shape, dtype=bool)
+        if self.allow_null:
+            passed |= np.isnan(values)
+        return passed
+
+    def __repr__(self):
+        return (f"Condition({self.indicator!r}, min_value={self.min_value!r}, "
+                f"max_value={self.max_value!r}, allow_null={self.allow_null!r})")
+
+
+class IndicatorIndex:
+    def __init__(self, values):
+        """单个指标的排序索引
+
+        - order: 按值升序排列的行号，空值排在最后
+        - sorted: 非空值升序排列
+        - rank: 每行在order中的位置
+        - nulls: 空值位图
+
+        区间条件[min, max]在sorted上二分查找得到位置区间[lo, hi)，
+        满足条件的行即 order[lo:hi]，或者说 lo <= rank < hi，无需再访问指标值本身。
+
+        Args:
+            values: numpy.ndarray, float64数组（多维数组按展平后的顺序建立索引）
+        """
+        values = np.asarray(values, dtype='float64').ravel()
+        # NaN排在最后
+        self.order = np.argsort(values, kind='stable').astype(np.int32)
+        self.nulls = np.isnan(values)
+        self.valid = len(values) - int(self.nulls.sum())
+        self.sorted = values[self.order[:self.valid]]
+        self.rank = np.empty(len(values), dtype=np.int32)
+        self.rank[self.order] = np.arange(len(values), dtype=np.int32)
+
+    def __len__(self):
+        return len(self.rank)
+
+    def bounds(self, condition):
+        """条件对应的排序位置区间 [lo, hi)"""
+        lo = 0 if condition.min_value is None else int(
+            np.searchsorted(self.sorted, condition.min_value, side='left'))
+        hi = self.valid if condition.max_value is None else int(
+            np.searchsorted(self.sorted, condition.max_value, side='right'))
+        return lo, hi
+
+    def count(self, condition):
+        """满足条件的行数（只做二分查找）"""
+        lo, hi = self.bounds(condition)
+        return max(0, hi - lo) + (len(self) - self.valid if condition.allow_null else 0)
+
+    def rows(self, condition):
+        """满足条件的行号（升序）"""
+        lo, hi = self.bounds(condition)
+        rows = self.order[lo:max(lo, hi)]
+        if condition.allow_null:
+            rows = np.concatenate([rows, self.order[self.valid:]])
+        return np.sort(rows)
+
+    def contains(self, condition, rows):
+        """只对给定的行判断是否满足条件"""
+        lo, hi = self.bounds(condition)
+        rank = self.rank[rows]
+        passed = rank < hi
+        if lo > 0:
+            passed &= rank >= lo
+        if condition.allow_null:
+            passed |= self.nulls[rows]
+        return passed
+
+    def mask(self, condition):
+        """条件的逐行结果，与Condition.evaluate(values)相同"""
+        if condition.trivial:
+            return np.ones(len(self), dtype=bool)
+        lo, hi = self.bounds(condition)
+        passed = self.rank < hi
+        if lo > 0:
+            passed &= self.rank >= lo
+        if condition.allow_null:
+            passed |= self.nulls
+        return passed
+
+
+class ScreenData:
+    def __init__(self, df, version=None):
+        """筛选用的数据集
+
+        包装一个DataFrame，指标列在第一次使用时转换为float64数组并缓存，
+        对同一数据集反复筛选时不再重复转换。数据变化后应创建新的ScreenData。
+
+        Args:
+            df: DataFrame, 股票数据，列名可以是原始名称或带中文标签的名称
+            version: str, 数据版本，用于缓存筛选结果；默认取load_financial_data标记的版本
+        """
+        self.df = df
+        self.version = version if version is not None else data_version(df)
+        self.code_column = resolve_column(df.columns, 'code')
+        self.name_column = resolve_column(df.columns, 'stock_name')
+        self._values = {}
+        self._selectivity = {}
+        self._indexes = {}
+        self._masks = OrderedDict()
+        # 实际求值的条件次数（命中缓存的不计）
+        self.mask_evaluations = 0
+
+    def __len__(self):
+        return len(self.df)
+
+    def build_indexes(self, indicators):
+        """为指标建立排序索引，之后涉及的条件都通过索引求值
+
+        适合在同一份数据上反复调整阈值的交互式筛选。
+
+        Args:
+            indicators: list, 指标名称
+        """
+        for indicator in indicators:
+            column = resolve_column(self.df.columns, indicator)
+            if column not in self._indexes:
+                self._indexes[column] = IndicatorIndex(self.values(column))
+        return self
+
+    def index(self, indicator):
+        """某指标的排序索引，尚未建立时返回None"""
+        return self._indexes.get(resolve_column(self.df.columns, indicator))
+
+    def values(self, indicator):
+        """某指标的float64数组（无法转换为数值的记为NaN）"""
+        column = resolve_column(self.df.columns, indicator)
+        values = self._values.get(column)
+        if values is None:
+            values = pd.to_numeric(self.df[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            self._values[column] = values
+        return values
+
+    def fingerprint(self, indicators):
+        """指标列内容的指纹：行数和各列float64数组的哈希
+
+        DataFrame被原地修改后指纹随之变化，可代替数据版本作为筛选结果缓存的键；
+        需要转换并哈希全部指标列，耗时与直接求值相当，只在求值代价较高时使用。
+        """
+        digest = hashlib.blake2b(str(len(self.df)).encode('utf-8'), digest_size=20)
+        for column in sorted({resolve_column(self.df.columns, indicator) for indicator in indicators}):
+            digest.update(column.encode('utf-8'))
+            digest.update(memoryview(self.values(column)))
+        return digest.hexdigest()
+
+    def mask(self, condition):
+        """条件在全部行上的结果（只读布尔数组）
+
+        结果按条件缓存（LRU），修改筛选条件后只有新的条件需要求值；
+        指标已建立索引时通过索引求值。
+        """
+        column = resolve_column(self.df.columns, condition.indicator)
+        key = (column,) + condition.key[1:]
+        mask = self._masks.get(key)
+        if mask is None:
+            index = self._indexes.get(column)
+            mask = index.mask(condition) if index is not None else condition.evaluate(self.values(column))
+            mask.flags.writeable = False
+            self.mask_evaluations += 1
+            self._masks[key] = mask
+            while len(self._masks) > MAX_CACHED_MASKS:
+                self._masks.popitem(last=False)
+        else:
+            self._masks.move_to_end(key)
+        return mask
+
+    def selectivity(self, condition):
+        """在等间隔抽样的行上估计条件的通过率"""
+        key = condition.key
+        estimate = self._selectivity.get(key)
+        if estimate is None:
+            values = self.values(condition.indicator)
+            step = max(1, len(values) // SELECTIVITY_SAMPLE_ROWS)
+            sample = values[::step]
+            estimate = float(condition.evaluate(sample).mean()) if len(sample) else 1.0
+            self._selectivity[key] = estimate
+        return estimate
+
+    def rows(self, positions):
+        """按行号取出股票代码和名称两列"""
+        return self.df[[self.code_column, self.name_column]].iloc[positions]
+
+
+class ScreenPlan:
+    def __init__(self, conditions):
+        """筛选执行计划
+
+        Args:
+            conditions: list, Condition列表，之间为“且”的关系
+        """
+        self.conditions = [condition for condition in conditions if not condition.trivial]
+
+    @classmethod
+    def from_filters(cls, filters):
+        """由StockScreener的filters字典编译执行计划"""
+        return cls([Condition(indicator, conditions['min_value'], conditions['max_value'],
+                              conditions['allow_null'])
+                    for indicators in filters.values()
+                    for indicator, conditions in indicators.items()])
+
+    def order(self, data):
+        """按估计通过率从低到高排列条件，最能缩小候选集的条件先执行"""
+        return sorted(self.conditions, key=data.selectivity)
+
+    def combine(self, data):
+        """由各条件缓存的逐行结果按位与得到通过的行号
+
+        用于在同一数据集上反复修改条件的交互式筛选：增加或修改一个条件只需对该条件求值，
+        删除条件不需要访问任何指标列。
+
+        Returns:
+            numpy.ndarray: 通过全部条件的行号（升序）
+        """
+        if not self.conditions:
+            return np.arange(len(data))
+        mask = data.mask(self.conditions[0]).copy()
+        for condition in self.conditions[1:]:
+            mask &= data.mask(condition)
+        return np.flatnonzero(mask)
+
+    def run(self, data):
+        """执行筛选
+
+        全部条件的指标都已建立索引时，先用二分查找得到各条件的命中行数，
+        从命中最少的条件取出候选行，再用其余条件的排序位置逐一过滤候选行；
+        否则第一个条件在全部行上求值，之后的条件只在剩余的候选行上求值。
+
+        Args:
+            data: ScreenData, 数据集
+
+        Returns:
+            numpy.ndarray: 通过全部条件的行号（升序）
+        """
+        indexed = [(data.index(condition.indicator), condition) for condition in self.conditions]
+        if indexed and all(index is not None for index, _ in indexed):
+            indexed.sort(key=lambda item: item[0].count(item[1]))
+            index, condition = indexed[0]
+            rows = index.rows(condition)
+            for index, condition in indexed[1:]:
+                if not len(rows):
+                    break
+                rows = rows[index.contains(condition, rows)]
+            return rows
+
+        rows = None
+        for condition in self.order(data):
+            values = data.values(condition.indicator)
+            if rows is None:
+                rows = np.flatnonzero(condition.evaluate(values))
+            else:
+                rows = rows[condition.evaluate(values[rows])]
+            if not len(rows):
+                break
+        if rows is None:
+            rows = np.arange(len(data))
+        return rows
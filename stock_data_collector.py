@@ -4,48 +4,171 @@
 """
 
 import pandas as pd
-import baostock as bs
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+from bs_session import get_session, QueryFailed
+from result_decoder import decode_result_set
+from query_cache import QueryCache, make_key
+from timeseries_store import DailyBarStore
+from metrics import get_registry
+
+
+# 各类财务报表接口返回的字段（与baostock返回顺序一致）
+REPORT_FIELDS = {
+    'profit': ['code', 'pubDate', 'statDate', 'roeAvg', 'npMargin', 'gpMargin',
+               'netProfit', 'epsTTM', 'MBRevenue', 'totalShare', 'liqaShare'],
+    'balance': ['code', 'pubDate', 'statDate', 'currentRatio', 'quickRatio', 'cashRatio',
+                'YOYLiability', 'liabilityToAsset', 'assetToEquity'],
+    'cash_flow': ['code', 'pubDate', 'statDate', 'CAToAsset', 'NCAToAsset',
+                  'tangibleAssetToAsset', 'ebitToInterest', 'CFOToOR', 'CFOToNP', 'CFOToGr'],
+    'indicators': ['code', 'pubDate', 'statDate', 'dupontROE', 'dupontAssetStoEquity',
+                   'dupontAssetTurn', 'dupontPnitoni', 'dupontNitogr', 'dupontTaxBurden',
+                   'dupontIntburden', 'dupontEbittogr'],
+}
+
+# 各类财务报表对应的baostock查询接口
+REPORT_QUERIES = {
+    'profit': 'query_profit_data',
+    'balance': 'query_balance_data',
+    'cash_flow': 'query_cash_flow_data',
+    'indicators': 'query_dupont_data',
+}
+
+# 估值字段（baostock日线字段 -> 估值结果中的名称）
+VALUATION_FIELDS = {
+    'peTTM': 'pe_ttm',
+    'pbMRQ': 'pb',
+    'psTTM': 'ps',
+    'close': 'price',
+    'volume': 'volume',
+    'amount': 'amount',
+    'turn': 'turnover',
+}
+
+
+# 首次获取日线时的起始日期
+DAILY_HISTORY_START = '2010-01-01'
+
+# 定期报告的法定披露截止日：季度 -> (相对报告期的年份偏移, 月, 日)
+# 一季报4月30日，半年报8月31日，三季报10月31日，年报次年4月30日
+DISCLOSURE_DEADLINES = {1: (0, 4, 30), 2: (0, 8, 31), 3: (0, 10, 31), 4: (1, 4, 30)}
+
+
+def quarter_closed(year, quarter):
+    """判断报告期是否已经结束（季度最后一天早于今天）"""
+    quarter_end = datetime(int(year) + (int(quarter) == 4), int(quarter) * 3 % 12 + 1, 1)
+    return quarter_end <= datetime.now()
+
+
+def disclosure_deadline(year, quarter):
+    """报告期定期报告的法定披露截止日"""
+    years_after, month, day = DISCLOSURE_DEADLINES[int(quarter)]
+    return date(int(year) + years_after, month, day)
 
 
 class StockDataCollector:
-    def __init__(self):
-        """初始化数据采集器"""
-        # 登录系统
-        self.bs = bs
-        self.login_result = self.bs.login()
-        if self.login_result.error_code != '0':
-            print(f'登录失败: {self.login_result.error_msg}')
+    def __init__(self, rate_limiter=None, cache=True, session=None):
+        """初始化数据采集器
+        
+        不在初始化时登录：同一进程内的所有采集器共用一个baostock会话，
+        第一次请求时登录，会话断开时自动重新登录。
+        
+        Args:
+            rate_limiter: TokenBucketRateLimiter, 请求限速器（可选），
+                多进程采集时由各工作进程共享
+            cache: QueryCache/bool, 查询缓存；True使用默认缓存文件（模拟接口不使用缓存，
+                以免模拟数据混入真实数据的缓存），False不使用缓存
+            session: BaostockSession, baostock会话，默认为当前进程共用的会话
+        """
+        self.session = session or get_session()
+        self.rate_limiter = rate_limiter
+        if cache is True:
+            cache = None if self.session.mocked else QueryCache()
+        self.cache = cache or None
+        # 最近一次查询失败的错误信息
+        self.last_error = None
+        # 重试后仍然失败的查询：[{'api': 接口名, 'params': 参数, 'error': 错误信息}, ...]
+        self.failed_queries = []
+        # 本地日线存储，首次使用时打开
+        self._daily_store = None
+        # 各接口的解码统计：{接口名: {'calls': 次数, 'rows': 行数, 'seconds': 累计耗时}}
+        self.decode_stats = {}
+    
+    @property
+    def bs(self):
+        """baostock接口（第一次使用时才导入）"""
+        return self.session.api
+    
+    def _throttle(self):
+        """每次请求数据源前调用，受限速器控制"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
     
-    def __del__(self):
-        """析构函数，确保退出系统"""
-        if hasattr(self, 'bs'):
-            self.bs.logout()
+    def _decode(self, api_name, rs):
+        """解码查询结果并记录该接口的解码耗时"""
+        df = decode_result_set(rs)
+        stats = self.decode_stats.setdefault(api_name, {'calls': 0, 'rows': 0, 'seconds': 0.0})
+        stats['calls'] += 1
+        stats['rows'] += len(df)
+        stats['seconds'] += df.attrs['decode_seconds']
+        metrics = get_registry()
+        metrics.observe('baostock_decode_seconds', df.attrs['decode_seconds'], api=api_name)
+        metrics.inc('baostock_rows_total', len(df), api=api_name)
+        return df
+    
+    def _query(self, api_name, closed=False, use_cache=True, **params):
+        """执行baostock查询并解码，所有数据请求都经过这里
+        
+        启用缓存时先查缓存；已结束报告期且有数据的结果永久缓存，
+        其余结果按缓存的TTL过期。请求经由会话发出，失败时自动重新登录并重试，
+        重试用尽后记录到self.failed_queries。
+        
+        Args:
+            api_name: str, baostock接口名（如'query_profit_data'）
+            closed: bool, 查询的报告期/日期区间是否已经结束
+            use_cache: bool, 是否使用缓存（结果另有本地存储时可关闭）
+            **params: 查询参数
+            
+        Returns:
+            DataFrame: 查询结果，失败时返回None，错误信息保存在self.last_error
+        """
+        key = make_key(api_name, **params)
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            df = self.cache.get(key)
+            if df is not None:
+                get_registry().inc('baostock_cache_hits_total', api=api_name)
+                return df
+        
+        try:
+            df = self.session.call(api_name, lambda rs: self._decode(api_name, rs),
+                                   before_call=self._throttle, **params)
+        except QueryFailed as e:
+            self.last_error = e.error_msg
+            self.failed_queries.append({'api': api_name, 'params': params, 'error': str(e)})
+            return None
+        
+        if use_cache:
+            self.cache.put(key, df, immutable=closed and not df.empty)
+        return df
         
     def fetch_stock_list(self):
         """获取A股股票列表
         
         Returns:
             pandas.DataFrame: 包含以下字段：
-            - code: str, 股票代码
+            - code: category, 股票代码
             - code_name: str, 股票名称
-            - status: str, 交易状态
-            - ipoDate: str, 上市日期
+            - status: category, 交易状态
+            - ipoDate: datetime64, 上市日期
         """
         try:
             # 获取证券基本资料
-            rs = self.bs.query_stock_basic()
-            if rs.error_code != '0':
-                print(f'获取股票列表失败: {rs.error_msg}')
+            stock_df = self._query('query_stock_basic')
+            if stock_df is None:
+                print(f'获取股票列表失败: {self.last_error}')
                 return pd.DataFrame()
             
-            # 转换为DataFrame格式
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
-            
-            stock_df = pd.DataFrame(data_list, columns=rs.fields)
-            
             # 打印字段信息，用于调试
             print("可用的字段：", stock_df.columns.tolist())
             
@@ -75,7 +198,7 @@ class StockDataCollector:
             quarter: int, 季度（1-4），默认为最新季度
             
         Returns:
-            dict: 包含以下DataFrame：
+            dict: 包含以下DataFrame（数值字段为float64，日期字段为datetime64）：
             - profit: 利润表
             - balance: 资产负债表
             - cash_flow: 现金流量表
@@ -88,38 +211,13 @@ class StockDataCollector:
                 quarter = (datetime.now().month - 1) // 3 + 1
                 
             result = {}
+            closed = quarter_closed(year, quarter)
             
-            # 1. 获取利润表
-            profit_rs = self.bs.query_profit_data(code=stock_code, year=year, quarter=quarter)
-            if profit_rs.error_code == '0':
-                profit_list = []
-                while (profit_rs.error_code == '0') & profit_rs.next():
-                    profit_list.append(profit_rs.get_row_data())
-                result['profit'] = pd.DataFrame(profit_list, columns=profit_rs.fields)
-            
-            # 2. 获取资产负债表
-            balance_rs = self.bs.query_balance_data(code=stock_code, year=year, quarter=quarter)
-            if balance_rs.error_code == '0':
-                balance_list = []
-                while (balance_rs.error_code == '0') & balance_rs.next():
-                    balance_list.append(balance_rs.get_row_data())
-                result['balance'] = pd.DataFrame(balance_list, columns=balance_rs.fields)
-            
-            # 3. 获取现金流量表
-            cash_flow_rs = self.bs.query_cash_flow_data(code=stock_code, year=year, quarter=quarter)
-            if cash_flow_rs.error_code == '0':
-                cash_flow_list = []
-                while (cash_flow_rs.error_code == '0') & cash_flow_rs.next():
-                    cash_flow_list.append(cash_flow_rs.get_row_data())
-                result['cash_flow'] = pd.DataFrame(cash_flow_list, columns=cash_flow_rs.fields)
-            
-            # 4. 获取主要财务指标
-            indicators_rs = self.bs.query_dupont_data(code=stock_code, year=year, quarter=quarter)
-            if indicators_rs.error_code == '0':
-                indicators_list = []
-                while (indicators_rs.error_code == '0') & indicators_rs.next():
-                    indicators_list.append(indicators_rs.get_row_data())
-                result['indicators'] = pd.DataFrame(indicators_list, columns=indicators_rs.fields)
+            # 依次获取利润表、资产负债表、现金流量表和主要财务指标
+            for report_type, api_name in REPORT_QUERIES.items():
+                df = self._query(api_name, closed=closed, code=stock_code, year=year, quarter=quarter)
+                if df is not None:
+                    result[report_type] = df
             
             return result
             
@@ -144,51 +242,146 @@ class StockDataCollector:
             - turnover: float, 换手率
         """
         try:
-            # 获取当前日期
-            today = datetime.now().strftime("%Y-%m-%d")
+            # 取最近两周的日线，停牌或非交易日时使用最近一个交易日的数据
+            end_date = datetime.now().strftime("%Y-%m-%d")
+            start_date = (datetime.now() - timedelta(days=14)).strftime("%Y-%m-%d")
             
-            # 获取基本面数据
-            rs = self.bs.query_stock_basic(code=stock_code)
-            if rs.error_code != '0':
-                print(f'获取{stock_code}基本信息失败: {rs.error_msg}')
-                return None
-            
-            # 获取当日行情数据    
-            rs_k = self.bs.query_history_k_data_plus(
+            k_df = self._query(
+                'query_history_k_data_plus',
                 code=stock_code,
-                fields="date,code,close,volume,amount,turn",
-                start_date=today,
-                end_date=today,
+                fields="date,code," + ",".join(VALUATION_FIELDS),
+                start_date=start_date,
+                end_date=end_date,
                 frequency="d",
                 adjustflag="3"
             )
+            if k_df is None:
+                print(f'获取{stock_code}行情数据失败: {self.last_error}')
+                return None
+            if k_df.empty:
+                return {}
             
-            result = {}
-            
-            # 解析基本面数据
-            if rs.error_code == '0' and rs.next():
-                basic_info = rs.get_row_data()
-                # 注意：字段索引可能需要根据实际API返回调整
-                result['pe_ttm'] = float(basic_info[15]) if len(basic_info) > 15 and basic_info[15] != '' else None
-                result['pb'] = float(basic_info[16]) if len(basic_info) > 16 and basic_info[16] != '' else None
-            
-            # 解析行情数据
-            if rs_k.error_code == '0' and rs_k.next():
-                k_data = rs_k.get_row_data()
-                result['price'] = float(k_data[2]) if k_data[2] != '' else None
-                result['volume'] = float(k_data[3]) if k_data[3] != '' else None
-                result['amount'] = float(k_data[4]) if k_data[4] != '' else None
-                result['turnover'] = float(k_data[5]) if k_data[5] != '' else None
-            
-            return result
+            # 按字段名取最新一行，不再依赖位置索引
+            latest = k_df.iloc[-1]
+            return {key: (None if pd.isna(latest[field]) else float(latest[field]))
+                    for field, key in VALUATION_FIELDS.items()}
             
         except Exception as e:
             print(f"获取{stock_code}估值数据时发生错误：{str(e)}")
             return None
     
-    def fetch_daily_price(self, stock_code):
-        """获取股票的日线数据"""
-        pass
+    def fetch_trade_dates(self, start_date, end_date):
+        """获取区间内的交易日
+        
+        Args:
+            start_date: str, 起始日期（如：2024-01-01）
+            end_date: str, 截止日期
+            
+        Returns:
+            list: 交易日字符串列表（YYYY-MM-DD）
+        """
+        closed = pd.Timestamp(end_date) < pd.Timestamp(datetime.now().date())
+        df = self._query('query_trade_dates', closed=closed, start_date=start_date, end_date=end_date)
+        if df is None:
+            print(f'获取交易日失败: {self.last_error}')
+            return []
+        trading = df[df['is_trading_day'] == '1']
+        return trading['calendar_date'].dt.strftime('%Y-%m-%d').tolist()
+    
+    def fetch_market_daily(self, date):
+        """获取某日全部A股的日线行情和估值数据（一次请求返回全市场）
+        
+        Args:
+            date: str, 交易日（如：2024-01-31）
+            
+        Returns:
+            pandas.DataFrame: 包含date、code、close、volume、amount、turn、
+            peTTM、pbMRQ、psTTM等字段，失败时返回空DataFrame
+        """
+        closed = pd.Timestamp(date) < pd.Timestamp(datetime.now().date())
+        df = self._query('query_daily_history_k_AStock', closed=closed, date=date)
+        if df is None:
+            print(f'获取{date}全市场行情失败: {self.last_error}')
+            return pd.DataFrame()
+        return df
+    
+    def fetch_daily_price(self, stock_code, start_date=None, end_date=None, store=None):
+        """获取股票的日线数据
+        
+        数据保存在本地日线存储中，每次只向数据源请求该股票最后一个已存储交易日之后的日线，
+        然后从本地存储读取所需区间。
+        
+        Args:
+            stock_code: str, 股票代码（如：sh.600000）
+            start_date: str, 起始日期，默认为存储中的全部历史
+            end_date: str, 截止日期，默认为今天
+            store: DailyBarStore, 日线存储，默认为 daily_bars 目录
+            
+        Returns:
+            pandas.DataFrame: 包含date及open、high、low、close、volume等字段（不复权），
+            数据直接引用内存映射文件，不复制
+        """
+        if store is None:
+            store = self.daily_store
+        try:
+            self.update_daily_price(stock_code, end_date, store)
+        except Exception as e:
+            print(f"更新{stock_code}日线数据时发生错误：{str(e)}")
+        return store.read_frame(stock_code, start_date, end_date)
+    
+    def update_daily_price(self, stock_code, end_date=None, store=None):
+        """增量更新一只股票的本地日线数据
+        
+        Returns:
+            int: 新增的日线条数
+        """
+        if store is None:
+            store = self.daily_store
+        today = datetime.now().strftime("%Y-%m-%d")
+        if end_date is None:
+            end_date = today
+        last = store.last_date(stock_code)
+        start_date = DAILY_HISTORY_START if last is None else (last + timedelta(days=1)).strftime("%Y-%m-%d")
+        if start_date > end_date:
+            return 0
+        
+        df = self._query(
+            'query_history_k_data_plus',
+            use_cache=False,
+            code=stock_code,
+            fields="date," + ",".join(store.fields),
+            start_date=start_date,
+            end_date=end_date,
+            frequency="d",
+            adjustflag="3"
+        )
+        if df is None:
+            print(f'获取{stock_code}日线数据失败: {self.last_error}')
+            return 0
+        return store.append(stock_code, df)
+    
+    def update_daily_prices(self, stock_codes, end_date=None, store=None):
+        """增量更新多只股票的本地日线数据
+        
+        Returns:
+            int: 新增的日线总条数
+        """
+        if store is None:
+            store = self.daily_store
+        total = 0
+        with store.batch():
+            for idx, code in enumerate(stock_codes, 1):
+                added = self.update_daily_price(code, end_date, store)
+                total += added
+                print(f"更新日线: [{idx}/{len(stock_codes)}] {code} 新增 {added} 条")
+        return total
+    
+    @property
+    def daily_store(self):
+        """默认的本地日线存储，首次使用时打开"""
+        if self._daily_store is None:
+            self._daily_store = DailyBarStore()
+        return self._daily_store
     
     def fetch_realtime_quote(self, stock_code):
         """获取股票的实时行情"""
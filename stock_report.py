@@ -0,0 +1,227 @@
+"""
+股票分析报告模块
+为筛选出的股票批量生成图片报告：每个指标一张子图，展示该股票各季度的数值和全市场的分位数带。
+
+使用matplotlib的Agg后端直接绘制到图片，不需要显示环境；matplotlib在创建第一个模板时才导入，
+只引用本模块的常量或读取筛选结果时不加载；
+多进程生成时各进程共用同一份内存映射的财务面板，每个进程只创建一次图表模板，
+之后每只股票只更新曲线数据和标题再保存。
+"""
+
+import math
+import os
+import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import DEFAULT_STORE_ROOT
+from indicator_labels import label, raw_name
+from panel_screener import FinancialPanel, load_financial_panel
+
+# 报告展示的指标
+REPORT_INDICATORS = ['roeAvg', 'npMargin', 'gpMargin', 'netProfit_growth', 'MBRevenue_growth', 'liabilityToAsset']
+
+# 报告输出目录
+DEFAULT_REPORT_DIR = 'reports'
+
+# 批量生成时各进程共用的面板目录
+DEFAULT_REPORT_PANEL_DIR = os.path.join('.cache', 'report_panel')
+
+# 图片分辨率
+REPORT_DPI = 80
+
+# 每个任务包含的股票数量
+DEFAULT_CHUNK_SIZE = 20
+
+# 中文字体（按顺序回退，系统中没有时使用默认字体）
+REPORT_FONTS = ['SimHei', 'Microsoft YaHei', 'PingFang SC', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei',
+                'DejaVu Sans']
+
+
+class ReportTemplate:
+    def __init__(self, panel, indicators=None):
+        """创建报告图表模板
+
+        坐标轴、刻度和全市场分位数带只绘制一次，render时只替换股票的曲线数据和标题。
+
+        Args:
+            panel: FinancialPanel, 财务面板（需包含indicators中的指标）
+            indicators: list, 报告展示的指标，默认为面板中的REPORT_INDICATORS
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.panel = panel
+        self.indicators = [raw_name(name) for name in indicators or REPORT_INDICATORS
+                           if raw_name(name) in panel.indicators]
+        self._rows = {code: i for i, code in enumerate(panel.codes)}
+        _configure_fonts()
+
+        self.figure = Figure(figsize=(12, 7), dpi=REPORT_DPI)
+        FigureCanvasAgg(self.figure)
+        columns = max(1, math.ceil(len(self.indicators) / 2))
+        axes = self.figure.subplots(2, columns, squeeze=False).ravel()
+        for ax in axes[len(self.indicators):]:
+            ax.set_visible(False)
+
+        x = np.arange(len(panel.quarters))
+        ticks = [f"{y}Q{q}" for y, q in panel.quarters]
+        self._panels = []
+        for ax, name in zip(axes, self.indicators):
+            low, median, high = panel.quantiles(name, [25, 50, 75])
+            ax.fill_between(x, low, high, color='tab:gray', alpha=0.2, label='25%~75%')
+            ax.plot(x, median, color='tab:gray', linestyle='--', label='median')
+            line, = ax.plot(x, np.full(len(x), np.nan), color='tab:red', marker='o', label='stock')
+            ax.set_xticks(x, ticks, rotation=45, fontsize=8)
+            ax.set_xlim(-0.5, len(x) - 0.5)
+            ax.grid(True, alpha=0.3)
+            # 分位数带的纵轴范围，股票的数值超出时再扩展
+            band = np.concatenate([low, high])
+            band = band[~np.isnan(band)]
+            limits = (band.min(), band.max()) if len(band) else (0.0, 1.0)
+            self._panels.append((ax, name, panel.indicators.index(name), line, limits))
+        if self._panels:
+            self._panels[0][0].legend(loc='upper left', fontsize=8)
+        self.title = self.figure.suptitle('sh.600000', fontsize=14)
+        # 布局只计算一次，之后各子图位置固定；使用布局引擎时每次保存都要多绘制一遍
+        self.figure.tight_layout(rect=(0, 0, 1, 0.95))
+        self.figure.set_layout_engine(None)
+
+    def render(self, code, path):
+        """绘制一只股票的报告并保存
+
+        Args:
+            code: str, 股票代码
+            path: str, 图片路径
+
+        Returns:
+            bool: 面板中有该股票时返回True
+        """
+        row = self._rows.get(code)
+        if row is None:
+            return False
+        for ax, name, column, line, (low, high) in self._panels:
+            values = np.asarray(self.panel.values[row, :, column])
+            line.set_ydata(values)
+            valid = values[~np.isnan(values)]
+            if len(valid):
+                low, high = min(low, valid.min()), max(high, valid.max())
+            margin = (high - low) * 0.05 or 1.0
+            ax.set_ylim(low - margin, high + margin)
+            latest = f"{valid[-1]:.4g}" if len(valid) else '-'
+            ax.set_title(f"{label(name)}  {latest}", fontsize=10)
+        self.title.set_text(f"{code} {self.panel.names[row]}")
+        self.figure.savefig(path)
+        return True
+
+
+def load_report_panel(indicators=None, quarters=None, store_root=DEFAULT_STORE_ROOT):
+    """加载报告用的财务面板（全部股票、全部季度）"""
+    return load_financial_panel(indicators or REPORT_INDICATORS, quarters=quarters, store_root=store_root)
+
+
+def report_path(output_dir, code):
+    return os.path.join(output_dir, f"{code}.png")
+
+
+def render_reports(template, codes, output_dir=DEFAULT_REPORT_DIR):
+    """用同一个模板依次生成多只股票的报告
+
+    Returns:
+        list: 生成的报告路径，面板中没有的股票为None
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    with warnings.catch_warnings():
+        # 系统没有中文字体时股票名称无法显示，不逐字告警
+        warnings.filterwarnings('ignore', message='Glyph .* missing')
+        for code in codes:
+            path = report_path(output_dir, code)
+            paths.append(path if template.render(code, path) else None)
+    return paths
+
+
+# 工作进程内的报告模板，每个进程只创建一次
+_worker_template = None
+
+
+def _init_worker(panel_dir, indicators):
+    """工作进程初始化：以内存映射方式打开共用的面板，创建图表模板"""
+    global _worker_template
+    _worker_template = ReportTemplate(FinancialPanel.load(panel_dir), indicators)
+
+
+def _render_chunk(output_dir, codes):
+    return render_reports(_worker_template, codes, output_dir)
+
+
+def _configure_fonts():
+    import matplotlib
+    matplotlib.rcParams['font.sans-serif'] = REPORT_FONTS
+    matplotlib.rcParams['axes.unicode_minus'] = False
+
+
+def read_result_codes(results_file='screener_results.csv'):
+    """读取筛选结果文件中的股票代码（第一列）"""
+    df = pd.read_csv(results_file, dtype=str)
+    return df.iloc[:, 0].dropna().tolist()
+
+
+def generate_reports(codes=None, results_file='screener_results.csv', output_dir=DEFAULT_REPORT_DIR,
+                     workers=None, indicators=None, quarters=None, store_root=DEFAULT_STORE_ROOT,
+                     panel_dir=DEFAULT_REPORT_PANEL_DIR, chunk_size=DEFAULT_CHUNK_SIZE):
+    """批量生成股票分析报告
+
+    主进程加载一次财务面板并保存为内存映射文件，工作进程只打开该文件（共用页缓存），
+    各自创建一次图表模板后按批处理股票。
+
+    Args:
+        codes: list, 股票代码，None表示读取results_file中的全部股票
+        results_file: str, 筛选结果文件
+        output_dir: str, 报告输出目录，每只股票一个 {code}.png
+        workers: int, 工作进程数，默认为CPU核数；为1时在当前进程内生成
+        indicators: list, 报告展示的指标，默认为REPORT_INDICATORS
+        quarters: list, [(year, quarter), ...]，默认为全部季度
+        store_root: str, 列式存储目录
+        panel_dir: str, 共用面板的保存目录
+        chunk_size: int, 每个任务包含的股票数量
+
+    Returns:
+        dict: {code: 报告路径}，没有财务数据的股票不包含在内；加载失败时返回空字典
+    """
+    if codes is None:
+        try:
+            codes = read_result_codes(results_file)
+        except Exception as e:
+            print(f"读取筛选结果失败: {e}")
+            return {}
+    indicators = [raw_name(name) for name in indicators or REPORT_INDICATORS]
+    panel = load_report_panel(indicators, quarters, store_root)
+    if panel is None:
+        print("没有可用于生成报告的财务数据")
+        return {}
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, max(1, math.ceil(len(codes) / chunk_size)))
+    if workers <= 1:
+        paths = render_reports(ReportTemplate(panel, indicators), codes, output_dir)
+    else:
+        panel.save(panel_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(panel_dir, indicators)) as executor:
+            paths = [path for chunk_paths in executor.map(_render_chunk, [output_dir] * len(chunks), chunks)
+                     for path in chunk_paths]
+
+    reports = {code: path for code, path in zip(codes, paths) if path is not None}
+    missing = len(codes) - len(reports)
+    print(f"生成报告 {len(reports)} 份，保存在 {output_dir}" + (f"，{missing}只股票没有财务数据" if missing else ''))
+    return reports
+
+
+if __name__ == "__main__":
+    generate_reports(results_file=sys.argv[1] if len(sys.argv) > 1 else 'screener_results.csv')
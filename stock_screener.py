@@ -1,15 +1,33 @@
 """
 股票筛选模块
-根据财务指标和技术指标筛选股票
+根据财务指标和技术指标筛选股票，并可按加权评分排名
 """
 
-import pandas as pd
+import hashlib
+import json
+import time
+
 import numpy as np
+import pandas as pd
+
+from indicator_labels import raw_name
+from metrics import get_registry
+from screen_cache import get_screen_cache, screen_key
+from screen_engine import ScreenData, ScreenPlan
+from scoring import normalize, top_k
 
 
 class StockScreener:
-    def __init__(self):
-        """初始化股票筛选器"""
+    def __init__(self, cache=True, fingerprint_data=False):
+        """初始化股票筛选器
+        
+        Args:
+            cache: ScreenCache/bool, 筛选结果缓存；True使用进程内共用的缓存，False不缓存。
+                只有带数据版本的数据（load_financial_data的结果，或指定了version的ScreenData）才会缓存，
+                版本只是标记，原地修改过的数据应先删除 attrs['data_version']
+            fingerprint_data: bool, 没有版本的DataFrame是否按参与筛选的指标列的内容指纹缓存
+                （每次筛选都要哈希这些列，只在缓存命中能省下较多时间时开启）
+        """
         # 存储筛选条件的字典
         # 格式: {
         #     '报表类型': {
@@ -20,13 +38,20 @@ class StockScreener:
         #     }
         # }
         self.filters = {}
+        # 评分指标: {'指标名': {'weight': 权重, 'normalize': 标准化方式, 'higher_is_better': 是否越大越好}}
+        self.scores = {}
+        self.cache = get_screen_cache() if cache is True else (cache or None)
+        self.fingerprint_data = fingerprint_data
+        # 编译后的执行计划，筛选条件变化时重新编译
+        self._plan = None
         
     def add_filter(self, report_type, indicator_name, min_value=None, max_value=None, allow_null=False):
         """添加筛选条件
         
         Args:
             report_type: str, 报表类型 ('balance'/'income'/'cashflow')
-            indicator_name: str, 指标名称
+            indicator_name: str, 指标名称，原始名称（如roeAvg）或带中文标签的名称
+                （如roeAvg(平均净资产收益率)）均可
             min_value: float, 最小值 (None表示不设下限)
             max_value: float, 最大值 (None表示不设上限)
             allow_null: bool, 是否允许空值
@@ -39,39 +64,163 @@ class StockScreener:
             'max_value': max_value,
             'allow_null': allow_null
         }
+        self._plan = None
+    
+    def remove_filter(self, report_type, indicator_name):
+        """删除筛选条件（条件不存在时忽略）"""
+        indicators = self.filters.get(report_type, {})
+        if indicators.pop(indicator_name, None) is not None:
+            if not indicators:
+                del self.filters[report_type]
+            self._plan = None
+    
+    def compile(self):
+        """将筛选条件编译为执行计划（结果会缓存，直到筛选条件变化）
+        
+        Returns:
+            ScreenPlan: 执行计划
+        """
+        if self._plan is None:
+            self._plan = ScreenPlan.from_filters(self.filters)
+        return self._plan
+    
+    def fingerprint(self):
+        """筛选条件的规范化指纹
+        
+        与条件的添加顺序、报表类型分组以及指标名是否带中文标签无关，
+        筛选结果相同的条件集合得到相同的指纹。
+        """
+        canonical = sorted(
+            [raw_name(indicator),
+             None if conditions['min_value'] is None else float(conditions['min_value']),
+             None if conditions['max_value'] is None else float(conditions['max_value']),
+             bool(conditions['allow_null'])]
+            for indicators in self.filters.values()
+            for indicator, conditions in indicators.items())
+        return hashlib.sha1(json.dumps(canonical).encode('utf-8')).hexdigest()
+    
+    def _run(self, data, incremental=False):
+        """执行筛选并返回通过的行号，使用结果缓存
+        
+        incremental为True时使用数据集上缓存的各条件结果按位组合，
+        否则按通过率顺序只在候选行上求值。
+        数据没有版本时不缓存；开启fingerprint_data时DataFrame（incremental为False）
+        以指标列的内容指纹作为版本。
+        """
+        metrics = get_registry()
+        with metrics.timer('screen_phase_seconds', phase='compile'):
+            plan = self.compile()
+        run = plan.combine if incremental else plan.run
+        version = data.version
+        if version is None and self.cache is not None and self.fingerprint_data and not incremental:
+            with metrics.timer('screen_phase_seconds', phase='prepare'):
+                version = data.fingerprint(condition.indicator for condition in plan.conditions)
+        if self.cache is None or version is None:
+            with metrics.timer('screen_phase_seconds', phase='evaluate'):
+                return run(data)
+        key = screen_key(self.fingerprint(), version)
+        rows = self.cache.get(key)
+        if rows is None:
+            with metrics.timer('screen_phase_seconds', phase='evaluate'):
+                rows = run(data)
+            self.cache.put(key, rows)
+        else:
+            metrics.inc('screen_cache_hits_total')
+        return rows
     
     def screen(self, df):
         """执行筛选
         
+        空值不参与上下限比较，只由allow_null决定是否保留。对同一份数据反复筛选时，
+        传入ScreenData可以复用已转换的指标数组和各条件的结果：增加、修改或删除条件后
+        再次筛选，只有新的条件需要求值，其余条件的结果直接按位组合。
+        
         Args:
-            df: DataFrame, 包含股票数据的DataFrame
+            df: DataFrame/ScreenData, 包含股票数据的DataFrame，列名可以是原始名称或带中文标签的名称
             
         Returns:
-            DataFrame: 符合条件的股票列表
+            DataFrame: 符合条件的股票列表（股票代码和名称两列）
         """
-        # 初始化掩码为全True
-        mask = pd.Series([True] * len(df), index=df.index)
+        metrics = get_registry()
+        start = time.perf_counter()
+        if isinstance(df, ScreenData):
+            data = df
+            rows = self._run(data, incremental=True)
+        else:
+            with metrics.timer('screen_phase_seconds', phase='prepare'):
+                data = ScreenData(df)
+            rows = self._run(data)
+        with metrics.timer('screen_phase_seconds', phase='materialize'):
+            results = data.rows(rows)
+        metrics.observe('screen_seconds', time.perf_counter() - start)
+        metrics.inc('screen_rows_total', len(data))
+        metrics.inc('screen_matches_total', len(results))
+        return results
+    
+    def add_score(self, indicator_name, weight=1.0, normalize='zscore', higher_is_better=True):
+        """添加评分指标
         
-        # 遍历所有筛选条件
-        for report_type, indicators in self.filters.items():
-            for indicator_name, conditions in indicators.items():
-                # 获取指标值
-                values = pd.to_numeric(df[indicator_name], errors='coerce')
-                
-                # 应用最小值过滤
-                if conditions['min_value'] is not None:
-                    mask &= (values.isna() | (values >= conditions['min_value']))
-                
-                # 应用最大值过滤
-                if conditions['max_value'] is not None:
-                    mask &= (values.isna() | (values <= conditions['max_value']))
-                
-                # 应用空值过滤（如果不允许空值，则排除空值的行）
-                if not conditions['allow_null']:
-                    mask &= ~values.isna()
+        Args:
+            indicator_name: str, 指标名称（原始名称或带中文标签的名称）
+            weight: float, 权重
+            normalize: str, 标准化方式，'zscore' 或 'percentile'
+            higher_is_better: bool, 指标是否越大越好（如资产负债率应为False）
+        """
+        self.scores[indicator_name] = {
+            'weight': weight,
+            'normalize': normalize,
+            'higher_is_better': higher_is_better
+        }
+    
+    def rank(self, df, top=None, group_by=None):
+        """在通过筛选的股票中按加权评分排名
+        
+        各评分指标在通过筛选的股票范围内标准化后乘以权重相加，
+        缺失值的贡献记为0。前top名通过部分选择取出，不对全部股票排序。
+        
+        Args:
+            df: DataFrame/ScreenData, 股票数据
+            top: int, 取前几名（分组时为每组前几名），None表示全部
+            group_by: str, 分组排名：'exchange' 按交易所（代码前缀sh/sz/bj），
+                或数据中的列名（如行业）；None表示不分组
+            
+        Returns:
+            DataFrame: 股票代码和名称、分组（如有）、总分score、组内名次rank，
+            以及各指标的得分 {指标名}_score；按分组和名次排列
+        """
+        data = df if isinstance(df, ScreenData) else ScreenData(df)
+        rows = self._run(data, incremental=isinstance(df, ScreenData))
+        
+        # 计算各指标得分
+        score = np.zeros(len(rows))
+        parts = {}
+        for indicator, spec in self.scores.items():
+            values = normalize(data.values(indicator)[rows], spec['normalize'])
+            if not spec['higher_is_better']:
+                values = 1 - values if spec['normalize'] == 'percentile' else -values
+            parts[f"{indicator}_score"] = spec['weight'] * np.nan_to_num(values, nan=0.0)
+            score += parts[f"{indicator}_score"]
+        
+        # 分组
+        groups = None
+        if group_by == 'exchange':
+            groups = data.df[data.code_column].astype(str).str[:2].to_numpy()[rows]
+        elif group_by is not None:
+            groups = data.df[group_by].to_numpy()[rows]
         
-        # 返回符合条件的股票
-        return df[mask][['code(股票代码)', 'stock_name(股票名称)']]
+        selected = top_k(score, top, groups)
+        result = data.rows(rows[selected])
+        if groups is not None:
+            result.insert(len(result.columns), group_by, groups[selected])
+            # 组内名次，每组从1开始
+            ranks = pd.Series(groups[selected]).groupby(groups[selected], dropna=False).cumcount().to_numpy() + 1
+        else:
+            ranks = np.arange(1, len(selected) + 1)
+        result.insert(len(result.columns), 'score', score[selected])
+        result.insert(len(result.columns), 'rank', ranks)
+        for name, values in parts.items():
+            result.insert(len(result.columns), name, values[selected])
+        return result
     
     def get_filter_description(self):
         """获取当前的筛选条件描述"""
@@ -1,30 +1,371 @@
 """
 股票数据展示模块
 负责展示股票的财务数据和图表
+
+数据访问层按季度缓存在进程内（所有会话共用），单只股票的历史在选中后才加载，
+全市场的趋势图在服务端汇总为分位数带，长序列在服务端降采样后再发送给浏览器。
+
+启动：streamlit run stock_viewer.py
 """
 
+import os
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
+
+from columnar_store import ColumnStore, DEFAULT_STORE_ROOT
+from data_loader import available_quarters, load_financial_data, load_snapshot, source_versions
+from derived_indicators import DerivedEngine
+from indicator_labels import apply_labels, label, raw_name
+from panel_screener import load_financial_panel
+from stock_report import DEFAULT_REPORT_DIR, ReportTemplate, load_report_panel, render_reports
+from timeseries_store import DailyBarStore, DEFAULT_BARS_ROOT
+
+# 概览表格和对比表格展示的指标
+OVERVIEW_INDICATORS = ['roeAvg', 'npMargin', 'gpMargin', 'netProfit', 'netProfit_growth',
+                       'MBRevenue', 'MBRevenue_growth', 'epsTTM', 'liabilityToAsset', 'currentRatio']
+
+# 全市场趋势图的分位数
+UNIVERSE_QUANTILES = [10, 25, 50, 75, 90]
+
+# 发送给浏览器的单条曲线最多点数
+DEFAULT_MAX_POINTS = 500
+
+# 缓存的单只股票历史数量上限
+MAX_CACHED_STOCKS = 256
+
+
+def _quarter_label(year, quarter):
+    return f"{year}Q{quarter}"
+
+
+def data_token(store_root=DEFAULT_STORE_ROOT):
+    """当前数据的版本标记：全部季度及其报表分区、来源CSV的修改时间
+
+    只做几次stat，作为缓存键的一部分；重新采集或导入后标记改变，缓存的数据随之失效。
+    """
+    store = ColumnStore(store_root)
+    return tuple((year, quarter, source_versions(store, year, quarter))
+                 for year, quarter in available_quarters(store))
+
+
+@st.cache_resource(show_spinner=False)
+def load_quarter(year, quarter, token, store_root=DEFAULT_STORE_ROOT):
+    """一个季度的宽表，每个进程只加载一次，所有会话共用同一对象（调用方不得修改）
+
+    Args:
+        token: data_token()的返回值，数据变化后使用新的缓存项
+
+    Returns:
+        DataFrame: 原始列名的宽表；加载失败时返回None
+    """
+    return load_financial_data(year, quarter, store_root=store_root, labels=False)
+
+
+@st.cache_resource(show_spinner=False)
+def stock_choices(year, quarter, token, store_root=DEFAULT_STORE_ROOT):
+    """某季度的股票选项 {code: '代码 名称'}，供选择框使用"""
+    df = load_quarter(year, quarter, token, store_root)
+    if df is None:
+        return {}
+    codes = df['code'].astype(str).to_numpy()
+    names = df['stock_name'].astype(str).to_numpy()
+    return {code: f"{code} {name}" for code, name in zip(codes, names)}
+
+
+@st.cache_data(show_spinner=False, max_entries=MAX_CACHED_STOCKS)
+def load_stock_history(code, token, store_root=DEFAULT_STORE_ROOT):
+    """一只股票在全部季度的财务数据，只读取该股票所在的行
+
+    Returns:
+        DataFrame: 每个季度一行，index为季度（如2024Q3）；没有数据时为空表
+    """
+    store = ColumnStore(store_root)
+    engine = DerivedEngine(store)
+    rows = []
+    for year, quarter in available_quarters(store):
+        try:
+            df = load_snapshot(store, engine, year, quarter, codes=[code])
+        except Exception as e:
+            print(f"跳过 {_quarter_label(year, quarter)}：{e}")
+            continue
+        if len(df):
+            rows.append(df.iloc[[0]].assign(quarter=_quarter_label(year, quarter)))
+    if not rows:
+        return pd.DataFrame()
+    history = pd.concat(rows, ignore_index=True).set_index('quarter')
+    history['code'] = history['code'].astype(str)
+    return history
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def universe_trend(indicator, token, store_root=DEFAULT_STORE_ROOT):
+    """全市场某指标各季度的分位数带
+
+    (股票数 × 季度数) 的面板在服务端汇总为每个分位数一条曲线，
+    浏览器只收到 分位数个数 × 季度数 个点。
+
+    Returns:
+        DataFrame: index为季度，列为 p10/p25/p50/p75/p90 和有效股票数count；没有数据时返回None
+    """
+    panel = load_financial_panel([indicator], store_root=store_root)
+    if panel is None:
+        return None
+    values = np.asarray(panel.indicator(indicator))
+    bands = panel.quantiles(indicator, UNIVERSE_QUANTILES)
+    trend = pd.DataFrame(bands.T, columns=[f"p{q}" for q in UNIVERSE_QUANTILES],
+                         index=pd.Index([_quarter_label(y, q) for y, q in panel.quarters], name='quarter'))
+    trend['count'] = (~np.isnan(values)).sum(axis=0)
+    return trend
+
+
+@st.cache_resource(show_spinner=False)
+def report_template(token, store_root=DEFAULT_STORE_ROOT):
+    """报告图表模板，每个数据版本只创建一次；没有数据时返回None"""
+    panel = load_report_panel(store_root=store_root)
+    return None if panel is None else ReportTemplate(panel)
+
+
+@st.cache_resource(show_spinner=False)
+def daily_bar_store(root=DEFAULT_BARS_ROOT):
+    """日线存储（内存映射，所有会话共用）；目录不存在时返回None"""
+    if not os.path.isdir(root):
+        return None
+    return DailyBarStore(root)
+
+
+def downsample_minmax(values, max_points=DEFAULT_MAX_POINTS):
+    """最小/最大值降采样，保留曲线的峰谷
+
+    将序列等分为max_points/2个区间，每个区间保留最小值和最大值所在的点，以及首尾两点。
+
+    Args:
+        values: array-like, 数值序列，NaN会被跳过
+        max_points: int, 最多保留的点数
+
+    Returns:
+        numpy.ndarray: 保留的点在原序列中的位置（升序）
+    """
+    values = np.asarray(values, dtype='float64')
+    positions = np.flatnonzero(~np.isnan(values))
+    if len(positions) <= max_points:
+        return positions
+    buckets = max(1, max_points // 2)
+    bucket = np.arange(len(positions)) * buckets // len(positions)
+    # 区间内按数值排序：每个区间的第一个为最小值，最后一个为最大值
+    order = np.lexsort((values[positions], bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], len(order)) - 1
+    keep = np.union1d(np.union1d(order[starts], order[ends]), [0, len(positions) - 1])
+    return positions[keep]
+
+
+def line_chart(df, temporal=False):
+    """折线图：每列一条曲线，index为横轴
+
+    直接生成vega-lite规格，不经过altair构建和校验（st.line_chart每次约需100多毫秒）。
+
+    Args:
+        df: DataFrame/Series, 要绘制的数据
+        temporal: bool, 横轴是否为日期
+    """
+    frame = df.to_frame() if isinstance(df, pd.Series) else df
+    x = frame.index.name or 'index'
+    long = frame.rename_axis(x).reset_index().melt(x, var_name='series', value_name='value')
+    spec = {
+        'mark': {'type': 'line', 'point': not temporal},
+        'encoding': {
+            'x': {'field': x, 'type': 'temporal' if temporal else 'ordinal', 'sort': None},
+            'y': {'field': 'value', 'type': 'quantitative', 'title': None},
+            'color': {'field': 'series', 'type': 'nominal', 'title': None},
+        },
+    }
+    st.vega_lite_chart(long, spec, width='stretch')
+
+
+@st.cache_resource(show_spinner=False)
+def quarter_summary(year, quarter, token, columns, store_root=DEFAULT_STORE_ROOT):
+    """某季度各指标的分布概要（数量、均值、四分位数），计算一次后所有会话共用"""
+    df = load_quarter(year, quarter, token, store_root)
+    return apply_labels(df[list(columns)].describe().T[['count', 'mean', '25%', '50%', '75%']])
 
 
 class StockViewer:
-    def __init__(self):
-        """初始化数据展示器"""
-        pass
-        
+    def __init__(self, store_root=DEFAULT_STORE_ROOT, bars_root=DEFAULT_BARS_ROOT,
+                 indicators=None, max_points=DEFAULT_MAX_POINTS):
+        """初始化数据展示器
+
+        Args:
+            store_root: str, 列式存储目录
+            bars_root: str, 日线存储目录
+            indicators: list, 概览和对比展示的指标，默认为OVERVIEW_INDICATORS
+            max_points: int, 长序列降采样后的最多点数
+        """
+        self.store_root = store_root
+        self.bars_root = bars_root
+        self.indicators = indicators or OVERVIEW_INDICATORS
+        self.max_points = max_points
+        self.token = None
+        self.quarter = None
+        self.quarter_data = None
+
+    def _columns(self, df):
+        return [col for col in self.indicators if col in df.columns]
+
     def show_financial_overview(self, stock_data):
-        """展示财务数据概览"""
-        pass
-    
+        """展示财务数据概览
+
+        Args:
+            stock_data: DataFrame, 一个季度的宽表（load_quarter的返回值）
+        """
+        if stock_data is None or len(stock_data) == 0:
+            st.warning("没有可展示的财务数据")
+            return
+        columns = self._columns(stock_data)
+        st.metric("股票数量", len(stock_data))
+        # 只发送展示用的列，宽表的其余列不序列化
+        table = stock_data[['code', 'stock_name'] + columns]
+        year, quarter = self.quarter
+        st.dataframe(quarter_summary(year, quarter, self.token, tuple(columns), self.store_root))
+        st.dataframe(apply_labels(table), hide_index=True)
+
     def plot_financial_trends(self, stock_data):
-        """绘制财务指标趋势图"""
-        pass
-    
+        """绘制财务指标趋势图
+
+        Args:
+            stock_data: DataFrame, 一只股票各季度的数据（load_stock_history的返回值）
+        """
+        if stock_data is None or len(stock_data) == 0:
+            st.info("没有该股票的财务数据")
+            return
+        columns = self._columns(stock_data)
+        selected = st.multiselect("指标", columns, default=columns[:2], format_func=label,
+                                  key='trend_indicators')
+        if selected:
+            line_chart(apply_labels(stock_data[selected]))
+
+        code = stock_data['code'].iloc[0]
+        store = daily_bar_store(self.bars_root)
+        if store is not None and code in store.segments:
+            bars = store.read(code, fields=['close'])
+            keep = downsample_minmax(bars['close'], self.max_points)
+            st.caption(f"日收盘价（{len(bars['close'])}个交易日，显示{len(keep)}个点）")
+            line_chart(pd.Series(bars['close'][keep], name='close',
+                                 index=pd.DatetimeIndex(bars['date'][keep], name='date')), temporal=True)
+
     def show_stock_comparison(self, stock_list):
-        """展示多只股票的对比数据"""
-        pass
-    
-    def generate_report(self, stock_code):
-        """生成股票分析报告"""
-        pass 
\ No newline at end of file
+        """展示多只股票的对比数据
+
+        Args:
+            stock_list: list, 股票代码，数据取自当前选择的季度
+        """
+        if not stock_list:
+            return
+        df = self.quarter_data
+        if df is None:
+            st.warning("没有可对比的财务数据")
+            return
+        rows = df[df['code'].isin(stock_list)]
+        table = rows.set_index(rows['code'].astype(str))[['stock_name'] + self._columns(df)]
+        st.dataframe(apply_labels(table.T.astype(str)))
+
+    def show_universe_trend(self, indicator, highlight=None):
+        """全市场某指标的分位数带，可叠加一只股票的曲线
+
+        Args:
+            indicator: str, 指标名称
+            highlight: DataFrame, 叠加展示的股票历史（load_stock_history的返回值）
+        """
+        indicator = raw_name(indicator)
+        trend = universe_trend(indicator, self.token, self.store_root)
+        if trend is None:
+            st.info("没有可展示的数据")
+            return
+        chart = trend.drop(columns='count')
+        if highlight is not None and indicator in getattr(highlight, 'columns', []):
+            chart = chart.join(highlight[indicator].rename(highlight['code'].iloc[0]))
+        line_chart(chart)
+        st.caption(f"{label(indicator)}：各季度有效股票数 " +
+                   "，".join(f"{q} {n}" for q, n in trend['count'].items()))
+
+    def generate_report(self, stock_code, output_dir=DEFAULT_REPORT_DIR):
+        """生成股票分析报告
+
+        报告模板（含全市场分位数带）按数据版本缓存，每只股票只更新曲线后保存。
+        批量生成筛选结果的报告请使用 stock_report.generate_reports。
+
+        Args:
+            stock_code: str, 股票代码
+            output_dir: str, 报告输出目录
+
+        Returns:
+            str: 报告图片路径；没有该股票的财务数据时返回None
+        """
+        template = report_template(self.token or data_token(self.store_root), self.store_root)
+        if template is None:
+            return None
+        return render_reports(template, [stock_code], output_dir)[0]
+
+    def run(self):
+        """Streamlit应用入口
+
+        季度数据在首次访问时加载并在进程内共用；股票在选中后才加载其历史；
+        个股和对比区域放在独立的fragment中，交互时只重新运行该区域。
+        """
+        st.title("股票财务数据")
+        self.token = data_token(self.store_root)
+        quarters = available_quarters(ColumnStore(self.store_root))
+        if not quarters:
+            st.warning(f"没有可加载的财务数据: {self.store_root}")
+            return
+        year, quarter = st.sidebar.selectbox("季度", quarters[::-1],
+                                             format_func=lambda yq: _quarter_label(*yq))
+        self.quarter = (year, quarter)
+        self.quarter_data = load_quarter(year, quarter, self.token, self.store_root)
+        if self.quarter_data is None:
+            st.error(f"{_quarter_label(year, quarter)} 数据加载失败")
+            return
+        choices = stock_choices(year, quarter, self.token, self.store_root)
+
+        overview, detail, comparison, universe = st.tabs(["概览", "个股", "对比", "全市场趋势"])
+        with overview:
+            self.show_financial_overview(self.quarter_data)
+        with detail:
+            self._detail_fragment(choices)
+        with comparison:
+            self._comparison_fragment(choices)
+        with universe:
+            self._universe_fragment()
+
+    @st.fragment
+    def _detail_fragment(self, choices):
+        code = st.selectbox("股票", list(choices), index=None, format_func=choices.get,
+                            placeholder="选择股票", key='detail_code')
+        if code is not None:
+            self.plot_financial_trends(load_stock_history(code, self.token, self.store_root))
+            if st.button("生成报告", key='detail_report'):
+                path = self.generate_report(code)
+                if path is None:
+                    st.warning("没有该股票的财务数据")
+                else:
+                    st.image(path)
+
+    @st.fragment
+    def _comparison_fragment(self, choices):
+        codes = st.multiselect("股票", list(choices), format_func=choices.get, max_selections=10,
+                               key='compare_codes')
+        self.show_stock_comparison(codes)
+
+    @st.fragment
+    def _universe_fragment(self):
+        columns = self._columns(self.quarter_data)
+        indicator = st.selectbox("指标", columns, format_func=label, key='universe_indicator')
+        code = st.session_state.get('detail_code')
+        highlight = load_stock_history(code, self.token, self.store_root) if code else None
+        if indicator:
+            self.show_universe_trend(indicator, highlight)
+
+
+if __name__ == "__main__":
+    StockViewer().run()
@@ -1,3 +1,4 @@
+from bs_session import output_path
 from stock_data_collector import StockDataCollector
 import pandas as pd
 import os
@@ -21,8 +22,11 @@ def test_fetch_stock_list():
     print(status_stats)
     
     # 保存数据到CSV文件（方便查看完整数据）
-    stock_list.to_csv('stock_list.csv', index=False, encoding='utf-8-sig')
-    print("\n数据已保存到 stock_list.csv")
+    # BAOSTOCK_MOCK=1 时保存到模拟数据的输出目录
+    output_file = output_path('stock_list.csv')
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    stock_list.to_csv(output_file, index=False, encoding='utf-8-sig')
+    print(f"\n数据已保存到 {output_file}")
 
 
 def test_fetch_financial_data():
@@ -37,8 +41,8 @@ def test_fetch_financial_data():
     print(f"\n=== 获取 {stock_code} 的财务数据 ({year}年第{quarter}季度) ===")
     financial_data = collector.fetch_financial_data(stock_code, year, quarter)
     
-    # 创建输出目录
-    output_dir = f"financial_data_{stock_code.replace('.', '_')}_{year}Q{quarter}"
+    # 创建输出目录（BAOSTOCK_MOCK=1 时在模拟数据的输出目录下，不覆盖真实数据）
+    output_dir = output_path(f"financial_data_{stock_code.replace('.', '_')}_{year}Q{quarter}")
     os.makedirs(output_dir, exist_ok=True)
     
     # 保存并显示各个报表的数据
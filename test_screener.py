@@ -1,43 +1,6 @@
 """测试股票筛选功能"""
-import pandas as pd
 from stock_screener import StockScreener
-
-def load_financial_data(year, quarter):
-    try:
-        # 加载各类财务数据
-        balance_data = pd.read_csv(f'financial_data_all_{year}Q{quarter}_cn/balance_all.csv')
-        profit_data = pd.read_csv(f'financial_data_all_{year}Q{quarter}_cn/profit_all.csv')
-        indicators_data = pd.read_csv(f'financial_data_all_{year}Q{quarter}_cn/indicators_all.csv')
-        
-        # 加载上一年同期数据用于计算同比增长
-        try:
-            last_year_profit = pd.read_csv(f'financial_data_all_{year-1}Q{quarter}_cn/profit_all.csv')
-            # 计算净利润同比增长率
-            profit_data = profit_data.merge(
-                last_year_profit[['code(股票代码)', 'netProfit(净利润)']],
-                on='code(股票代码)',
-                how='left',
-                suffixes=('', '_last_year')
-            )
-            # 计算增长率
-            profit_data['netProfit_growth'] = (profit_data['netProfit(净利润)'] - profit_data['netProfit(净利润)_last_year']) / abs(profit_data['netProfit(净利润)_last_year'])
-            
-            # 计算净利润规模（以亿为单位）
-            profit_data['netProfit_scale'] = profit_data['netProfit(净利润)'] / 100000000
-            
-        except Exception as e:
-            print(f"无法加载上年同期数据，跳过增长率计算: {e}")
-            profit_data['netProfit_growth'] = None
-            profit_data['netProfit_scale'] = None
-        
-        # 合并数据
-        merged_data = balance_data.merge(profit_data, on=['code(股票代码)', 'stock_name(股票名称)'], how='left')
-        merged_data = merged_data.merge(indicators_data, on=['code(股票代码)', 'stock_name(股票名称)'], how='left')
-        
-        return merged_data
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return None
+from data_loader import load_financial_data
 
 def main():
     # 创建股票筛选器
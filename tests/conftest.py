@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+# 各模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar_store import ColumnStore  # noqa: E402
+from mock_baostock import MockBaostock  # noqa: E402
+from stock_data_collector import REPORT_FIELDS  # noqa: E402
+
+# 模拟数据包含的季度：2024Q3，以及同比、环比、TTM用到的往期
+MOCK_QUARTERS = [(2023, 3), (2023, 4), (2024, 2), (2024, 3)]
+
+
+def write_mock_store(root, stocks, quarters=MOCK_QUARTERS):
+    """把模拟接口生成的各季度报表写入列式存储，返回模拟接口"""
+    store = ColumnStore(root)
+    mock = MockBaostock(stocks=stocks)
+    for year, quarter in quarters:
+        for report_type in REPORT_FIELDS:
+            store.write(year, quarter, report_type, mock.report_frame(report_type, year, quarter))
+    return mock
+
+
+@pytest.fixture(scope='session')
+def mock_store(tmp_path_factory):
+    """由模拟接口生成的列式存储（2000只股票），各测试共用，只读"""
+    root = str(tmp_path_factory.mktemp('store'))
+    write_mock_store(root, 2000)
+    return root
+
+
+@pytest.fixture
+def new_store(tmp_path):
+    """可修改的列式存储（300只股票），返回 (存储目录, 模拟接口)"""
+    root = str(tmp_path / 'store')
+    return root, write_mock_store(root, 300)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """在空目录中运行，不会读到仓库中的CSV，也不会在仓库中留下文件"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,99 @@
+"""baostock会话的行为测试：延迟登录、断线重新登录、指数退避重试、不可重试的错误"""
+import pytest
+
+import bs_session
+from bs_session import BaostockSession, QueryFailed, get_session
+from mock_baostock import MockBaostock
+
+
+class _Result:
+    def __init__(self, error_code='0', error_msg='success'):
+        self.error_code = error_code
+        self.error_msg = error_msg
+
+
+class ScriptedApi:
+    """按顺序返回预设错误码的接口，'0'表示成功"""
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+        self.logins = 0
+        self.calls = 0
+
+    def login(self):
+        self.logins += 1
+        return _Result()
+
+    def logout(self):
+        return _Result()
+
+    def query_profit_data(self, **params):
+        self.calls += 1
+        return _Result(self.codes.pop(0) if self.codes else '0')
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录退避等待的时间，不实际等待"""
+    delays = []
+    monkeypatch.setattr(bs_session.time, 'sleep', delays.append)
+    return delays
+
+
+def test_login_once_on_first_call(sleeps):
+    api = ScriptedApi([])
+    session = BaostockSession(api=api)
+    assert api.logins == 0
+    for _ in range(3):
+        assert session.call('query_profit_data', lambda rs: 'ok') == 'ok'
+    assert (api.logins, api.calls, session.retries) == (1, 3, 0)
+    assert sleeps == []
+
+
+def test_relogin_and_retry_after_network_error(sleeps):
+    api = ScriptedApi(['10002001', '10004001', '0'])
+    session = BaostockSession(api=api, backoff=0.5)
+    assert session.call('query_profit_data', lambda rs: 'ok') == 'ok'
+    # 网络错误后重新登录，解析错误只重试不重新登录
+    assert (api.logins, api.calls, session.retries) == (2, 3, 2)
+    assert 0.25 <= sleeps[0] <= 0.5 and 0.5 <= sleeps[1] <= 1.0
+
+
+def test_gives_up_after_max_retries(sleeps):
+    api = ScriptedApi(['10002001'] * 10)
+    session = BaostockSession(api=api, max_retries=4, backoff=1.0, max_backoff=3.0)
+    with pytest.raises(QueryFailed) as info:
+        session.call('query_profit_data', lambda rs: 'ok')
+    assert info.value.error_code == '10002001'
+    assert api.calls == 5
+    # 等待时间指数增长，不超过上限
+    assert len(sleeps) == 4 and max(sleeps) <= 3.0 and sleeps[1] >= sleeps[0] * 2 * 0.5
+
+
+def test_non_retryable_error_raises_immediately(sleeps):
+    api = ScriptedApi(['10004011'])
+    session = BaostockSession(api=api)
+    with pytest.raises(QueryFailed):
+        session.call('query_profit_data', lambda rs: 'ok')
+    assert api.calls == 1 and sleeps == []
+
+
+def test_paging_error_retries_whole_query(sleeps):
+    api = ScriptedApi([])
+    session = BaostockSession(api=api)
+    pages = iter(['10002002', '0'])
+
+    def consume(rs):
+        # 翻页失败时结果集的错误码被改写
+        rs.error_code = next(pages)
+        return 'rows'
+    assert session.call('query_profit_data', consume) == 'rows'
+    assert (api.calls, api.logins) == (2, 2)
+
+
+def test_get_session_reuses_mock_session(monkeypatch):
+    monkeypatch.setenv('BAOSTOCK_MOCK', '1')
+    monkeypatch.setattr(bs_session, '_sessions', {})
+    session = get_session()
+    assert session is get_session()
+    assert session.mocked and isinstance(session.api, MockBaostock)
@@ -0,0 +1,128 @@
+"""全市场采集的行为测试：使用模拟接口，检查检查点续传、增量更新和失败处理"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bs_session
+import collect_all_financial_data as collect_all
+from columnar_store import ColumnStore
+from metrics import get_registry
+from stock_data_collector import REPORT_FIELDS
+
+
+@pytest.fixture
+def mock_env(workdir, monkeypatch):
+    """使用模拟接口（40只股票）采集，输出到临时目录，返回输出目录"""
+    output = workdir / 'mock_output'
+    monkeypatch.setenv('BAOSTOCK_MOCK', '1')
+    monkeypatch.setenv('BAOSTOCK_MOCK_STOCKS', '40')
+    monkeypatch.setenv('BAOSTOCK_MOCK_OUTPUT', str(output))
+    monkeypatch.setattr(bs_session, '_sessions', {})
+    return output
+
+
+def collect(**kwargs):
+    collect_all.collect_all_financial_data(2024, 3, max_rps=None, **kwargs)
+
+
+def read_store(output, report_type='profit'):
+    df = ColumnStore(str(output / 'financial_store')).read(2024, 3, report_type)
+    return df.assign(code=df['code'].astype(str))
+
+
+def count_requests(monkeypatch, fail=()):
+    """记录请求过的股票，fail中的股票返回失败"""
+    requested = []
+    fetch = collect_all._fetch_stock
+
+    def fake_fetch(collector, year, quarter, code):
+        requested.append(code)
+        if code in fail:
+            return {}, 'network error'
+        return fetch(collector, year, quarter, code)
+    monkeypatch.setattr(collect_all, '_fetch_stock', fake_fetch)
+    return requested
+
+
+def unpublished_codes(output):
+    """模拟数据中本季度尚未发布报表的股票（有检查点，但汇总数据中没有）"""
+    checkpoint_dir = output / 'financial_data_all_2024Q3' / 'checkpoints'
+    codes = set(name[:-4] for name in os.listdir(checkpoint_dir))
+    return sorted(codes - set(read_store(output)['code']))
+
+
+def unpublish(checkpoint_dir, code):
+    """把检查点改为报表尚未发布的状态"""
+    path = collect_all._checkpoint_path(checkpoint_dir, code)
+    financial_data = pd.read_pickle(path)
+    for df in financial_data.values():
+        df['pubDate'] = pd.NaT
+    pd.to_pickle(financial_data, path)
+
+
+def test_resume_skips_checkpointed_stocks(mock_env, monkeypatch):
+    collect()
+    expected = read_store(mock_env)
+    checkpoint_dir = mock_env / 'financial_data_all_2024Q3' / 'checkpoints'
+    codes = sorted(name[:-4] for name in os.listdir(checkpoint_dir))
+    assert sorted(list(expected['code'].unique()) + unpublished_codes(mock_env)) == codes
+
+    # 删除两个检查点后重新运行，只请求这两只股票
+    for code in codes[:2]:
+        os.remove(collect_all._checkpoint_path(checkpoint_dir, code))
+    requested = count_requests(monkeypatch)
+    collect()
+    assert sorted(requested) == codes[:2]
+    pd.testing.assert_frame_equal(read_store(mock_env), expected)
+
+
+def test_incremental_refetches_only_unpublished(mock_env, monkeypatch):
+    collect()
+    checkpoint_dir = mock_env / 'financial_data_all_2024Q3' / 'checkpoints'
+    code = read_store(mock_env)['code'].iloc[3]
+    unpublish(checkpoint_dir, code)
+    requested = count_requests(monkeypatch)
+    collect(incremental=True)
+    assert sorted(requested) == sorted([code] + unpublished_codes(mock_env))
+    assert read_store(mock_env)['pubDate'].notna().all()
+
+
+def test_failed_refetch_keeps_checkpoint_data(mock_env, monkeypatch):
+    collect()
+    expected = read_store(mock_env)
+    output_dir = mock_env / 'financial_data_all_2024Q3'
+    code = expected['code'].iloc[3]
+    unpublish(output_dir / 'checkpoints', code)
+    requested = count_requests(monkeypatch, fail={code})
+    collect(incremental=True)
+    # 补采时再请求一次
+    assert sorted(requested) == sorted([code, code] + unpublished_codes(mock_env))
+
+    # 重新请求失败的股票保留检查点中的数据，同时记录为失败
+    result = read_store(mock_env)
+    assert result['code'].tolist() == expected['code'].tolist()
+    row = result['code'] == code
+    assert result.loc[row, 'pubDate'].isna().all()
+    np.testing.assert_array_equal(result.loc[row, 'netProfit'], expected.loc[row, 'netProfit'])
+    failed = pd.read_csv(output_dir / 'failed_stocks.csv', dtype=str)
+    assert failed['code'].tolist() == [code]
+    for report_type in REPORT_FIELDS:
+        assert code in set(read_store(mock_env, report_type)['code'])
+
+
+def test_parallel_collection_matches_sequential(mock_env, monkeypatch):
+    collect(workers=1)
+    expected = {report_type: read_store(mock_env, report_type) for report_type in REPORT_FIELDS}
+
+    # 多进程采集到另一个目录，汇总数据的内容和顺序与顺序采集相同
+    parallel = mock_env.parent / 'parallel_output'
+    monkeypatch.setenv('BAOSTOCK_MOCK_OUTPUT', str(parallel))
+    registry = get_registry()
+    rows = registry.counter('baostock_rows_total', api='query_profit_data')
+    collect(workers=2, chunk_size=7)
+    for report_type, df in expected.items():
+        pd.testing.assert_frame_equal(read_store(parallel, report_type), df)
+    # 工作进程的运行指标汇总到主进程
+    assert registry.counter('baostock_rows_total', api='query_profit_data') - rows == len(expected['profit'])
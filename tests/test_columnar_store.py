@@ -0,0 +1,55 @@
+"""列式存储的行为测试：写入读取往返、按列和按股票读取、季度列表"""
+import numpy as np
+import pandas as pd
+
+from columnar_store import ColumnStore
+from data_loader import available_quarters
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'code': ['sh.600000', 'sz.000001', 'sh.600519'],
+        'stock_name': ['浦发银行', None, '贵州茅台'],
+        'pubDate': ['2024-10-30', '2024-10-25', None],
+        'roeAvg': [0.08, np.nan, 0.25],
+    })
+
+
+def test_write_read_round_trip(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    df = sample_frame()
+    store.write(2024, 3, 'profit', df)
+    result = store.read(2024, 3, 'profit')
+    assert list(result.columns) == list(df.columns)
+    assert result['code'].astype(str).tolist() == df['code'].tolist()
+    assert result['stock_name'].tolist() == df['stock_name'].tolist()
+    assert result['pubDate'].isna().tolist() == [False, False, True]
+    np.testing.assert_array_equal(result['roeAvg'].to_numpy(), df['roeAvg'].to_numpy())
+
+
+def test_read_selected_columns_and_codes(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    store.write(2024, 3, 'profit', sample_frame())
+    result = store.read(2024, 3, 'profit', columns=['code', 'roeAvg'], codes=['sh.600519'])
+    assert result['code'].astype(str).tolist() == ['sh.600519']
+    assert result['roeAvg'].tolist() == [0.25]
+
+
+def test_quarters_count_only_report_partitions(workdir):
+    store = ColumnStore(str(workdir / 'store'))
+    store.write(2024, 3, 'profit', sample_frame())
+    # 只有衍生指标或快照的季度不是有数据的季度
+    store.write(2026, 3, 'derived', sample_frame()[['code']])
+    store.write(2026, 2, 'snapshot', sample_frame())
+    assert store.quarters() == [(2024, 3), (2026, 2), (2026, 3)]
+    assert store.quarters(['profit', 'balance']) == [(2024, 3)]
+    assert available_quarters(store) == [(2024, 3)]
+
+
+def test_all_null_text_column_round_trip(tmp_path):
+    store = ColumnStore(str(tmp_path))
+    df = pd.DataFrame({'code': ['sh.1', 'sh.2'], 'stock_name': [None, None], 'roeAvg': [0.1, 0.2]})
+    store.write(2024, 3, 'profit', df)
+    result = store.read(2024, 3, 'profit')
+    assert result['stock_name'].tolist() == [None, None]
+    assert store.read(2024, 3, 'profit', codes=['sh.2'])['stock_name'].tolist() == [None]
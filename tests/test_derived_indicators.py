@@ -0,0 +1,87 @@
+"""衍生指标引擎的行为测试：表达式检查、依赖环、求值结果和按指标的缓存"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnStore
+from derived_indicators import DerivedEngine, parse_expression
+
+
+@pytest.mark.parametrize('expression', [
+    "__import__('os').system('echo')",
+    'netProfit.real',
+    'netProfit if netProfit else 0',
+    '(lambda: 1)()',
+    'netProfit[0]',
+    'ttm(netProfit, 1)',
+    'lag(netProfit, -1)',
+    'lag(netProfit, n=1)',
+    'foo(netProfit)',
+    "'text'",
+])
+def test_parse_expression_rejects_unsupported_syntax(expression):
+    with pytest.raises((ValueError, SyntaxError)):
+        parse_expression(expression)
+
+
+def test_define_rejects_cycles_and_keeps_definitions(mock_store):
+    engine = DerivedEngine(ColumnStore(mock_store), definitions={'a': 'netProfit * 2', 'b': 'a + 1'})
+    with pytest.raises(ValueError):
+        engine.define('a', 'b - 1')
+    assert engine.definitions == {'a': 'netProfit * 2', 'b': 'a + 1'}
+
+
+def test_derived_values_match_pandas(mock_store, workdir):
+    store = ColumnStore(mock_store)
+    engine = DerivedEngine(store, definitions={
+        'growth': 'yoy(netProfit)',
+        'change': 'qoq(netProfit)',
+        'last_year': 'lag(netProfit, 4)',
+        'ttm_profit': 'ttm(netProfit)',
+        'scaled': '-abs(netProfit) / 100000000 + 1',
+        'nested': 'growth * 2 + last_year',
+    })
+    result = engine.compute(2024, 3).set_index('code')
+
+    def profit(year, quarter):
+        df = store.read(year, quarter, 'profit', columns=['code', 'netProfit'])
+        return df.assign(code=df['code'].astype(str)).set_index('code')['netProfit'].reindex(result.index)
+
+    current, last_year, previous, last_q4 = profit(2024, 3), profit(2023, 3), profit(2024, 2), profit(2023, 4)
+    expected = pd.DataFrame({
+        'growth': (current - last_year) / last_year.abs(),
+        'change': (current - previous) / previous.abs(),
+        'last_year': last_year,
+        'ttm_profit': current + last_q4 - last_year,
+        'scaled': -current.abs() / 100000000 + 1,
+    })
+    expected['nested'] = expected['growth'] * 2 + expected['last_year']
+    pd.testing.assert_frame_equal(result[list(expected.columns)], expected, check_names=False)
+
+
+def test_derived_cache_reuses_unchanged_indicators(new_store, workdir):
+    root, mock = new_store
+    store = ColumnStore(root)
+    definitions = {'growth': 'yoy(netProfit)', 'revenue': 'MBRevenue / 100'}
+    DerivedEngine(store, definitions).compute(2024, 3)
+
+    engine = DerivedEngine(store, definitions)
+    engine.compute(2024, 3)
+    assert engine.recomputed == []
+    # 修改一个定义只重新计算该指标
+    engine.define('revenue', 'MBRevenue / 1000')
+    engine.compute(2024, 3)
+    assert engine.recomputed == ['revenue']
+    # 往期分区变化后，依赖它的指标重新计算
+    store.write(2023, 3, 'profit', mock.report_frame('profit', 2023, 3))
+    engine.compute(2024, 3)
+    assert engine.recomputed == ['growth']
+    assert np.isfinite(engine.compute(2024, 3)['revenue']).any()
+
+
+def test_compute_without_reports_writes_nothing(workdir):
+    store = ColumnStore(str(workdir / 'store'))
+    with pytest.raises(FileNotFoundError):
+        DerivedEngine(store).compute(2026, 3)
+    assert not store.has_partition(2026, 3, 'derived')
+    assert not (workdir / 'store' / '2026Q3').exists()
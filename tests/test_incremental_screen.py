@@ -0,0 +1,47 @@
+"""增量筛选的行为测试：修改条件后只对新的条件求值，结果与逐列pandas筛选一致"""
+import pandas as pd
+
+from benchmark_screener import make_data, pandas_screen
+from screen_engine import ScreenData
+from stock_screener import StockScreener
+
+
+def test_incremental_rescreen_matches_baseline():
+    df = make_data(20000, 4)
+    data = ScreenData(df)
+    screener = StockScreener(cache=False)
+    edits = [
+        lambda: screener.add_filter('balance', 'liabilityToAsset', max_value=0.05),
+        lambda: screener.add_filter('profit', 'roeAvg', min_value=0.05, allow_null=False),
+        lambda: screener.add_filter('profit', 'roeAvg', min_value=0.1, allow_null=False),
+        lambda: screener.add_filter('profit', 'npMargin', min_value=0.1, allow_null=True),
+        lambda: screener.remove_filter('balance', 'liabilityToAsset'),
+    ]
+    for edit in edits:
+        evaluations = data.mask_evaluations
+        edit()
+        pd.testing.assert_frame_equal(screener.screen(data), pandas_screen(screener.filters, df))
+        # 每次修改最多只对一个新的条件求值
+        assert data.mask_evaluations - evaluations <= 1
+    # 删除条件不需要重新求值
+    assert data.mask_evaluations == 4
+
+
+def test_reverting_a_threshold_reuses_its_mask():
+    data = ScreenData(make_data(5000, 1))
+    screener = StockScreener(cache=False)
+    screener.add_filter('profit', 'roeAvg', min_value=0.05)
+    first = screener.screen(data)
+    screener.add_filter('profit', 'roeAvg', min_value=0.1)
+    screener.screen(data)
+    screener.add_filter('profit', 'roeAvg', min_value=0.05)
+    evaluations = data.mask_evaluations
+    pd.testing.assert_frame_equal(screener.screen(data), first)
+    assert data.mask_evaluations == evaluations
+
+
+def test_no_filters_returns_all_rows():
+    df = make_data(1000)
+    data = ScreenData(df)
+    screener = StockScreener(cache=False)
+    assert len(screener.screen(data)) == len(df)
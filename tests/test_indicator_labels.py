@@ -0,0 +1,47 @@
+"""指标标签的行为测试：标签与原始名称互相转换、合并后缀列、按任一名称查找列"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import load_financial_data
+from indicator_labels import INDICATOR_NAMES, apply_labels, label, raw_name, resolve_column, strip_labels
+
+
+@pytest.mark.parametrize('name', sorted(INDICATOR_NAMES))
+def test_label_round_trip(name):
+    assert label(name) == f"{name}({INDICATOR_NAMES[name]})"
+    assert raw_name(label(name)) == name
+    assert raw_name(name) == name
+
+
+def test_merge_suffix_uses_base_label():
+    assert label('pubDate_x') == f"pubDate_x({INDICATOR_NAMES['pubDate']})"
+    assert label('statDate_y') == f"statDate_y({INDICATOR_NAMES['statDate']})"
+    assert raw_name(label('pubDate_x')) == 'pubDate_x'
+    # 没有中文名称的列，以及中文名称不符的标签保持原样
+    assert label('custom_x') == 'custom_x'
+    assert raw_name('pubDate_x(其他)') == 'pubDate_x(其他)'
+
+
+def test_apply_labels_keeps_data():
+    df = pd.DataFrame({'code': ['sh.600000'], 'roeAvg': [0.1], 'pubDate_x': ['2024-10-30'], 'custom': [1]})
+    labeled = apply_labels(df)
+    assert list(labeled.columns) == [label('code'), label('roeAvg'), label('pubDate_x'), 'custom']
+    assert np.shares_memory(labeled[label('roeAvg')].to_numpy(), df['roeAvg'].to_numpy())
+    pd.testing.assert_frame_equal(strip_labels(labeled), df)
+
+
+def test_resolve_column_accepts_either_name():
+    columns = pd.Index([label('roeAvg'), 'npMargin', label('pubDate_x')])
+    assert resolve_column(columns, 'roeAvg') == label('roeAvg')
+    assert resolve_column(columns, label('npMargin')) == 'npMargin'
+    assert resolve_column(columns, 'pubDate_x') == label('pubDate_x')
+    with pytest.raises(KeyError):
+        resolve_column(columns, 'dupontNitogr')
+
+
+def test_loaded_data_labels_suffixed_columns(mock_store, workdir):
+    df = load_financial_data(2024, 3, store_root=mock_store)
+    suffixed = [col for col in df.columns if raw_name(col).endswith(('_x', '_y'))]
+    assert suffixed
+    assert all(col != raw_name(col) for col in suffixed)
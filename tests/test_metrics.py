@@ -0,0 +1,123 @@
+"""运行指标的测试：计数和直方图、多进程汇总、JSON摘要与Prometheus文本格式"""
+import json
+import os
+
+import pytest
+
+from metrics import Histogram, MetricsRegistry
+
+
+def record(registry, offset=0.0):
+    registry.inc('baostock_rows_total', 300, api='query_profit_data')
+    registry.inc('baostock_rows_total', 100, api='query_profit_data')
+    registry.inc('baostock_errors_total')
+    for seconds in (0.002, 0.004, 0.03, 0.3):
+        registry.observe('baostock_request_seconds', seconds + offset, api='query_profit_data')
+
+
+def test_counters_histograms_and_summary():
+    registry = MetricsRegistry()
+    record(registry)
+    assert registry.counter('baostock_rows_total', api='query_profit_data') == 400
+    assert registry.counter('baostock_rows_total', api='query_balance_data') == 0
+    summary = registry.summary()
+    assert summary['counters'] == {'baostock_errors_total': {'': 1},
+                                   'baostock_rows_total': {'api=query_profit_data': 400}}
+    stats = summary['histograms']['baostock_request_seconds']['api=query_profit_data']
+    assert stats['count'] == 4 and stats['min'] == 0.002 and stats['max'] == 0.3
+    assert stats['sum'] == pytest.approx(0.336) and stats['mean'] == pytest.approx(0.084)
+    # 分位数落在所在分桶内，并且不超出观测到的范围
+    assert 0.0025 <= stats['p50'] <= 0.005 and stats['p99'] <= 0.3
+    assert summary['rates']['baostock_rows_per_second']['api=query_profit_data'] == pytest.approx(400 / 0.336)
+    json.dumps(summary)
+
+
+def test_timer_records_on_exception():
+    registry = MetricsRegistry()
+    with pytest.raises(ValueError):
+        with registry.timer('screen_seconds'):
+            raise ValueError()
+    assert registry.histogram('screen_seconds').count == 1
+
+
+def test_histogram_quantile():
+    histogram = Histogram(bounds=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == pytest.approx(1.75)
+    assert histogram.quantile(1.0) == 10.0
+    assert histogram.quantile(0.0) == 0.5
+
+
+def test_drain_and_merge_match_single_registry():
+    single = MetricsRegistry()
+    record(single)
+    record(single, offset=1.0)
+
+    workers = [MetricsRegistry(), MetricsRegistry()]
+    record(workers[0])
+    record(workers[1], offset=1.0)
+    merged = MetricsRegistry()
+    for worker in workers:
+        # 工作进程的指标经过序列化传回主进程
+        merged.merge(json.loads(json.dumps(worker.drain())))
+        assert worker.snapshot() == {'counters': [], 'histograms': []}
+    expected, actual = single.snapshot(), merged.snapshot()
+    assert actual['counters'] == expected['counters']
+    # 分桶计数相同，总和只有浮点累加顺序的差异
+    (merged_histogram,), (single_histogram,) = actual['histograms'], expected['histograms']
+    assert merged_histogram[:5] == single_histogram[:5] and merged_histogram[6:] == single_histogram[6:]
+    assert merged_histogram[5] == pytest.approx(single_histogram[5])
+
+
+def parse_prometheus(text):
+    """{(名称, 标签文本): 值}，并检查每个指标只有一组HELP/TYPE"""
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert name not in types
+            types[name] = kind
+        elif line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            name, _, labels = series.partition('{')
+            samples[(name, labels.rstrip('}'))] = float(value)
+    return samples, types
+
+
+def test_prometheus_format():
+    registry = MetricsRegistry(buckets=(0.01, 0.1, 1.0))
+    record(registry)
+    registry.inc('loader_errors_total', stage='say "hi"\n')
+    samples, types = parse_prometheus(registry.to_prometheus())
+    assert types == {'baostock_errors_total': 'counter', 'baostock_rows_total': 'counter',
+                     'loader_errors_total': 'counter', 'baostock_request_seconds': 'histogram'}
+    assert samples[('baostock_rows_total', 'api="query_profit_data"')] == 400
+    assert samples[('loader_errors_total', 'stage="say \\"hi\\"\\n"')] == 1
+    # 分桶为累计值，+Inf等于总数
+    buckets = [samples[('baostock_request_seconds_bucket', f'api="query_profit_data",le="{le}"')]
+               for le in ('0.01', '0.1', '1.0', '+Inf')]
+    assert buckets == [2, 3, 4, 4]
+    assert samples[('baostock_request_seconds_count', 'api="query_profit_data"')] == 4
+    assert samples[('baostock_request_seconds_sum', 'api="query_profit_data"')] == pytest.approx(0.336)
+
+
+def test_export_and_disabled_registry(tmp_path):
+    registry = MetricsRegistry()
+    record(registry)
+    json_path, prom_path = str(tmp_path / 'out' / 'metrics.json'), str(tmp_path / 'metrics.prom')
+    registry.export(json_path, prom_path)
+    with open(json_path, encoding='utf-8') as f:
+        assert json.load(f)['counters']['baostock_rows_total'] == {'api=query_profit_data': 400}
+    with open(prom_path, encoding='utf-8') as f:
+        assert f.read() == registry.to_prometheus()
+    assert sorted(os.listdir(tmp_path)) == ['metrics.prom', 'out']
+    registry.export(None, str(tmp_path / 'only.prom'))
+    assert sorted(os.listdir(tmp_path)) == ['metrics.prom', 'only.prom', 'out']
+
+    disabled = MetricsRegistry(enabled=False)
+    record(disabled)
+    assert disabled.snapshot() == {'counters': [], 'histograms': []}
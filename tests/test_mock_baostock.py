@@ -0,0 +1,102 @@
+"""模拟接口和离线性能测试套件的测试：数据可复现、各查询方式的数据一致、分页与失败模拟、退化比较"""
+import json
+
+import numpy as np
+import pandas as pd
+
+import benchmark_suite
+from benchmark_suite import compare, quarter_range
+from bs_session import BaostockSession
+from mock_baostock import MockBaostock
+from stock_data_collector import StockDataCollector
+
+
+def test_same_seed_generates_same_data():
+    a, b = MockBaostock(stocks=200), MockBaostock(stocks=200)
+    pd.testing.assert_frame_equal(a.report_frame('profit', 2024, 3), b.report_frame('profit', 2024, 3))
+    other = MockBaostock(stocks=200, seed=1).report_frame('profit', 2024, 3)
+    assert not other.equals(a.report_frame('profit', 2024, 3))
+
+
+def test_per_stock_queries_match_report_frame():
+    mock = MockBaostock(stocks=50)
+    frame = mock.report_frame('balance', 2024, 3).set_index('code')
+    collector = StockDataCollector(cache=False, session=BaostockSession(api=mock))
+    for code in frame.index[:5]:
+        df = collector.fetch_financial_data(code, 2024, 3)['balance']
+        np.testing.assert_allclose(df[['currentRatio', 'liabilityToAsset']].iloc[0].astype(float),
+                                   frame.loc[code, ['currentRatio', 'liabilityToAsset']].astype(float), atol=1e-6)
+
+
+def test_daily_market_query_matches_single_stock_bars():
+    mock = MockBaostock(stocks=50)
+    market = mock.query_daily_history_k_AStock('2024-10-08').get_data().set_index('code')
+    single = mock.query_history_k_data_plus('sh.600000', 'date,code,close,peTTM',
+                                            start_date='2024-10-08', end_date='2024-10-08').get_data()
+    assert single['close'].iloc[0] == market.loc['sh.600000', 'close']
+    assert single['peTTM'].iloc[0] == market.loc['sh.600000', 'peTTM']
+    assert mock.query_daily_history_k_AStock('2024-10-12').get_data().empty
+
+
+def test_paging_and_error_simulation():
+    mock = MockBaostock(stocks=95, page_size=10)
+    rs = mock.query_stock_basic()
+    assert len(rs.get_data()) == 97
+    # 第一页随查询返回，之后每页一次请求
+    assert mock.stats['requests'] == 10
+
+    failing = MockBaostock(stocks=95, page_size=10, error_rate=1.0)
+    rs = failing.query_stock_basic()
+    assert rs.error_code == '10002007' and rs.get_data().empty
+    assert failing.stats['errors'] == 1
+
+
+def test_collection_recovers_from_simulated_errors(monkeypatch):
+    monkeypatch.setattr('bs_session.time.sleep', lambda seconds: None)
+    clean = StockDataCollector(cache=False, session=BaostockSession(api=MockBaostock(stocks=30)))
+    mock = MockBaostock(stocks=30, error_rate=0.5)
+    session = BaostockSession(api=mock, max_retries=10)
+    flaky = StockDataCollector(cache=False, session=session)
+    for code in ['sh.600000', 'sz.000001', 'sh.600001']:
+        expected = clean.fetch_financial_data(code, 2024, 3)
+        actual = flaky.fetch_financial_data(code, 2024, 3)
+        for report_type, df in expected.items():
+            pd.testing.assert_frame_equal(actual[report_type], df)
+    assert mock.stats['errors'] > 0 and session.retries == mock.stats['errors']
+
+
+def test_quarter_range():
+    assert quarter_range((2024, 3), 5) == [(2023, 3), (2023, 4), (2024, 1), (2024, 2), (2024, 3)]
+    assert quarter_range((2024, 1), 1) == [(2024, 1)]
+
+
+def report(**groups):
+    return {'results': [{'stocks': 5000, **groups}]}
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = report(load={'cold_ms': 100.0, 'rows': 5000}, collector={'stocks_per_s': 100.0},
+                      screen={'peak_mb': 10.0})
+    faster = report(load={'cold_ms': 50.0, 'rows': 1}, collector={'stocks_per_s': 200.0}, screen={'peak_mb': 10.0})
+    assert compare(faster, baseline) == []
+    slower = report(load={'cold_ms': 130.0}, collector={'stocks_per_s': 90.0}, screen={'peak_mb': 12.5})
+    assert sorted(compare(slower, baseline)) == [(5000, 'load', 'cold_ms', 100.0, 130.0),
+                                                 (5000, 'screen', 'peak_mb', 10.0, 12.5)]
+    assert compare(slower, baseline, threshold=1.1)[0][:3] == (5000, 'collector', 'stocks_per_s')
+
+
+def test_small_run_and_exit_code(tmp_path, monkeypatch):
+    monkeypatch.setattr('bs_session.time.sleep', lambda seconds: None)
+    output = tmp_path / 'results.json'
+    args = ['--sizes', '300', '--quarters', '5', '--collect-stocks', '5', '--output', str(output)]
+    assert benchmark_suite.main(args) == 0
+    with open(output, encoding='utf-8') as f:
+        result = json.load(f)['results'][0]
+    assert result['collector']['stocks'] == 5 and result['collector']['failed'] == 0
+    assert result['load']['panel_shape'][1] == 5 and result['screen']['first_ms'] > 0
+
+    # 有指标比基准退化超过阈值时返回1
+    baseline = json.loads(output.read_text(encoding='utf-8'))
+    baseline['results'][0]['load']['cold_ms'] /= 100
+    (tmp_path / 'baseline.json').write_text(json.dumps(baseline), encoding='utf-8')
+    assert benchmark_suite.main(args + ['--compare', str(tmp_path / 'baseline.json')]) == 1
@@ -0,0 +1,70 @@
+"""多季度面板筛选的行为测试：按实际季度计算窗口和趋势（面板中可能缺少季度）"""
+import numpy as np
+import pandas as pd
+
+from data_loader import load_financial_data
+from panel_screener import FinancialPanel, PanelScreener, load_financial_panel
+
+# 缺少2024Q1
+QUARTERS = [(2023, 3), (2023, 4), (2024, 2), (2024, 3)]
+
+
+def make_panel(rows):
+    values = np.array(rows, dtype='float64')[:, :, None]
+    return FinancialPanel([f"sh.{600000 + i}" for i in range(len(rows))], [f"股票{i}" for i in range(len(rows))],
+                          QUARTERS, ['roeAvg'], values)
+
+
+def test_trend_slope_uses_real_quarters():
+    # 每个季度增加0.01，2024Q1缺失
+    panel = make_panel([[0.10, 0.11, 0.13, 0.14], [0.14, 0.13, 0.11, 0.10], [np.nan, np.nan, 0.1, np.nan]])
+    slope = panel.trend_slope('roeAvg', 5)
+    np.testing.assert_allclose(slope[:2], [0.01, -0.01])
+    assert np.isnan(slope[2])
+    # 最近3个季度只有2024Q2、2024Q3两列
+    np.testing.assert_allclose(panel.trend_slope('roeAvg', 3)[:2], [0.01, -0.01])
+
+
+def test_persist_window_counts_missing_quarters():
+    panel = make_panel([[0.2, 0.2, 0.2, 0.2], [0.1, 0.2, 0.2, 0.2], [0.2, np.nan, 0.2, 0.2]])
+    screener = PanelScreener()
+    screener.add_filter('roeAvg', min_value=0.15, quarters=2)
+    assert screener.evaluate(panel).tolist() == [True, True, True]
+
+    # 最近3个季度包括缺少的2024Q1，不能每个季度都满足
+    screener = PanelScreener()
+    screener.add_filter('roeAvg', min_value=0.15, quarters=3)
+    assert screener.evaluate(panel).tolist() == [False, False, False]
+    screener = PanelScreener()
+    screener.add_filter('roeAvg', min_value=0.15, quarters=3, min_quarters=2)
+    assert screener.evaluate(panel).tolist() == [True, True, True]
+
+    # 全部季度为2023Q3到2024Q3共5个季度，缺少的季度按空值处理
+    screener = PanelScreener()
+    screener.add_filter('roeAvg', min_value=0.15, allow_null=True)
+    assert screener.evaluate(panel).tolist() == [True, False, True]
+    screener = PanelScreener()
+    screener.add_filter('roeAvg', min_value=0.15, min_quarters=4)
+    assert screener.evaluate(panel).tolist() == [True, False, False]
+
+
+def test_indexed_evaluation_matches_direct():
+    rng = np.random.default_rng(0)
+    rows = rng.normal(0.1, 0.1, (500, 4))
+    rows[rng.random((500, 4)) < 0.1] = np.nan
+    screener = PanelScreener()
+    screener.add_filter('roeAvg', min_value=0.05, min_quarters=2, quarters=3)
+    screener.add_trend('roeAvg', min_slope=0)
+    expected = screener.evaluate(make_panel(rows))
+    np.testing.assert_array_equal(screener.evaluate(make_panel(rows).build_indexes()), expected)
+
+
+def test_load_panel_matches_quarterly_data(mock_store, workdir):
+    panel = load_financial_panel(['roeAvg(平均净资产收益率)'], store_root=mock_store)
+    assert panel.quarters == QUARTERS
+    frame = panel.frame('roeAvg')
+    for year, quarter in QUARTERS:
+        df = load_financial_data(year, quarter, columns=['roeAvg'], store_root=mock_store, labels=False)
+        expected = pd.to_numeric(df['roeAvg'], errors='coerce').set_axis(df['code'].astype(str))
+        actual = frame[f"{year}Q{quarter}"].reindex(expected.index)
+        np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy(dtype='float64'))
@@ -0,0 +1,124 @@
+"""流水线的行为测试：指纹不变时跳过、输入或输出变化时重新运行、失败阻断下游、资源锁"""
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, Stage
+
+
+class Recorder:
+    """记录各阶段的运行次数，写出阶段的输出文件"""
+
+    def __init__(self, root):
+        self.root = root
+        self.runs = []
+        self.fail = set()
+
+    def path(self, name):
+        return str(self.root / f"{name}.txt")
+
+    def stage(self, name, deps=(), content='x', **kwargs):
+        def run():
+            self.runs.append(name)
+            if name in self.fail:
+                raise RuntimeError('失败')
+            with open(self.path(name), 'w') as f:
+                f.write(content)
+        return Stage(name, run, deps=deps, outputs=[self.path(name)], **kwargs)
+
+
+def build(recorder, state_file, params=None):
+    return Pipeline([recorder.stage('collect', params=params),
+                     recorder.stage('derive', deps=['collect']),
+                     recorder.stage('screen', deps=['derive']),
+                     recorder.stage('bars')], state_file=state_file)
+
+
+def test_skips_unchanged_stages(tmp_path):
+    recorder = Recorder(tmp_path)
+    state = str(tmp_path / 'state.json')
+    assert set(build(recorder, state).run().values()) == {'done'}
+    recorder.runs.clear()
+    # 重新创建流水线时从状态文件读取指纹
+    assert set(build(recorder, state).run().values()) == {'skipped'}
+    assert recorder.runs == []
+
+
+def test_reruns_changed_stage_and_dependents(tmp_path):
+    recorder = Recorder(tmp_path)
+    state = str(tmp_path / 'state.json')
+    build(recorder, state).run()
+
+    recorder.runs.clear()
+    with open(recorder.path('derive'), 'w') as f:
+        f.write('modified')
+    # 输出被修改的阶段重新运行，下游因为依赖的输出指纹变化也重新运行
+    results = build(recorder, state).run()
+    assert sorted(recorder.runs) == ['derive', 'screen']
+    assert results == {'collect': 'skipped', 'derive': 'done', 'screen': 'done', 'bars': 'skipped'}
+
+    recorder.runs.clear()
+    build(recorder, state, params={'year': 2024}).run()
+    assert sorted(recorder.runs) == ['collect', 'derive', 'screen']
+
+    recorder.runs.clear()
+    build(recorder, state, params={'year': 2024}).run(targets=['derive'], force=['derive'])
+    assert recorder.runs == ['derive']
+
+
+def test_failure_blocks_dependents(tmp_path):
+    recorder = Recorder(tmp_path)
+    state = str(tmp_path / 'state.json')
+    recorder.fail.add('collect')
+    results = build(recorder, state).run()
+    assert results == {'collect': 'failed', 'derive': 'blocked', 'screen': 'blocked', 'bars': 'done'}
+    assert sorted(recorder.runs) == ['bars', 'collect']
+
+    # 失败的阶段没有记录指纹，修复后重新运行
+    recorder.fail.clear()
+    recorder.runs.clear()
+    results = build(recorder, state).run()
+    assert sorted(recorder.runs) == ['collect', 'derive', 'screen']
+    assert results['bars'] == 'skipped'
+
+
+def test_skip_uses_existing_outputs(tmp_path):
+    recorder = Recorder(tmp_path)
+    results = build(recorder, str(tmp_path / 'state.json')).run(skip=['collect'])
+    assert results['collect'] == 'skipped' and results['derive'] == 'done'
+    assert 'collect' not in recorder.runs
+
+
+def test_stages_sharing_a_lock_do_not_overlap(tmp_path):
+    active = []
+    overlaps = []
+    guard = threading.Lock()
+
+    def run():
+        with guard:
+            active.append(1)
+            overlaps.append(len(active))
+        time.sleep(0.05)
+        with guard:
+            active.pop()
+
+    stages = [Stage(f"fetch{i}", run, lock='baostock') for i in range(3)] + [Stage('local', run)]
+    results = Pipeline(stages, state_file=str(tmp_path / 'state.json')).run(force=['all'])
+    assert set(results.values()) == {'done'}
+    # 只有不使用该资源的阶段可以并发，同时运行的阶段不超过2个
+    assert max(overlaps) <= 2
+
+
+def test_select_order_and_errors(tmp_path):
+    recorder = Recorder(tmp_path)
+    pipeline = build(recorder, str(tmp_path / 'state.json'))
+    assert pipeline.select(['screen']) == ['collect', 'derive', 'screen']
+    with pytest.raises(KeyError):
+        pipeline.select(['missing'])
+    with pytest.raises(KeyError):
+        Pipeline([recorder.stage('a', deps=['missing'])], state_file=str(tmp_path / 's.json'))
+    cycle = Pipeline([recorder.stage('a', deps=['b']), recorder.stage('b', deps=['a'])],
+                     state_file=str(tmp_path / 's.json'))
+    with pytest.raises(ValueError):
+        cycle.select()
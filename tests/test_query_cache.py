@@ -0,0 +1,80 @@
+"""查询缓存的行为测试：TTL过期、LRU淘汰、已结束报告期的结果永久有效"""
+import time
+
+import pandas as pd
+import pytest
+
+from bs_session import BaostockSession
+from mock_baostock import MockBaostock
+from query_cache import QueryCache, make_key
+from stock_data_collector import StockDataCollector
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'cache.sqlite')
+
+
+def test_mutable_entries_expire_after_ttl(cache_path):
+    cache = QueryCache(cache_path, ttl=0.05)
+    cache.put('current', 1)
+    cache.put('closed', 2, immutable=True)
+    assert cache.get('current') == 1
+    time.sleep(0.1)
+    assert cache.get('current') is None
+    assert cache.get('closed') == 2
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_evicts_least_recently_used(cache_path):
+    blob = b'x' * 1000
+    cache = QueryCache(cache_path, max_bytes=3500)
+    for key in 'abc':
+        cache.put(key, blob)
+        time.sleep(0.01)
+    # 访问a之后，b是最久未使用的条目
+    cache.get('a')
+    cache.put('d', blob)
+    assert cache.get('b') is None
+    assert all(cache.get(key) == blob for key in 'acd')
+    assert cache.evictions == 1
+    assert cache.stats()['bytes'] <= 3500
+
+
+def test_size_recounted_only_over_limit(cache_path):
+    statements = []
+    cache = QueryCache(cache_path, max_bytes=10000)
+    cache._conn.set_trace_callback(statements.append)
+    for i in range(5):
+        cache.put(str(i), b'x' * 1000)
+    assert not any('SUM(size)' in statement for statement in statements)
+    for i in range(5, 12):
+        cache.put(str(i), b'x' * 1000)
+    assert any('SUM(size)' in statement for statement in statements)
+    assert cache.stats()['bytes'] <= 10000
+
+    # 重新打开时从文件中的条目统计大小
+    reopened = QueryCache(cache_path, max_bytes=10000)
+    assert reopened._total == cache.stats()['bytes']
+
+
+def test_closed_quarter_results_are_immutable(cache_path):
+    api = MockBaostock(stocks=10)
+    collector = StockDataCollector(cache=QueryCache(cache_path, ttl=0), session=BaostockSession(api=api))
+    first = collector.fetch_financial_data('sh.600000', 2023, 3)
+    requests = api.stats['requests']
+    second = collector.fetch_financial_data('sh.600000', 2023, 3)
+    assert api.stats['requests'] == requests
+    for report_type, df in first.items():
+        pd.testing.assert_frame_equal(second[report_type], df)
+
+    # 尚未结束的报告期按TTL过期（ttl为0时每次都重新请求）
+    collector.fetch_financial_data('sh.600000', 2100, 1)
+    requests = api.stats['requests']
+    collector.fetch_financial_data('sh.600000', 2100, 1)
+    assert api.stats['requests'] > requests
+
+
+def test_make_key_ignores_parameter_order():
+    assert make_key('query_profit_data', code='sh.600000', year=2024) == \
+        make_key('query_profit_data', year='2024', code='sh.600000')
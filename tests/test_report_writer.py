@@ -0,0 +1,52 @@
+"""流式报表输出的行为测试：分批写入、列顺序、出错时保留原有文件"""
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnStore
+from mock_baostock import MockBaostock
+from report_writer import CsvReportWriter, report_columns
+
+
+def stock_frames(report_type, stocks=30):
+    df = MockBaostock(stocks=stocks).report_frame(report_type, 2024, 3)
+    return [group for _, group in df.groupby('code', sort=False)]
+
+
+def test_batches_match_single_concat(tmp_path):
+    frames = stock_frames('profit')
+    path = tmp_path / 'profit_all.csv'
+    with CsvReportWriter(str(path), 'profit', batch_rows=4) as writer:
+        for df in frames:
+            writer.append(df)
+            # 缓冲区不超过一批
+            assert writer._buffered_rows < 4
+    expected = pd.concat(frames, ignore_index=True).reindex(columns=report_columns('profit'))
+    result = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    assert list(result.columns) == report_columns('profit')
+    assert len(result) == writer.rows_written == len(expected)
+    assert result['code'].tolist() == expected['code'].tolist()
+
+
+def test_error_keeps_existing_file(tmp_path):
+    path = tmp_path / 'profit_all.csv'
+    path.write_text('old', encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        with CsvReportWriter(str(path), 'profit', batch_rows=1) as writer:
+            writer.append(stock_frames('profit')[0])
+            raise RuntimeError('interrupted')
+    assert path.read_text(encoding='utf-8') == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_column_store_writer_streams_batches(tmp_path):
+    frames = stock_frames('balance')
+    store = ColumnStore(str(tmp_path))
+    with store.open_writer(2024, 3, 'balance', report_columns('balance'), batch_rows=5) as writer:
+        for df in frames:
+            writer.append(df)
+    result = store.read(2024, 3, 'balance')
+    expected = pd.concat(frames, ignore_index=True)
+    assert list(result.columns) == report_columns('balance')
+    assert result['code'].astype(str).tolist() == expected['code'].tolist()
+    pd.testing.assert_series_equal(result['liabilityToAsset'], pd.to_numeric(expected['liabilityToAsset']),
+                                   check_index=False)
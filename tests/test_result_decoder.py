@@ -0,0 +1,50 @@
+"""结果集解码的行为测试：按页取出全部行、按字段类型转换，与逐行get_data的结果一致"""
+import numpy as np
+import pandas as pd
+
+from mock_baostock import MockBaostock
+from result_decoder import decode_frame, decode_result_set, decode_rows, fetch_rows, field_kind
+
+
+def test_field_kinds():
+    assert field_kind('pubDate') == 'date'
+    assert field_kind('code') == 'category'
+    assert field_kind('code_name') == 'text'
+    assert field_kind('roeAvg') == 'float'
+
+
+def test_fetch_rows_reads_every_page():
+    api = MockBaostock(stocks=50, page_size=7)
+    rows = fetch_rows(api.query_stock_basic())
+    expected = api.query_stock_basic().get_data()
+    assert len(rows) == len(expected) > 7
+    assert rows == expected.values.tolist()
+
+
+def test_decoded_types_match_string_conversion():
+    api = MockBaostock(stocks=50, page_size=7)
+    df = decode_result_set(api.query_stock_basic())
+    expected = api.query_stock_basic().get_data()
+    assert df['code'].dtype == 'category'
+    assert pd.api.types.is_datetime64_any_dtype(df['ipoDate'])
+    assert df['code'].astype(str).tolist() == expected['code'].tolist()
+    pd.testing.assert_series_equal(df['ipoDate'], pd.to_datetime(expected['ipoDate'], errors='coerce'),
+                                   check_dtype=False)
+    assert df.attrs['decode_seconds'] >= 0
+
+
+def test_empty_and_invalid_values():
+    df = decode_rows([['sh.600000', '', '2024-10-30'], ['sz.000001', 'abc', '']],
+                     ['code', 'roeAvg', 'pubDate'])
+    assert df['roeAvg'].dtype == 'float64'
+    assert np.isnan(df['roeAvg']).all()
+    assert df['pubDate'].isna().tolist() == [False, True]
+    empty = decode_rows([], ['code', 'roeAvg'])
+    assert list(empty.columns) == ['code', 'roeAvg'] and empty.empty
+    assert empty['roeAvg'].dtype == 'float64'
+
+
+def test_decode_frame_matches_decode_rows():
+    rows = [['sh.600000', '0.1', '2024-10-30'], ['sz.000001', '', '']]
+    fields = ['code', 'roeAvg', 'pubDate']
+    pd.testing.assert_frame_equal(decode_frame(pd.DataFrame(rows, columns=fields)), decode_rows(rows, fields))
@@ -0,0 +1,46 @@
+"""批量方案评估的行为测试：每个方案的结果与单独筛选一致，分批处理不影响结果"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_screener import make_data, make_screener, pandas_screen
+from scenario_sweep import scenario_grid, sweep
+
+GRID = {
+    ('balance', 'liabilityToAsset(资产负债率)', 'max_value'): [0.006, 0.02, 0.05],
+    ('profit', 'roeAvg(平均净资产收益率)', 'min_value'): [0.05, 0.1, 0.15, None],
+    ('profit', 'npMargin', 'min_value'): [0.0, 0.15],
+}
+
+
+@pytest.fixture(scope='module')
+def df():
+    return make_data(20000, 6)
+
+
+@pytest.mark.parametrize('block_cells', [1 << 25, 20000 * 3 + 1])
+def test_sweep_matches_individual_screens(df, block_cells):
+    scenarios, params = scenario_grid(make_screener().filters, GRID)
+    assert len(scenarios) == 24
+    result = sweep(df, scenarios, params, block_cells=block_cells)
+    matrix = result.matrix()
+    for i, filters in enumerate(scenarios):
+        expected = pandas_screen(filters, df)
+        pd.testing.assert_frame_equal(result.passed(i), expected)
+        assert result.counts[i] == len(expected) == matrix[i].sum()
+
+
+def test_summary_lists_grid_values(df):
+    scenarios, params = scenario_grid(make_screener().filters, GRID)
+    summary = sweep(df, scenarios, params).summary()
+    assert list(summary.columns) == ['liabilityToAsset(资产负债率).max_value',
+                                     'roeAvg(平均净资产收益率).min_value', 'npMargin.min_value', 'count']
+    assert summary.iloc[0, :3].tolist() == [0.006, 0.05, 0.0]
+
+
+def test_screener_scenarios_and_empty_filters(df):
+    screener = make_screener()
+    result = sweep(df, [screener, {}])
+    pd.testing.assert_frame_equal(result.passed(0), pandas_screen(screener.filters, df))
+    assert result.counts[1] == len(df)
+    assert np.array_equal(result.matrix([1])[0], np.ones(len(df), dtype=bool))
@@ -0,0 +1,87 @@
+"""评分排名的行为测试：标准化、前k名选取（可分组）与全排序的结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_screener import make_data, pandas_screen
+from scoring import normalize, top_k
+from stock_screener import StockScreener
+
+
+def test_normalize():
+    values = np.array([1.0, 2.0, np.nan, 3.0])
+    np.testing.assert_allclose(normalize(values), [-1.224745, 0.0, np.nan, 1.224745], rtol=1e-6)
+    np.testing.assert_allclose(normalize(values, 'percentile'), [1 / 3, 2 / 3, np.nan, 1.0])
+    np.testing.assert_array_equal(normalize(np.array([2.0, 2.0, np.nan])), [0.0, 0.0, np.nan])
+    with pytest.raises(ValueError):
+        normalize(values, 'minmax')
+
+
+@pytest.mark.parametrize('k', [None, 1, 5, 40, 1000])
+def test_top_k_matches_full_sort(k):
+    rng = np.random.default_rng(0)
+    # 取值较少，包含大量同分
+    scores = rng.integers(0, 20, 500).astype('float64')
+    expected = np.lexsort((np.arange(len(scores)), -scores))[:k]
+    np.testing.assert_array_equal(top_k(scores, k), expected)
+
+
+def test_top_k_puts_nan_last():
+    scores = np.array([np.nan, 1.0, np.nan, 2.0])
+    np.testing.assert_array_equal(top_k(scores, 3), [3, 1, 0])
+    np.testing.assert_array_equal(top_k(scores), [3, 1, 0, 2])
+
+
+def test_top_k_by_group():
+    rng = np.random.default_rng(1)
+    scores = rng.normal(size=300)
+    groups = rng.choice(['sh', 'sz', 'bj'], 300)
+    selected = top_k(scores, 3, groups)
+    expected = []
+    for group in ['bj', 'sh', 'sz']:
+        positions = np.flatnonzero(groups == group)
+        expected.extend(positions[np.argsort(-scores[positions], kind='stable')][:3])
+    np.testing.assert_array_equal(selected, expected)
+
+
+def build_ranker():
+    screener = StockScreener(cache=False)
+    screener.add_filter('balance', 'liabilityToAsset', max_value=0.05)
+    screener.add_score('roeAvg', weight=2.0)
+    screener.add_score('liabilityToAsset', normalize='percentile', higher_is_better=False)
+    return screener
+
+
+def expected_scores(screener, df):
+    passed = df.loc[pandas_screen(screener.filters, df).index]
+    roe = passed['roeAvg(平均净资产收益率)']
+    liability = passed['liabilityToAsset(资产负债率)']
+    score = (2.0 * ((roe - roe.mean()) / roe.std(ddof=0)).fillna(0)
+             + (1 - liability.rank(pct=True)).fillna(0))
+    return passed, score
+
+
+def test_rank_matches_pandas_scoring():
+    df = make_data(5000, 2)
+    screener = build_ranker()
+    passed, score = expected_scores(screener, df)
+    result = screener.rank(df, top=10)
+    order = score.sort_values(ascending=False, kind='stable').index[:10]
+    assert result['code(股票代码)'].tolist() == passed.loc[order, 'code(股票代码)'].tolist()
+    np.testing.assert_allclose(result['score'], score.loc[order])
+    assert result['rank'].tolist() == list(range(1, 11))
+
+
+def test_rank_by_exchange():
+    df = make_data(5000, 2)
+    df['code(股票代码)'] = [f"{'sh' if i % 3 else 'sz'}.{600000 + i}" for i in range(len(df))]
+    screener = build_ranker()
+    passed, score = expected_scores(screener, df)
+    result = screener.rank(df, top=3, group_by='exchange')
+    assert result['exchange'].tolist() == ['sh'] * 3 + ['sz'] * 3
+    assert result['rank'].tolist() == [1, 2, 3] * 2
+    for exchange, group in result.groupby('exchange'):
+        in_group = passed['code(股票代码)'].str[:2] == exchange
+        best = score[in_group].sort_values(ascending=False, kind='stable').index[:3]
+        assert group['code(股票代码)'].tolist() == passed.loc[best, 'code(股票代码)'].tolist()
+    pd.testing.assert_frame_equal(screener.rank(df, top=3, group_by='exchange'), result)
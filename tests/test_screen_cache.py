@@ -0,0 +1,95 @@
+"""筛选结果缓存的行为测试：按数据版本命中、数据变化后失效、条件指纹与顺序无关"""
+import pandas as pd
+
+from benchmark_screener import make_data, pandas_screen
+from columnar_store import ColumnStore
+from data_loader import load_financial_data
+from main import SCREEN_FILTERS
+from screen_cache import ScreenCache
+from screen_engine import ScreenData, stamp_version
+from stock_screener import StockScreener
+
+
+def build_screener(cache, filters=SCREEN_FILTERS, **kwargs):
+    screener = StockScreener(cache=cache, **kwargs)
+    for report_type, indicator, conditions in filters:
+        screener.add_filter(report_type, indicator, **conditions)
+    return screener
+
+
+def test_plain_frame_not_cached_by_default():
+    cache = ScreenCache()
+    df = make_data(5000, 1)
+    screener = build_screener(cache)
+    screener.screen(df)
+    screener.screen(df)
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'entries': 0}
+
+
+def test_versioned_frame_hits_cache():
+    cache = ScreenCache()
+    df = stamp_version(make_data(5000, 1), 'v1')
+    screener = build_screener(cache)
+    first = screener.screen(df)
+    pd.testing.assert_frame_equal(screener.screen(df), first)
+    assert (cache.hits, cache.misses) == (1, 1)
+    # 派生出的DataFrame继承了attrs，但不会被当作同一份数据
+    screener.screen(df.head(100))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_fingerprint_detects_in_place_mutation():
+    cache = ScreenCache()
+    df = make_data(5000, 1)
+    screener = build_screener(cache, fingerprint_data=True)
+    screener.screen(df)
+    screener.screen(df)
+    assert cache.hits == 1
+    df['liabilityToAsset(资产负债率)'] = 1.0
+    results = screener.screen(df)
+    assert results.empty
+    pd.testing.assert_frame_equal(results, pandas_screen(screener.filters, df))
+
+
+def test_filter_fingerprint_ignores_order_and_labels():
+    a = build_screener(False, [('profit', 'roeAvg', {'min_value': 0.1}),
+                               ('balance', 'liabilityToAsset', {'max_value': 0.5})])
+    b = build_screener(False, [('balance', 'liabilityToAsset(资产负债率)', {'max_value': 0.5}),
+                               ('profit', 'roeAvg(平均净资产收益率)', {'min_value': 0.1})])
+    assert a.fingerprint() == b.fingerprint()
+    b.add_filter('profit', 'roeAvg', min_value=0.2)
+    assert a.fingerprint() != b.fingerprint()
+
+
+def test_screen_data_cached_only_with_version():
+    cache = ScreenCache()
+    df = make_data(2000)
+    screener = build_screener(cache)
+    screener.screen(ScreenData(df))
+    assert cache.stats()['entries'] == 0
+    data = ScreenData(df, version='v1')
+    screener.screen(data)
+    screener.screen(data)
+    assert cache.hits == 1
+
+
+def test_loaded_data_cached_until_recollected(new_store, workdir):
+    root, mock = new_store
+    cache = ScreenCache()
+    screener = build_screener(cache)
+    data = load_financial_data(2024, 3, store_root=root)
+    version = data.attrs['data_version']
+    first = screener.screen(data)
+    screener.screen(load_financial_data(2024, 3, store_root=root))
+    assert cache.hits == 1
+
+    # 重新采集后快照版本改变，旧的结果不再命中
+    profit = mock.report_frame('profit', 2024, 3)
+    profit['roeAvg'] = pd.to_numeric(profit['roeAvg'], errors='coerce') * 2
+    ColumnStore(root).write(2024, 3, 'profit', profit)
+    data = load_financial_data(2024, 3, store_root=root)
+    assert data.attrs['data_version'] != version
+    results = screener.screen(data)
+    assert cache.hits == 1
+    assert len(results) >= len(first)
+    pd.testing.assert_frame_equal(results, pandas_screen(screener.filters, data))
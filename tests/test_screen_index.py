@@ -0,0 +1,52 @@
+"""指标排序索引的行为测试：二分查找得到的结果与直接求值一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_screener import make_data, make_screener, pandas_screen
+from screen_engine import Condition, IndicatorIndex, ScreenData
+
+CONDITIONS = [
+    Condition('x', min_value=0.0),
+    Condition('x', max_value=0.5),
+    Condition('x', min_value=-0.2, max_value=0.3),
+    Condition('x', min_value=0.3, max_value=-0.2),
+    Condition('x', min_value=0.1, allow_null=True),
+    Condition('x', min_value=5.0),
+    Condition('x', min_value=0.25, max_value=0.25),
+]
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(0)
+    values = np.round(rng.normal(0, 0.5, 5000), 2)
+    values[rng.random(5000) < 0.1] = np.nan
+    values[:10] = 0.25
+    return values
+
+
+@pytest.mark.parametrize('condition', CONDITIONS)
+def test_index_matches_direct_evaluation(values, condition):
+    index = IndicatorIndex(values)
+    expected = condition.evaluate(values)
+    np.testing.assert_array_equal(index.mask(condition), expected)
+    np.testing.assert_array_equal(index.rows(condition), np.flatnonzero(expected))
+    assert index.count(condition) == expected.sum()
+    rows = np.arange(0, len(values), 7)
+    np.testing.assert_array_equal(index.contains(condition, rows), expected[rows])
+
+
+def test_index_on_all_null_column():
+    index = IndicatorIndex(np.full(100, np.nan))
+    assert index.count(Condition('x', min_value=0.0)) == 0
+    assert index.count(Condition('x', min_value=0.0, allow_null=True)) == 100
+
+
+def test_indexed_plan_matches_baseline():
+    df = make_data(20000, 5)
+    screener = make_screener()
+    data = ScreenData(df)
+    plan = screener.compile()
+    data.build_indexes([condition.indicator for condition in plan.conditions])
+    pd.testing.assert_frame_equal(data.rows(plan.run(data)), pandas_screen(screener.filters, df))
@@ -0,0 +1,51 @@
+"""筛选执行计划的行为测试：结果与逐列pandas筛选一致（不需要网络，数据为随机生成或模拟接口生成）"""
+import pandas as pd
+import pytest
+
+from benchmark_screener import make_data, make_screener, pandas_screen
+from data_loader import load_financial_data
+from main import SCREEN_FILTERS
+from stock_screener import StockScreener
+
+
+def build_screener(filters):
+    screener = StockScreener(cache=False)
+    for report_type, indicator, conditions in filters:
+        screener.add_filter(report_type, indicator, **conditions)
+    return screener
+
+
+@pytest.mark.parametrize('rows, seed', [(0, 0), (1, 0), (5000, 0), (5000, 1), (50000, 2)])
+def test_engine_matches_baseline_on_synthetic_data(rows, seed):
+    df = make_data(rows, seed)
+    screener = make_screener()
+    screener.cache = None
+    pd.testing.assert_frame_equal(screener.screen(df), pandas_screen(screener.filters, df))
+
+
+def test_engine_matches_baseline_with_nulls_and_open_bounds():
+    df = make_data(5000, 3)
+    screener = StockScreener(cache=False)
+    screener.add_filter('profit', 'roeAvg(平均净资产收益率)', min_value=0.1, allow_null=True)
+    screener.add_filter('balance', 'liabilityToAsset', max_value=0.05)
+    screener.add_filter('profit', 'npMargin', min_value=0.0, max_value=0.2, allow_null=False)
+    screener.add_filter('indicators', 'dupontNitogr', allow_null=False)
+    pd.testing.assert_frame_equal(screener.screen(df), pandas_screen(screener.filters, df))
+
+
+def test_no_match_stops_early_and_returns_empty_frame():
+    df = make_data(5000)
+    screener = StockScreener(cache=False)
+    screener.add_filter('balance', 'liabilityToAsset', min_value=2.0)
+    screener.add_filter('profit', 'roeAvg', min_value=0.1)
+    results = screener.screen(df)
+    assert results.empty
+    pd.testing.assert_frame_equal(results, pandas_screen(screener.filters, df))
+
+
+def test_engine_matches_baseline_on_mock_data(mock_store, workdir):
+    data = load_financial_data(2024, 3, store_root=mock_store)
+    screener = build_screener(SCREEN_FILTERS)
+    results = screener.screen(data)
+    assert len(results) > 0
+    pd.testing.assert_frame_equal(results, pandas_screen(screener.filters, data))
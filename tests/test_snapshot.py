@@ -0,0 +1,49 @@
+"""合并快照的行为测试：每只股票一行、源数据变化时重建、重复股票的检查"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnStore
+from data_loader import SNAPSHOT_REPORT, load_snapshot
+from derived_indicators import DerivedEngine
+from metrics import get_registry
+
+
+def builds():
+    return get_registry().counter('loader_snapshot_builds_total')
+
+
+def test_code_ids_are_row_numbers(new_store, workdir):
+    root, _ = new_store
+    store = ColumnStore(root)
+    df = load_snapshot(store, DerivedEngine(store), 2024, 3)
+    assert df['code'].is_unique
+    arrays, dictionaries = store.read_arrays(2024, 3, SNAPSHOT_REPORT, columns=['code'])
+    np.testing.assert_array_equal(arrays['code'], np.arange(len(df)))
+    assert dictionaries['code'] == df['code'].astype(str).tolist()
+
+
+def test_snapshot_reused_until_sources_change(new_store, workdir):
+    root, mock = new_store
+    store = ColumnStore(root)
+    first = load_snapshot(store, DerivedEngine(store), 2024, 3)
+    count = builds()
+    pd.testing.assert_frame_equal(load_snapshot(store, DerivedEngine(store), 2024, 3), first)
+    assert builds() == count
+
+    profit = mock.report_frame('profit', 2024, 3)
+    profit['netProfit'] = pd.to_numeric(profit['netProfit'], errors='coerce') * 2
+    store.write(2024, 3, 'profit', profit)
+    second = load_snapshot(store, DerivedEngine(store), 2024, 3)
+    assert builds() == count + 1
+    np.testing.assert_allclose(second['netProfit'], first['netProfit'] * 2)
+
+
+def test_duplicate_codes_rejected(new_store, workdir):
+    root, mock = new_store
+    store = ColumnStore(root)
+    balance = mock.report_frame('balance', 2024, 3)
+    store.write(2024, 3, 'balance', pd.concat([balance, balance.iloc[:2]], ignore_index=True))
+    with pytest.raises(ValueError, match=str(balance['code'].iloc[0])):
+        load_snapshot(store, DerivedEngine(store), 2024, 3)
+    assert not store.has_partition(2024, 3, SNAPSHOT_REPORT)
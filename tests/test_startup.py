@@ -0,0 +1,30 @@
+"""启动开销的测试：入口模块不提前导入较重的依赖，离线运行不导入baostock，已是最新时不导入pandas
+
+只检查导入了哪些模块，不检查耗时（耗时预算由 benchmark_startup.py 在固定的机器上检查）。
+"""
+import os
+
+import pytest
+
+from benchmark_startup import CHECKS, probe, probe_command
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+@pytest.mark.parametrize('name, code, forbidden', [check[:3] for check in CHECKS], ids=[c[0] for c in CHECKS])
+def test_entry_points_do_not_import_heavy_modules(name, code, forbidden):
+    _, _, heavy = probe(code, repeat=1)
+    assert not set(heavy) & set(forbidden)
+
+
+def test_offline_screen(workdir, new_store):
+    root, _ = new_store
+    os.rename(root, workdir / 'financial_store')
+    args = [MAIN, '--offline', 'screen', '--year', '2024', '--quarter', '3', '--metrics-json', '', '--metrics-prom', '']
+    # 首次运行计算衍生指标并筛选，不访问baostock
+    _, heavy = probe_command(args, repeat=1, cwd=str(workdir))
+    assert 'baostock' not in heavy and 'pandas' in heavy
+    assert os.path.exists(workdir / 'screener_results.csv')
+    # 各阶段已是最新时只检查指纹
+    _, heavy = probe_command(args, repeat=1, cwd=str(workdir))
+    assert heavy == []
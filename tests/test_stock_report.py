@@ -0,0 +1,62 @@
+"""批量报告的行为测试：模板复用与单独绘制一致，多进程与单进程生成的图片相同"""
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from stock_report import ReportTemplate, generate_reports, load_report_panel, read_result_codes
+
+CODES = ['sh.600000', 'sz.000001', 'sh.600001', 'sz.000002', 'sh.600002', 'sz.000003', 'sh.600003']
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture(scope='module')
+def panel(mock_store):
+    return load_report_panel(store_root=mock_store)
+
+
+def test_template_reuse_matches_fresh_template(panel, tmp_path):
+    template = ReportTemplate(panel)
+    for code in ['sh.600000', 'sz.000001', 'sh.600000']:
+        assert template.render(code, str(tmp_path / f"{code}.png"))
+    # 先绘制其他股票不影响结果（纵轴范围、标题等都被重新设置）
+    ReportTemplate(panel).render('sh.600000', str(tmp_path / 'fresh.png'))
+    assert read_bytes(tmp_path / 'sh.600000.png') == read_bytes(tmp_path / 'fresh.png')
+    assert not template.render('sh.699999', str(tmp_path / 'missing.png'))
+    assert not os.path.exists(tmp_path / 'missing.png')
+
+
+def test_parallel_matches_sequential(mock_store, panel, tmp_path):
+    codes = CODES + ['sh.699999']
+    expected = [code for code in codes if code in set(panel.codes)]
+    assert len(expected) >= 5
+    sequential = generate_reports(codes, output_dir=str(tmp_path / 'seq'), workers=1, store_root=mock_store)
+    parallel = generate_reports(codes, output_dir=str(tmp_path / 'par'), workers=2, chunk_size=3,
+                                store_root=mock_store, panel_dir=str(tmp_path / 'panel'))
+    # 没有财务数据的股票不生成报告
+    assert list(sequential) == list(parallel) == expected
+    for code in expected:
+        assert read_bytes(sequential[code])[:8] == b'\x89PNG\r\n\x1a\n'
+        assert read_bytes(sequential[code]) == read_bytes(parallel[code])
+
+
+def test_codes_from_results_file(mock_store, tmp_path):
+    results = tmp_path / 'screener_results.csv'
+    pd.DataFrame({'code(股票代码)': ['sh.600000', 'sz.000001'], 'roeAvg': [0.1, 0.2]}).to_csv(results, index=False)
+    assert read_result_codes(str(results)) == ['sh.600000', 'sz.000001']
+    reports = generate_reports(results_file=str(results), output_dir=str(tmp_path / 'out'), store_root=mock_store)
+    assert sorted(reports) == ['sh.600000', 'sz.000001']
+    assert generate_reports(results_file=str(tmp_path / 'none.csv'), store_root=mock_store) == {}
+
+
+def test_import_does_not_load_matplotlib():
+    code = "import sys, stock_report; print('matplotlib' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False'
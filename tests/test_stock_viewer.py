@@ -0,0 +1,71 @@
+"""数据展示的数据访问层测试：单只股票历史、全市场分位数带、数据版本标记与降采样
+
+在没有streamlit运行时的情况下直接调用缓存函数（缓存退化为进程内存储）。
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnar_store import ColumnStore
+from data_loader import load_financial_data
+from mock_baostock import MockBaostock
+from stock_viewer import data_token, downsample_minmax, load_stock_history, stock_choices, universe_trend
+
+QUARTERS = [(2023, 3), (2023, 4), (2024, 2), (2024, 3)]
+
+
+def test_stock_history_matches_quarter_tables(mock_store):
+    token = data_token(mock_store)
+    history = load_stock_history('sh.600000', token, mock_store)
+    assert history.index.tolist() == [f"{y}Q{q}" for y, q in QUARTERS]
+    for year, quarter in QUARTERS:
+        df = load_financial_data(year, quarter, store_root=mock_store, labels=False)
+        row = df[df['code'] == 'sh.600000'].iloc[0]
+        np.testing.assert_allclose(history.loc[f"{year}Q{quarter}", ['roeAvg', 'npMargin']].astype(float),
+                                   row[['roeAvg', 'npMargin']].astype(float))
+    assert load_stock_history('sh.699999', token, mock_store).empty
+
+
+def test_universe_trend_matches_quarter_quantiles(mock_store):
+    trend = universe_trend('roeAvg', data_token(mock_store), mock_store)
+    assert list(trend.columns) == ['p10', 'p25', 'p50', 'p75', 'p90', 'count']
+    for year, quarter in QUARTERS:
+        values = load_financial_data(year, quarter, store_root=mock_store, labels=False)['roeAvg'].astype(float)
+        row = trend.loc[f"{year}Q{quarter}"]
+        assert row['count'] == values.notna().sum()
+        np.testing.assert_allclose(row[['p10', 'p50', 'p90']].astype(float),
+                                   np.nanpercentile(values, [10, 50, 90]))
+
+
+def test_data_token_changes_after_import(new_store):
+    root, _ = new_store
+    token = data_token(root)
+    assert [(y, q) for y, q, _ in token] == QUARTERS
+    assert data_token(root) == token
+    ColumnStore(root).write(2024, 4, 'profit', MockBaostock(stocks=300).report_frame('profit', 2024, 4))
+    assert data_token(root) != token
+    choices = stock_choices(2024, 3, token, root)
+    codes = load_financial_data(2024, 3, store_root=root, labels=False)['code'].astype(str)
+    assert list(choices) == codes.tolist() and choices['sh.600000'].startswith('sh.600000 ')
+
+
+def test_downsample_keeps_extremes():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=10000)
+    values[[17, 5000]] = [50.0, -50.0]
+    values[100:200] = np.nan
+    kept = downsample_minmax(values, max_points=200)
+    assert len(kept) <= 204
+    assert np.all(np.diff(kept) > 0) and not np.isnan(values[kept]).any()
+    assert {0, 17, 5000, 9999} <= set(kept.tolist())
+    # 每个区间的最小值和最大值都被保留
+    positions = np.flatnonzero(~np.isnan(values))
+    for bucket in np.array_split(positions, 100)[1:-1]:
+        assert bucket[np.argmax(values[bucket])] in kept
+        assert bucket[np.argmin(values[bucket])] in kept
+
+
+@pytest.mark.parametrize('values', [[1.0, np.nan, 3.0], []])
+def test_downsample_short_series_keeps_all_points(values):
+    np.testing.assert_array_equal(downsample_minmax(values), np.flatnonzero(~np.isnan(np.asarray(values))))
+    assert isinstance(downsample_minmax(pd.Series(values, dtype=float)), np.ndarray)
@@ -0,0 +1,102 @@
+"""日线存储的行为测试：增量追加、整理（compact）、按日期区间读取和多只股票对齐"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import timeseries_store
+from bs_session import BaostockSession
+from mock_baostock import MockBaostock
+from stock_data_collector import StockDataCollector
+from timeseries_store import DailyBarStore
+
+
+def bars(start, days, base=10.0):
+    dates = pd.bdate_range(start, periods=days)
+    return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'),
+                         'close': base + np.arange(days, dtype='float64'),
+                         'volume': np.arange(days, dtype='float64') * 100})
+
+
+def test_append_skips_stored_dates(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    assert store.append('sh.600000', bars('2024-01-01', 10)) == 10
+    # 重复追加同一段数据不产生重复，只追加更晚的行
+    assert store.append('sh.600000', bars('2024-01-01', 15)) == 5
+    data = store.read('sh.600000')
+    assert len(data['date']) == 15
+    np.testing.assert_array_equal(data['close'], 10.0 + np.arange(15))
+    assert store.last_date('sh.600000') == pd.Timestamp(bars('2024-01-01', 15)['date'].iloc[-1])
+    # 重新打开后数据相同
+    np.testing.assert_array_equal(DailyBarStore(str(tmp_path)).read('sh.600000')['close'], data['close'])
+
+
+def test_interleaved_appends_and_compact(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    for i in range(3):
+        start = pd.Timestamp('2024-01-01') + pd.offsets.BDay(5 * i)
+        for code, base in (('sh.600000', 10.0), ('sz.000001', 50.0)):
+            store.append(code, bars(start, 5, base + 5 * i))
+    assert len(store.segments['sh.600000']) == 3
+    before = {code: store.read_frame(code) for code in store.codes()}
+    store.compact()
+    assert all(len(segs) == 1 for segs in store.segments.values())
+    for code, df in before.items():
+        pd.testing.assert_frame_equal(store.read_frame(code), df)
+
+
+def test_auto_compact(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries_store, 'COMPACT_SEGMENTS_PER_CODE', 2)
+    store = DailyBarStore(str(tmp_path))
+    for i in range(4):
+        start = pd.Timestamp('2024-01-01') + pd.offsets.BDay(3 * i)
+        store.append('sh.600000', bars(start, 3))
+        store.append('sz.000001', bars(start, 3))
+    assert all(len(segs) <= 2 for segs in store.segments.values())
+    assert len(store.read('sh.600000')['date']) == 12
+
+
+def test_date_range_reads(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    store.append('sh.600000', bars('2024-01-01', 20))
+    store.append('sz.000001', bars('2024-01-08', 10, 50.0))
+    store.append('sh.600000', bars('2024-01-29', 5, 30.0))
+    data = store.read('sh.600000', '2024-01-10', '2024-01-31')
+    expected = store.read_frame('sh.600000')
+    expected = expected[(expected['date'] >= '2024-01-10') & (expected['date'] <= '2024-01-31')]
+    np.testing.assert_array_equal(data['close'], expected['close'])
+
+    field = store.read_field('close', start_date='2024-01-10', end_date='2024-01-31')
+    for code in store.codes():
+        df = store.read_frame(code, '2024-01-10', '2024-01-31')
+        pd.testing.assert_series_equal(field[code].dropna(), df.set_index(pd.DatetimeIndex(df['date']))['close'],
+                                       check_names=False, check_freq=False)
+    assert store.read_field('close', start_date='2030-01-01').empty
+
+
+def test_interrupted_write_is_discarded(tmp_path):
+    store = DailyBarStore(str(tmp_path))
+    store.append('sh.600000', bars('2024-01-01', 5))
+    # 模拟写入数据文件后、写入索引前中断
+    with open(os.path.join(str(tmp_path), 'close.bin'), 'ab') as f:
+        f.write(np.ones(3).tobytes())
+    reopened = DailyBarStore(str(tmp_path))
+    assert reopened.rows == 5
+    assert os.path.getsize(os.path.join(str(tmp_path), 'close.bin')) == 5 * 8
+
+
+def test_fetch_daily_price_requests_only_new_days(tmp_path):
+    api = MockBaostock(stocks=10)
+    collector = StockDataCollector(cache=False, session=BaostockSession(api=api))
+    store = DailyBarStore(str(tmp_path))
+    first = collector.fetch_daily_price('sh.600000', '2024-01-01', '2024-06-28', store=store).copy()
+    assert len(first) > 100
+    rows = api.stats['rows']
+    # 已存储的区间直接从本地读取，不再请求
+    pd.testing.assert_frame_equal(
+        collector.fetch_daily_price('sh.600000', '2024-01-01', '2024-06-28', store=store), first)
+    assert api.stats['rows'] == rows
+    # 延长截止日期时只请求新增的交易日
+    later = collector.fetch_daily_price('sh.600000', '2024-01-01', '2024-07-31', store=store)
+    assert api.stats['rows'] - rows == len(later) - len(first)
+    pd.testing.assert_frame_equal(later.iloc[:len(first)], first)
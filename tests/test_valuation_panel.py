@@ -0,0 +1,49 @@
+"""估值面板的行为测试：按交易日批量获取的结果与逐只股票请求一致，停牌取最近的有效值"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bs_session import BaostockSession
+from mock_baostock import MockBaostock
+from stock_data_collector import StockDataCollector
+from valuation_panel import ValuationPanel, fetch_valuation_panel
+
+
+@pytest.fixture
+def collector():
+    return StockDataCollector(cache=False, session=BaostockSession(api=MockBaostock(stocks=40)))
+
+
+def test_batched_panel_matches_per_stock_queries(collector):
+    panel = fetch_valuation_panel(collector, '2024-10-08', '2024-10-18')
+    assert len(panel.dates) == len(collector.fetch_trade_dates('2024-10-08', '2024-10-18'))
+    for code in panel.codes[:5]:
+        df = collector._query('query_history_k_data_plus', code=code, fields='date,code,peTTM,close',
+                              start_date='2024-10-08', end_date='2024-10-18', frequency='d', adjustflag='3')
+        expected = df.set_index(df['date'].to_numpy(dtype='datetime64[D]'))['close']
+        actual = panel.field('close', codes=[code])[code]
+        np.testing.assert_allclose(actual.reindex(expected.index).to_numpy(), expected.to_numpy())
+
+
+def test_snapshot_uses_last_valid_value():
+    df = pd.DataFrame({'date': pd.to_datetime(['2024-10-08', '2024-10-08', '2024-10-09', '2024-10-10']),
+                       'code': ['sh.600000', 'sz.000001', 'sh.600000', 'sh.600000'],
+                       'peTTM': [10.0, 20.0, 11.0, np.nan]})
+    panel = ValuationPanel.from_frame(df, fields=['peTTM'], codes=['sh.600000', 'sz.000001', 'sz.000002'])
+    snapshot = panel.snapshot()
+    # 停牌的股票取停牌前最后一个交易日的数值，没有数据的股票为空
+    np.testing.assert_array_equal(snapshot['peTTM'], [11.0, 20.0, np.nan])
+    np.testing.assert_array_equal(panel.snapshot('2024-10-08')['peTTM'], [10.0, 20.0, np.nan])
+
+    financial = pd.DataFrame({'code(股票代码)': ['sz.000001', 'sh.600000'], 'roeAvg': [0.1, 0.2]})
+    joined = panel.join(financial)
+    assert joined['peTTM'].tolist() == [20.0, 11.0]
+
+
+def test_save_and_load_round_trip(collector, tmp_path):
+    panel = fetch_valuation_panel(collector, '2024-10-08', '2024-10-18', fields=['peTTM', 'close'])
+    panel.save(str(tmp_path))
+    loaded = ValuationPanel.load(str(tmp_path))
+    assert sorted(loaded.fields) == ['close', 'peTTM']
+    pd.testing.assert_frame_equal(loaded.field('peTTM'), panel.field('peTTM'))
+    pd.testing.assert_frame_equal(loaded.snapshot(), panel.snapshot(fields=loaded.fields))
@@ -0,0 +1,285 @@
+"""
+日线时间序列存储模块
+每个字段一个只追加的二进制文件，配合日期列和每只股票的偏移表，
+读取时内存映射，单只股票或日期区间返回零拷贝的numpy切片
+"""
+
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# 默认存储目录
+DEFAULT_BARS_ROOT = 'daily_bars'
+
+# 日线字段（均为float64）
+DAILY_BAR_FIELDS = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'turn', 'pctChg']
+
+INDEX_FILE = '_index.json'
+DATE_FILE = 'date.bin'
+DATE_DTYPE = '<M8[D]'
+VALUE_DTYPE = '<f8'
+
+# 平均每只股票的段数超过该值时，追加结束后自动compact()
+# （每次增量更新通常给每只股票增加一段，约每16次更新整理一次）
+COMPACT_SEGMENTS_PER_CODE = 16
+
+
+class DailyBarStore:
+    def __init__(self, root=DEFAULT_BARS_ROOT, fields=None):
+        """初始化日线存储
+
+        目录结构：
+        - date.bin: 每行的交易日（datetime64[D]）
+        - {field}.bin: 每个字段一个文件（float64），与date.bin逐行对应
+        - _index.json: 总行数和偏移表 {code: [[起始行, 行数], ...]}
+
+        同一只股票每次增量追加的数据是一个连续段，相邻的段会自动合并；
+        追加后平均每只股票的段数超过COMPACT_SEGMENTS_PER_CODE时自动compact()，
+        将每只股票整理为单个连续段（也可以手动调用）。
+
+        Args:
+            root: str, 存储目录
+            fields: list, 字段列表，默认为DAILY_BAR_FIELDS（已有存储以索引中记录的为准）
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        index_path = os.path.join(root, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        else:
+            index = {'rows': 0, 'fields': list(fields or DAILY_BAR_FIELDS), 'segments': {}}
+        self.rows = index['rows']
+        self.fields = index['fields']
+        self.segments = {code: [tuple(seg) for seg in segs] for code, segs in index['segments'].items()}
+        self._maps = {}
+        self._deferred = 0
+        self._segment_count = sum(len(segs) for segs in self.segments.values())
+        # 丢弃上次写入中断时残留在文件末尾、未记入索引的行
+        for name, dtype in self._files():
+            path = os.path.join(root, name)
+            size = self.rows * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def _files(self):
+        return [(DATE_FILE, DATE_DTYPE)] + [(f"{field}.bin", VALUE_DTYPE) for field in self.fields]
+
+    def _save_index(self):
+        index = {'rows': self.rows, 'fields': self.fields,
+                 'segments': {code: [list(seg) for seg in segs] for code, segs in self.segments.items()}}
+        path = os.path.join(self.root, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+
+    @contextmanager
+    def batch(self):
+        """批量追加：期间不逐次写索引，结束时写一次
+
+        中途中断时，未写入索引的行在下次打开时被丢弃，已有数据不受影响。
+        """
+        self._deferred += 1
+        try:
+            yield self
+        finally:
+            self._deferred -= 1
+            if not self._deferred:
+                self._save_index()
+                self._maybe_compact()
+
+    def _map(self, name, dtype):
+        """以内存映射方式打开一个文件（按当前行数缓存）"""
+        cached = self._maps.get(name)
+        if cached is None or len(cached) != self.rows:
+            if self.rows == 0:
+                cached = np.empty(0, dtype=dtype)
+            else:
+                cached = np.memmap(os.path.join(self.root, name), dtype=dtype, mode='r', shape=(self.rows,))
+            self._maps[name] = cached
+        return cached
+
+    def dates(self):
+        """全部行的交易日数组（内存映射）"""
+        return self._map(DATE_FILE, DATE_DTYPE)
+
+    def field_array(self, field):
+        """某字段全部行的数组（内存映射），配合segments做批量计算"""
+        return self._map(f"{field}.bin", VALUE_DTYPE)
+
+    def codes(self):
+        return list(self.segments)
+
+    def last_date(self, code):
+        """某只股票已存储的最后一个交易日，没有数据时返回None"""
+        segs = self.segments.get(code)
+        if not segs:
+            return None
+        start, length = segs[-1]
+        return pd.Timestamp(self.dates()[start + length - 1])
+
+    def append(self, code, df):
+        """追加一只股票的日线数据
+
+        只追加晚于已存储最后一个交易日的行，因此重复追加同一段数据不会产生重复。
+
+        Args:
+            code: str, 股票代码
+            df: DataFrame, 包含date列和各字段
+
+        Returns:
+            int: 实际追加的行数
+        """
+        if df.empty:
+            return 0
+        dates = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]')
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        last = self.last_date(code)
+        keep = np.ones(len(dates), dtype=bool) if last is None else dates > np.datetime64(last.date(), 'D')
+        if not keep.any():
+            return 0
+        rows = order[keep]
+        dates = dates[keep]
+
+        # 先追加数据文件，最后更新索引；中途中断时多出的行会在下次打开时被截掉
+        with open(os.path.join(self.root, DATE_FILE), 'ab') as f:
+            f.write(dates.astype(DATE_DTYPE).tobytes())
+        for field in self.fields:
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype='float64')[rows]
+            else:
+                values = np.full(len(rows), np.nan)
+            with open(os.path.join(self.root, f"{field}.bin"), 'ab') as f:
+                f.write(values.astype(VALUE_DTYPE).tobytes())
+
+        segs = self.segments.setdefault(code, [])
+        if segs and segs[-1][0] + segs[-1][1] == self.rows:
+            # 与该股票上一段相邻，直接延长
+            segs[-1] = (segs[-1][0], segs[-1][1] + len(rows))
+        else:
+            segs.append((self.rows, len(rows)))
+            self._segment_count += 1
+        self.rows += len(rows)
+        if not self._deferred:
+            self._save_index()
+            self._maybe_compact()
+        return len(rows)
+
+    def _maybe_compact(self):
+        if self._segment_count > COMPACT_SEGMENTS_PER_CODE * max(len(self.segments), 1):
+            self.compact()
+
+    def _row_range(self, start, length, start_date, end_date):
+        """在一个连续段内按日期二分查找，返回行号区间"""
+        if start_date is None and end_date is None:
+            return start, start + length
+        seg_dates = self.dates()[start:start + length]
+        lo = 0 if start_date is None else int(np.searchsorted(
+            seg_dates, np.datetime64(pd.Timestamp(start_date).date(), 'D'), side='left'))
+        hi = length if end_date is None else int(np.searchsorted(
+            seg_dates, np.datetime64(pd.Timestamp(end_date).date(), 'D'), side='right'))
+        return start + lo, start + hi
+
+    def read(self, code, start_date=None, end_date=None, fields=None):
+        """读取一只股票的日线
+
+        股票数据为单个连续段时（compact后总是如此），返回的是内存映射文件的切片，不复制数据；
+        有多个段时拼接各段。
+
+        Args:
+            code: str, 股票代码
+            start_date: str, 起始日期（含），None表示不限
+            end_date: str, 截止日期（含），None表示不限
+            fields: list, 需要的字段，默认为全部字段
+
+        Returns:
+            dict: {'date': datetime64[D]数组, 字段名: float64数组, ...}
+        """
+        if fields is None:
+            fields = self.fields
+        ranges = [self._row_range(start, length, start_date, end_date)
+                  for start, length in self.segments.get(code, [])]
+        ranges = [(lo, hi) for lo, hi in ranges if hi > lo]
+        columns = {'date': self.dates()}
+        columns.update({field: self.field_array(field) for field in fields})
+        if len(ranges) == 1:
+            lo, hi = ranges[0]
+            return {name: array[lo:hi] for name, array in columns.items()}
+        return {name: np.concatenate([array[lo:hi] for lo, hi in ranges])
+                if ranges else np.empty(0, dtype=array.dtype)
+                for name, array in columns.items()}
+
+    def read_frame(self, code, start_date=None, end_date=None, fields=None):
+        """读取一只股票的日线为DataFrame（不复制数据）"""
+        return pd.DataFrame(self.read(code, start_date, end_date, fields), copy=False)
+
+    def read_field(self, field, codes=None, start_date=None, end_date=None):
+        """读取多只股票某个字段，按日期对齐为 (日期 × 股票) 的DataFrame
+
+        由各段的偏移一次得到全部行号，取出日期和字段值后直接填入预先分配的数组，
+        不为每只股票构建Series再对齐。
+        """
+        if codes is None:
+            codes = self.codes()
+        codes = list(codes)
+        # 每段的 (股票序号, 起始行, 行数)
+        segments = [(i, start, length) for i, code in enumerate(codes)
+                    for start, length in self.segments.get(code, [])]
+        columns, starts, lengths = (np.array(values, dtype=np.int64).reshape(-1)
+                                    for values in (zip(*segments) if segments else ([], [], [])))
+        # 各段的行号首尾相接：第k行属于第j段时为 starts[j] + (k - 该段之前的总行数)
+        offsets = np.cumsum(lengths) - lengths
+        rows = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        columns = np.repeat(columns, lengths)
+        days = self.dates()[rows].astype(np.int64)
+        if start_date is not None or end_date is not None:
+            keep = np.ones(len(days), dtype=bool)
+            if start_date is not None:
+                keep &= days >= np.datetime64(pd.Timestamp(start_date).date(), 'D').astype(np.int64)
+            if end_date is not None:
+                keep &= days <= np.datetime64(pd.Timestamp(end_date).date(), 'D').astype(np.int64)
+            rows, columns, days = rows[keep], columns[keep], days[keep]
+        if not len(rows):
+            return pd.DataFrame(np.empty((0, len(codes))), index=pd.DatetimeIndex([]), columns=codes)
+
+        # 日期按距最早日期的天数映射为行号（交易日的范围有限，不需要排序去重）
+        first = days.min()
+        present = np.zeros(days.max() - first + 1, dtype=bool)
+        present[days - first] = True
+        date_rows = (np.cumsum(present) - 1)[days - first]
+        dates = (np.flatnonzero(present) + first).astype(DATE_DTYPE)
+        # 按 (股票 × 日期) 填入，每只股票的数据连续写入；转置后正是DataFrame内部的存储布局，不再复制
+        values = np.full((len(codes), len(dates)), np.nan)
+        values[columns, date_rows] = self.field_array(field)[rows]
+        return pd.DataFrame(values.T, index=pd.DatetimeIndex(dates), columns=codes, copy=False)
+
+    def compact(self):
+        """重写存储文件，使每只股票的数据成为单个连续段"""
+        order = [(code, self.read(code)) for code in self.codes()]
+        tmp_files = {}
+        for name, dtype in self._files():
+            column = 'date' if name == DATE_FILE else name[:-4]
+            path = os.path.join(self.root, name + '.tmp')
+            with open(path, 'wb') as f:
+                for _, data in order:
+                    f.write(np.asarray(data[column]).astype(dtype).tobytes())
+            tmp_files[name] = path
+        segments = {}
+        offset = 0
+        for code, data in order:
+            segments[code] = [(offset, len(data['date']))]
+            offset += len(data['date'])
+        # 先释放内存映射再替换文件
+        self._maps = {}
+        order = None
+        for name, path in tmp_files.items():
+            os.replace(path, os.path.join(self.root, name))
+        self.segments = segments
+        self._segment_count = len(segments)
+        self.rows = offset
+        self._save_index()
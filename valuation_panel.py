@@ -0,0 +1,185 @@
+"""
+估值面板模块
+按交易日批量获取全市场的估值和行情数据，保存为 (日期 × 股票) 的面板，
+可以直接按股票代码拼接到财务数据上
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from stock_data_collector import VALUATION_FIELDS
+from indicator_labels import resolve_column
+
+# 默认面板目录
+DEFAULT_PANEL_DIR = 'valuation_panel'
+
+
+class ValuationPanel:
+    def __init__(self, dates, codes, values):
+        """初始化估值面板
+
+        Args:
+            dates: numpy.ndarray, datetime64[D]，按时间升序
+            codes: numpy.ndarray, 股票代码
+            values: dict, {字段名: 形状为 (日期数, 股票数) 的float64数组}
+        """
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.codes = np.asarray(codes, dtype=object)
+        self.values = values
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+    @property
+    def fields(self):
+        return list(self.values)
+
+    @classmethod
+    def from_frame(cls, df, fields=None, codes=None):
+        """由长表（每行一只股票一个交易日）构建面板，一次向量化完成
+
+        Args:
+            df: DataFrame, 至少包含date、code和各估值字段
+            fields: list, 需要的字段，默认为全部估值字段
+            codes: list, 面板包含的股票（如正常上市的股票），默认为df中出现的全部股票
+        """
+        if fields is None:
+            fields = list(VALUATION_FIELDS)
+        dates = df['date'].to_numpy(dtype='datetime64[D]')
+        date_values, date_idx = np.unique(dates, return_inverse=True)
+
+        row_codes = df['code'].astype(str).to_numpy()
+        if codes is None:
+            code_values, code_idx = np.unique(row_codes, return_inverse=True)
+            keep = np.ones(len(df), dtype=bool)
+        else:
+            code_values = np.asarray(list(codes), dtype=object)
+            lookup = pd.Index(code_values)
+            code_idx = lookup.get_indexer(row_codes)
+            keep = code_idx >= 0
+        date_idx, code_idx = date_idx[keep], code_idx[keep]
+
+        values = {}
+        for field in fields:
+            panel = np.full((len(date_values), len(code_values)), np.nan)
+            panel[date_idx, code_idx] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype='float64')[keep]
+            values[field] = panel
+        return cls(date_values, code_values, values)
+
+    def field(self, field, start_date=None, end_date=None, codes=None):
+        """取出某个字段的 (日期 × 股票) 子面板
+
+        Returns:
+            DataFrame: 索引为日期，列为股票代码
+        """
+        start = 0 if start_date is None else int(np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(start_date).date(), 'D'), side='left'))
+        stop = len(self.dates) if end_date is None else int(np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(end_date).date(), 'D'), side='right'))
+        rows = slice(start, stop)
+        if codes is None:
+            cols = slice(None)
+            col_codes = self.codes
+        else:
+            cols = [self._code_index[code] for code in codes]
+            col_codes = list(codes)
+        return pd.DataFrame(np.asarray(self.values[field][rows, cols]),
+                            index=pd.DatetimeIndex(self.dates[rows], name='date'),
+                            columns=pd.Index(col_codes, name='code'))
+
+    def snapshot(self, date=None, fields=None):
+        """截至某日每只股票最近一次有效的估值数据
+
+        停牌的股票取停牌前最后一个交易日的数值。
+
+        Args:
+            date: str, 截止日期，默认为面板的最后一天
+            fields: list, 需要的字段，默认为全部字段
+
+        Returns:
+            DataFrame: 每只股票一行，包含code及各字段
+        """
+        if fields is None:
+            fields = self.fields
+        end = len(self.dates) if date is None else int(np.searchsorted(
+            self.dates, np.datetime64(pd.Timestamp(date).date(), 'D'), side='right'))
+        result = {'code': self.codes}
+        for field in fields:
+            column = np.full(len(self.codes), np.nan)
+            if end > 0:
+                block = np.asarray(self.values[field][:end])
+                valid = ~np.isnan(block)
+                # 每列最后一个非空值的行号
+                last = end - 1 - np.argmax(valid[::-1], axis=0)
+                has_value = valid.any(axis=0)
+                column[has_value] = block[last[has_value], np.flatnonzero(has_value)]
+            result[field] = column
+        return pd.DataFrame(result)
+
+    def join(self, df, date=None, fields=None):
+        """将估值数据按股票代码拼接到财务数据上
+
+        Args:
+            df: DataFrame, 财务数据，股票代码列可以是code或code(股票代码)
+            date: str, 估值截止日期，默认为面板的最后一天
+
+        Returns:
+            DataFrame: 左连接后的数据
+        """
+        code_column = resolve_column(df.columns, 'code')
+        snapshot = self.snapshot(date, fields)
+        return df.merge(snapshot.rename(columns={'code': code_column}),
+                        on=code_column, how='left', suffixes=('', '_valuation'))
+
+    def save(self, path=DEFAULT_PANEL_DIR):
+        """保存面板：dates.npy、codes.json以及每个字段一个 .npy 文件"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'dates.npy'), self.dates)
+        with open(os.path.join(path, 'codes.json'), 'w', encoding='utf-8') as f:
+            json.dump(list(self.codes), f)
+        for field, panel in self.values.items():
+            np.save(os.path.join(path, f"{field}.npy"), panel)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PANEL_DIR, fields=None):
+        """加载面板，各字段以内存映射方式打开"""
+        dates = np.load(os.path.join(path, 'dates.npy'))
+        with open(os.path.join(path, 'codes.json'), encoding='utf-8') as f:
+            codes = json.load(f)
+        if fields is None:
+            fields = [name[:-4] for name in sorted(os.listdir(path))
+                      if name.endswith('.npy') and name != 'dates.npy']
+        values = {field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode='r')
+                  for field in fields}
+        return cls(dates, codes, values)
+
+
+def fetch_valuation_panel(collector, start_date, end_date, codes=None, fields=None):
+    """获取区间内全市场的估值面板
+
+    每个交易日一次请求返回全部A股（query_daily_history_k_AStock），
+    取代逐只股票请求；全部交易日取回后一次向量化构建面板。
+
+    Args:
+        collector: StockDataCollector, 数据采集器
+        start_date: str, 起始日期
+        end_date: str, 截止日期
+        codes: list, 面板包含的股票，默认为返回数据中的全部股票
+        fields: list, 需要的字段，默认为全部估值字段
+
+    Returns:
+        ValuationPanel: 估值面板
+    """
+    trade_dates = collector.fetch_trade_dates(start_date, end_date)
+    frames = []
+    for idx, date in enumerate(trade_dates, 1):
+        print(f"获取全市场行情: [{idx}/{len(trade_dates)}] {date}")
+        df = collector.fetch_market_daily(date)
+        if not df.empty:
+            frames.append(df)
+    if not frames:
+        return ValuationPanel(np.array([], dtype='datetime64[D]'),
+                              np.asarray(list(codes or []), dtype=object),
+                              {field: np.empty((0, len(codes or []))) for field in (fields or VALUATION_FIELDS)})
+    return ValuationPanel.from_frame(pd.concat(frames, ignore_index=True), fields, codes)